@@ -0,0 +1,69 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Config drive ISO images, generated in process.
+"""
+from nova.api.metadata import base as instance_metadata
+from nova import exception
+from nova.openstack.common.gettextutils import _
+from nova.openstack.common import log as logging
+from oslo.config import cfg
+
+from vix.compute import pathutils
+from vix import isoutils
+
+LOG = logging.getLogger(__name__)
+
+config_drive_opts = [
+    cfg.BoolOpt('config_drive_inject_password',
+                default=False,
+                help='Sets the admin password in the config drive image'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(config_drive_opts, 'vix')
+CONF.import_opt('config_drive_format', 'nova.virt.configdrive')
+
+CONFIG_DRIVE_VOLUME_ID = "config-2"
+
+
+class ConfigDriveBuilder(object):
+    def __init__(self):
+        self._pathutils = pathutils.PathUtils()
+
+    def create_config_drive(self, instance, injected_files, admin_password):
+        if CONF.config_drive_format != 'iso9660':
+            raise exception.ConfigDriveUnsupportedFormat(
+                format=CONF.config_drive_format)
+
+        LOG.info(_('Creating config drive for instance: %s') %
+                 instance['name'])
+
+        extra_md = {}
+        if admin_password and CONF.vix.config_drive_inject_password:
+            extra_md['admin_pass'] = admin_password
+
+        inst_md = instance_metadata.InstanceMetadata(instance,
+                                                     content=injected_files,
+                                                     extra_md=extra_md)
+
+        config_drive_path = self._pathutils.get_config_drive_path(
+            instance['name'])
+        isoutils.write_iso(config_drive_path,
+                           inst_md.metadata_for_config_drive(),
+                           CONFIG_DRIVE_VOLUME_ID)
+        return config_drive_path
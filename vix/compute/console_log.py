@@ -0,0 +1,134 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Instance serial console logs.
+"""
+import os
+import sys
+
+from nova.openstack.common.gettextutils import _
+from nova.openstack.common import log as logging
+from oslo.config import cfg
+
+from vix.compute import pathutils
+
+console_log_opts = [
+    cfg.IntOpt('console_log_max_size_mb',
+               default=5,
+               help='Maximum size in MB of the instance serial console log. '
+                    'Larger logs are rotated at power on and, except on '
+                    'Windows hosts, truncated while the instance runs'),
+    cfg.IntOpt('console_log_check_interval',
+               default=60,
+               help='Interval in seconds between the console log size '
+                    'checks of the running instances, 0 to disable'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(console_log_opts, 'vix')
+
+LOG = logging.getLogger(__name__)
+
+MAX_CONSOLE_BYTES = 100 * 1024
+
+
+def read_tail(path, max_bytes):
+    """Reads up to max_bytes from the end of the file, if it exists."""
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(max(size - max_bytes, 0))
+            return f.read(max_bytes)
+    except IOError:
+        if not os.path.exists(path):
+            return ''
+        raise
+
+
+class ConsoleLog(object):
+    def __init__(self):
+        self._pathutils = pathutils.PathUtils()
+
+    def _get_rotated_path(self, log_path):
+        return log_path + '.0'
+
+    def get_console_output(self, instance_name):
+        log_path = self._pathutils.get_console_log_path(instance_name)
+
+        # A truncated log starts with a hole if the VMware process kept
+        # writing at its previous offset
+        output = read_tail(log_path, MAX_CONSOLE_BYTES).lstrip('\0')
+        if len(output) < MAX_CONSOLE_BYTES:
+            # The tail of the previous log precedes the current one
+            output = read_tail(self._get_rotated_path(log_path),
+                               MAX_CONSOLE_BYTES - len(output)) + output
+        return output
+
+    def _get_max_size(self):
+        return CONF.vix.console_log_max_size_mb * 1024 * 1024
+
+    def rotate(self, instance_name):
+        log_path = self._pathutils.get_console_log_path(instance_name)
+        max_size = self._get_max_size()
+
+        if (self._pathutils.exists(log_path) and
+                os.path.getsize(log_path) > max_size):
+            LOG.debug(_("Rotating console log: %s"), log_path)
+            rotated_path = self._get_rotated_path(log_path)
+            # os.rename does not replace existing files on Windows
+            self._pathutils.check_remove(rotated_path)
+            self._pathutils.rename(log_path, rotated_path)
+
+    def check_truncate_supported(self):
+        # Windows does not allow truncating a file in use by another process
+        return sys.platform != "win32"
+
+    def _get_log_size(self, log_path):
+        st = os.stat(log_path)
+        # Only the allocated bytes count, as truncated logs can be sparse
+        return min(st.st_size, st.st_blocks * 512)
+
+    def _truncate(self, log_path):
+        LOG.debug(_("Truncating console log: %s"), log_path)
+        data = read_tail(log_path, self._get_max_size()).lstrip('\0')
+        with open(self._get_rotated_path(log_path), 'wb') as f:
+            f.write(data)
+        # The log is held open by the VMware process, so it is truncated in
+        # place instead of being renamed. Output written after the copy
+        # above and before the truncation is lost.
+        with open(log_path, 'r+b') as f:
+            f.truncate()
+
+    def truncate_logs(self):
+        """Truncates the logs exceeding the size limit, keeping their tail
+        as the previous log.
+        """
+        instances_dir = self._pathutils.get_instances_dir()
+        if not os.path.isdir(instances_dir):
+            return
+
+        max_size = self._get_max_size()
+        for instance_name in os.listdir(instances_dir):
+            log_path = self._pathutils.get_console_log_path(instance_name)
+            try:
+                if (os.path.isfile(log_path) and
+                        self._get_log_size(log_path) > max_size):
+                    self._truncate(log_path)
+            except Exception as ex:
+                LOG.warn(_("Console log truncation failed for %(log_path)s: "
+                           "%(ex)s") % {'log_path': log_path, 'ex': ex})
@@ -0,0 +1,128 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Host CPU core affinity of the instances.
+"""
+import re
+import sys
+
+from nova.openstack.common.gettextutils import _
+from nova.openstack.common import log as logging
+from nova import utils as nova_utils
+from oslo.config import cfg
+
+from vix.compute import diagnostics
+from vix import utils
+
+LOG = logging.getLogger(__name__)
+
+cpu_affinity_opts = [
+    cfg.BoolOpt('cpu_affinity_taskset',
+                default=False,
+                help='Pin the vmware-vmx processes of instances with a '
+                     'CPU affinity to their host cores with taskset as '
+                     'well when powered on. Linux hosts only'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(cpu_affinity_opts, 'vix')
+
+EXTRA_SPEC = "vix:cpu_affinity"
+
+_PROCESSOR_USE_RE = re.compile(r'^processor(\d+)\.use$')
+
+
+def get_vmx_config(cores, host_cpu_count):
+    config = {}
+    for core in range(host_cpu_count):
+        if core not in cores:
+            config["processor%d.use" % core] = "FALSE"
+    return config
+
+
+def get_vmx_cores(config, host_cpu_count):
+    """Returns the host cores assigned in the VMX config values, or None if
+    the virtual machine can run on all the host cores.
+    """
+    if not [name for name in config if _PROCESSOR_USE_RE.match(name)]:
+        return None
+    return [core for core in range(host_cpu_count)
+            if config.get("processor%d.use" % core, "").upper() != "FALSE"]
+
+
+class CoreAllocator(object):
+    def __init__(self, resource_index):
+        self._resource_index = resource_index
+
+    def allocate(self, num_cores):
+        """Returns the num_cores host cores with the fewest instances
+        assigned, or None if the instance needs all the host cores.
+        """
+        loads = [0] * utils.get_cpu_count()
+        if num_cores >= len(loads):
+            return None
+
+        for cores in self._resource_index.get_cpu_affinities():
+            for core in cores:
+                if core < len(loads):
+                    loads[core] += 1
+
+        # Ties are broken by the core number, as the sort is stable
+        return sorted(sorted(range(len(loads)),
+                             key=lambda core: loads[core])[:num_cores])
+
+    def get_vmx_config(self, instance, extra_specs):
+        """Returns the VMX config values assigning the host cores of the
+        instance, if requested by the flavor.
+        """
+        cpu_affinity = str(extra_specs.get(EXTRA_SPEC, "false"))
+        if cpu_affinity.lower() not in ["true", "1", "yes"]:
+            return {}
+
+        cores = self.allocate(instance['vcpus'])
+        if not cores:
+            LOG.warn(_("Not enough host cores for the CPU affinity of "
+                       "instance: %s") % instance['name'])
+            return {}
+
+        LOG.info(_("Host cores assigned to instance %(instance_name)s: "
+                   "%(cores)s") % {'instance_name': instance['name'],
+                                   'cores': cores})
+        return get_vmx_config(cores, utils.get_cpu_count())
+
+    def apply_process_affinity(self, vmx_path):
+        """Pins the running vmware-vmx process to the assigned host cores,
+        if enabled.
+        """
+        if (not CONF.vix.cpu_affinity_taskset or
+                not sys.platform.startswith("linux")):
+            return
+
+        cores = self._resource_index.get_cpu_affinity(vmx_path)
+        if not cores:
+            return
+
+        cpu_list = ",".join([str(core) for core in cores])
+        try:
+            for pid in diagnostics.get_vmx_process_ids(vmx_path):
+                # Includes all the threads of the process
+                nova_utils.execute('taskset', '-a', '-p', '-c', cpu_list,
+                                   str(pid), run_as_root=True)
+        except Exception as ex:
+            # The processorN.use settings in the VMX file still apply
+            LOG.warn(_("Pinning the vmware-vmx process of %(vmx_path)s "
+                       "failed: %(ex)s") % {'vmx_path': vmx_path, 'ex': ex})
@@ -0,0 +1,233 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Index of the VMware NAT DHCP server leases.
+"""
+import calendar
+import ctypes
+import ctypes.util
+import errno
+import os
+import re
+import sys
+import time
+
+from nova.openstack.common.gettextutils import _
+from nova.openstack.common import log as logging
+from oslo.config import cfg
+
+LOG = logging.getLogger(__name__)
+
+dhcp_leases_opts = [
+    cfg.StrOpt('dhcp_leases_path',
+               default=None,
+               help='Path of the VMware NAT network DHCP leases file. '
+                    'Defaults to the vmnet8 leases file location of the '
+                    'host platform'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(dhcp_leases_opts, 'vix')
+
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = 0o2000000
+_IN_MODIFY = 0x00000002
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+
+_INOTIFY_READ_SIZE = 4096
+
+_LEASE_REGEX = re.compile(r"lease\s+(\d+\.\d+\.\d+\.\d+)\s*\{([^}]*)\}")
+_HARDWARE_REGEX = re.compile(r"hardware\s+ethernet\s+([0-9a-fA-F:]+)\s*;")
+_ENDS_REGEX = re.compile(r"ends\s+(?:\d\s+(\d+/\d+/\d+\s+\d+:\d+:\d+)|"
+                         r"never)\s*;")
+
+
+def get_default_leases_path():
+    if sys.platform == "darwin":
+        return "/var/db/vmware/vmnet-dhcpd-vmnet8.leases"
+    elif sys.platform == "win32":
+        return os.path.join(os.getenv('ALLUSERSPROFILE'), "VMware",
+                            "vmnetdhcp.leases")
+    else:
+        return "/etc/vmware/vmnet8/dhcpd/dhcpd.leases"
+
+
+def _parse_lease_time(value):
+    return calendar.timegm(time.strptime(value, "%Y/%m/%d %H:%M:%S"))
+
+
+def parse_leases(data):
+    """Parses the complete lease statements in data.
+
+    Returns a list of (ip_address, mac_address, ends) tuples, where ends
+    is None for leases that never expire, and the length of the parsed
+    data. Trailing incomplete statements are not consumed.
+    """
+    leases = []
+    parsed_length = 0
+    for m in _LEASE_REGEX.finditer(data):
+        parsed_length = m.end()
+        ip_address, statements = m.groups()
+
+        hardware = _HARDWARE_REGEX.search(statements)
+        if not hardware:
+            continue
+
+        ends = None
+        ends_match = _ENDS_REGEX.search(statements)
+        if ends_match and ends_match.group(1):
+            ends = _parse_lease_time(ends_match.group(1))
+
+        leases.append((ip_address, hardware.group(1).lower(), ends))
+    return (leases, parsed_length)
+
+
+class _InotifyWatch(object):
+    """Non blocking inotify watch on the changes of a directory."""
+
+    def __init__(self, dir_path):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+
+        fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        wd = libc.inotify_add_watch(fd, dir_path,
+                                    _IN_MODIFY | _IN_MOVED_TO | _IN_CREATE)
+        if wd < 0:
+            err = ctypes.get_errno()
+            os.close(fd)
+            raise OSError(err, "inotify_add_watch failed")
+        self._fd = fd
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def has_changed(self):
+        changed = False
+        while True:
+            try:
+                if not os.read(self._fd, _INOTIFY_READ_SIZE):
+                    break
+            except OSError as ex:
+                if ex.errno == errno.EAGAIN:
+                    break
+                raise
+            changed = True
+        return changed
+
+
+class DHCPLeases(object):
+    """MAC address to IP address index of a DHCP leases file.
+
+    The leases file is only appended to by the DHCP server, apart from
+    periodic rewrites, so it is parsed incrementally from the last offset.
+    Changes are detected with inotify where available, without accessing
+    the file on lookups, or with a stat of the file otherwise.
+    """
+
+    def __init__(self, leases_path=None):
+        self._leases_path = (leases_path or CONF.vix.dhcp_leases_path or
+                             get_default_leases_path())
+        self._ip_addresses = {}
+        self._mac_addresses = {}
+        self._offset = 0
+        self._file_id = None
+        self._watch = None
+        self._watch_failed = False
+
+    def close(self):
+        if self._watch:
+            self._watch.close()
+            self._watch = None
+
+    def _start_watch(self):
+        if self._watch or self._watch_failed:
+            return
+        if not sys.platform.startswith("linux"):
+            self._watch_failed = True
+            return
+
+        try:
+            self._watch = _InotifyWatch(os.path.dirname(self._leases_path))
+        except (OSError, AttributeError) as ex:
+            # Leases are reloaded based on the file status instead
+            self._watch_failed = True
+            LOG.debug(_("Cannot watch the DHCP leases file %(path)s: "
+                        "%(ex)s") % {'path': self._leases_path, 'ex': ex})
+
+    def _add_lease(self, ip_address, mac_address, ends):
+        # A new lease of the same MAC address supersedes its previous one
+        old_lease = self._ip_addresses.get(mac_address)
+        if old_lease and old_lease[0] != ip_address:
+            self._mac_addresses.pop(old_lease[0], None)
+
+        # Leases of the same IP address supersede the previous ones
+        old_mac_address = self._mac_addresses.get(ip_address)
+        if old_mac_address and old_mac_address != mac_address:
+            old_lease = self._ip_addresses.get(old_mac_address)
+            if old_lease and old_lease[0] == ip_address:
+                self._ip_addresses.pop(old_mac_address)
+
+        self._ip_addresses[mac_address] = (ip_address, ends)
+        self._mac_addresses[ip_address] = mac_address
+
+    def _reset(self):
+        self._ip_addresses = {}
+        self._mac_addresses = {}
+        self._offset = 0
+
+    def _refresh(self):
+        self._start_watch()
+        if self._watch and self._file_id and not self._watch.has_changed():
+            return
+
+        try:
+            st = os.stat(self._leases_path)
+        except OSError:
+            self._reset()
+            self._file_id = None
+            return
+
+        file_id = (st.st_dev, st.st_ino)
+        if file_id != self._file_id or st.st_size < self._offset:
+            # The file has been rewritten
+            self._reset()
+            self._file_id = file_id
+        elif st.st_size == self._offset:
+            return
+
+        with open(self._leases_path, 'rb') as f:
+            f.seek(self._offset)
+            data = f.read()
+
+        (leases, parsed_length) = parse_leases(data)
+        for (ip_address, mac_address, ends) in leases:
+            self._add_lease(ip_address, mac_address, ends)
+        self._offset += parsed_length
+
+    def get_ip_address(self, mac_address):
+        self._refresh()
+
+        lease = self._ip_addresses.get(mac_address.lower())
+        if lease:
+            (ip_address, ends) = lease
+            if ends is None or ends > time.time():
+                return ip_address
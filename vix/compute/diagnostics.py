@@ -0,0 +1,111 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Instance diagnostics from the vmware-vmx process metrics.
+"""
+import os
+import time
+
+from vix import utils
+
+VMX_PROCESS_NAMES = ["vmware-vmx", "vmware-vmx.exe"]
+
+
+def _normalize_path(path):
+    return os.path.normcase(os.path.normpath(path))
+
+
+def _get_vmx_path(cmdline, vmx_paths):
+    # The VMX path is passed as an argument of the process
+    for arg in reversed(cmdline or []):
+        vmx_path = _normalize_path(arg)
+        if vmx_path in vmx_paths:
+            return vmx_path
+
+
+def get_vmx_process_ids(vmx_path):
+    """Returns the ids of the vmware-vmx processes running vmx_path."""
+    vmx_paths = set([_normalize_path(vmx_path)])
+    return [process_info["pid"] for process_info in
+            utils.get_processes_info(VMX_PROCESS_NAMES)
+            if _get_vmx_path(process_info["cmdline"], vmx_paths)]
+
+
+def _get_rate(value, prev_value, interval):
+    if value is None or prev_value is None or interval <= 0:
+        return None
+    return max(value - prev_value, 0) / interval
+
+
+class VMXProcessDiagnostics(object):
+    def __init__(self, conn, ttl=10):
+        self._conn = conn
+        self._ttl = ttl
+        self._samples = {}
+        self._sample_time = None
+
+    def _get_diagnostics(self, process_info, prev_sample, interval):
+        diagnostics = {"cpu_time": process_info["cpu_time"],
+                       "memory_rss": process_info["rss"],
+                       "disk_read_bytes": process_info["read_bytes"],
+                       "disk_write_bytes": process_info["write_bytes"]}
+
+        # Rates are available only from the second sample of a process
+        if prev_sample and prev_sample["pid"] == process_info["pid"]:
+            cpu_rate = _get_rate(process_info["cpu_time"],
+                                 prev_sample["cpu_time"], interval)
+            if cpu_rate is not None:
+                diagnostics["cpu_percent"] = cpu_rate * 100
+            diagnostics["disk_read_bytes_rate"] = _get_rate(
+                process_info["read_bytes"], prev_sample["read_bytes"],
+                interval)
+            diagnostics["disk_write_bytes_rate"] = _get_rate(
+                process_info["write_bytes"], prev_sample["write_bytes"],
+                interval)
+        return diagnostics
+
+    def sample(self):
+        """Samples the vmware-vmx processes of all the running instances."""
+        vmx_paths = set([_normalize_path(vmx_path)
+                         for vmx_path in self._conn.list_running_vms()])
+
+        now = time.time()
+        interval = now - (self._sample_time or now)
+
+        samples = {}
+        for process_info in utils.get_processes_info(VMX_PROCESS_NAMES):
+            vmx_path = _get_vmx_path(process_info["cmdline"], vmx_paths)
+            if vmx_path:
+                prev_sample = self._samples.get(vmx_path)
+                process_info["diagnostics"] = self._get_diagnostics(
+                    process_info, prev_sample, interval)
+                samples[vmx_path] = process_info
+
+        self._samples = samples
+        self._sample_time = now
+
+    def get_diagnostics(self, vmx_path):
+        """Returns the diagnostics of the instance, or None if no vmware-vmx
+        process was found for it.
+        """
+        if (self._sample_time is None or
+                time.time() - self._sample_time >= self._ttl):
+            self.sample()
+
+        sample = self._samples.get(_normalize_path(vmx_path))
+        if sample:
+            return sample["diagnostics"]
@@ -0,0 +1,148 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Background compaction of the instances virtual disks.
+"""
+import os
+import re
+import time
+
+from nova.openstack.common.gettextutils import _
+from nova.openstack.common import log as logging
+from oslo.config import cfg
+
+from vix.compute import pathutils
+from vix import disk_manager
+from vix import utils
+from vix import vixlib
+from vix import vixutils
+
+LOG = logging.getLogger(__name__)
+
+disk_compactor_opts = [
+    cfg.IntOpt('disk_compaction_interval',
+               default=0,
+               help='Interval in seconds between runs of the background '
+                    'compaction of the disks of powered off or suspended '
+                    'instances. Set to 0 to disable'),
+    cfg.IntOpt('disk_compaction_max_host_io_mb',
+               default=20,
+               help='Host disk I/O in MB/s above which disk compaction is '
+                    'postponed to the next run'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(disk_compactor_opts, 'vix')
+
+_IO_SAMPLE_INTERVAL = 1
+
+
+class DiskCompactor(object):
+    _compactable_power_states = (vixlib.VIX_POWERSTATE_POWERED_OFF |
+                                 vixlib.VIX_POWERSTATE_SUSPENDED)
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._pathutils = pathutils.PathUtils()
+        self._disk_manager = disk_manager.DiskManager()
+
+    def _get_host_io_rate_mb(self):
+        io_bytes = utils.get_disk_io_bytes()
+        time.sleep(_IO_SAMPLE_INTERVAL)
+        io_bytes = utils.get_disk_io_bytes() - io_bytes
+        return io_bytes / (1024 * 1024) / _IO_SAMPLE_INTERVAL
+
+    def _get_instance_vmx_paths(self):
+        instances_dir = self._pathutils.get_instances_dir()
+        vmx_paths = []
+        for instance_name in os.listdir(instances_dir):
+            vmx_path = self._pathutils.get_vmx_path(instance_name)
+            if self._pathutils.exists(vmx_path):
+                vmx_paths.append(vmx_path)
+        return vmx_paths
+
+    def _get_vm_disk_paths(self, vmx_path):
+        # Only the disks referenced in the vmx file are compacted. Disks
+        # in the middle of a snapshot chain are parents of other disks and
+        # must not be modified.
+        vm_dir = os.path.dirname(vmx_path)
+        config = vixutils.load_config_file_values(vmx_path)
+        disk_paths = []
+        for (k, v) in config.items():
+            if re.match(r"^scsi\d+:\d+\.fileName$", k) and v.endswith(".vmdk"):
+                disk_paths.append(os.path.join(vm_dir, v))
+        return disk_paths
+
+    def _get_disk_files_size(self, vm_dir):
+        # Includes the extent files of split disks
+        size = 0
+        for file_name in os.listdir(vm_dir):
+            if file_name.endswith(".vmdk"):
+                size += os.path.getsize(os.path.join(vm_dir, file_name))
+        return size
+
+    def _is_compactable(self, vmx_path):
+        with self._conn.open_vm(vmx_path) as vm:
+            if not vm.get_power_state() & self._compactable_power_states:
+                return False
+
+            # Disks in a snapshot chain cannot be compacted
+            if list(vm.snapshot_tree()):
+                LOG.debug(_("Skipping disk compaction of %s, the instance "
+                            "has snapshots") % vmx_path)
+                return False
+            return True
+
+    def compact_vm_disks(self, vmx_path):
+        vm_dir = os.path.dirname(vmx_path)
+        size_before = self._get_disk_files_size(vm_dir)
+
+        for disk_path in self._get_vm_disk_paths(vmx_path):
+            LOG.debug(_("Compacting disk: %s") % disk_path)
+            self._disk_manager.compact_disk(disk_path)
+
+        return size_before - self._get_disk_files_size(vm_dir)
+
+    def compact_instance_disks(self):
+        if not self._disk_manager.check_compact_disk_supported():
+            LOG.warn(_("Disk compaction is not supported on this host"))
+            return 0
+
+        reclaimed_bytes = 0
+        compacted_vms = 0
+        for vmx_path in self._get_instance_vmx_paths():
+            try:
+                if not self._is_compactable(vmx_path):
+                    continue
+
+                io_rate_mb = self._get_host_io_rate_mb()
+                if io_rate_mb > CONF.vix.disk_compaction_max_host_io_mb:
+                    LOG.debug(_("Host disk I/O at %d MB/s, postponing disk "
+                                "compaction") % io_rate_mb)
+                    break
+
+                reclaimed_bytes += self.compact_vm_disks(vmx_path)
+                compacted_vms += 1
+            except Exception as ex:
+                LOG.warn(_("Disk compaction failed for %(vmx_path)s: "
+                           "%(ex)s") % {'vmx_path': vmx_path, 'ex': ex})
+
+        LOG.info(_("Disk compaction reclaimed %(reclaimed_bytes)d bytes from "
+                   "%(compacted_vms)d instances") %
+                 {'reclaimed_bytes': reclaimed_bytes,
+                  'compacted_vms': compacted_vms})
+        return reclaimed_bytes
@@ -19,20 +19,37 @@ A VIX Nova Compute driver.
 """
 import os
 import platform
+import time
 
 from nova.openstack.common.gettextutils import _
 from nova.openstack.common import excutils
 from nova.openstack.common import jsonutils
 from nova.openstack.common import log as logging
+from nova.openstack.common import loopingcall
+from nova.compute import flavors
 from nova.compute import power_state
 from nova.compute import task_states
 from nova import exception
 from nova import utils as nova_utils
+from nova.virt import configdrive
 from nova.virt import driver
 from oslo.config import cfg
 
+from vix.compute import config_drive
+from vix.compute import console_log
+from vix.compute import cpu_affinity
+from vix.compute import diagnostics
+from vix.compute import disk_compactor
+from vix.compute import guestinfo
 from vix.compute import image_cache
+from vix.compute import injector
+from vix.compute import ipdiscovery
+from vix.compute import memory_profile
 from vix.compute import pathutils
+from vix.compute import resource_index
+from vix.compute import screen
+from vix.compute import shared_folders
+from vix import cpuutils
 from vix import utils
 from vix import vixlib
 from vix import vixutils
@@ -49,12 +66,47 @@ vix_opts = [
                 help='The default guest os to be set in the instance vmx '
                      'file if not specified by the image "vix_guestos" '
                      'property'),
+    cfg.BoolOpt('incremental_snapshots',
+                default=False,
+                help='Upload only the disk grains that differ from the '
+                     'instance image when taking snapshots. The resulting '
+                     'images reference their parent image, which must not '
+                     'be deleted'),
+    cfg.BoolOpt('pristine_snapshot',
+                default=False,
+                help='Take a disk only snapshot of new instances before '
+                     'their first boot, used to rebuild them with the same '
+                     'image by reverting to it. Not supported on VMware '
+                     'Player'),
+    cfg.BoolOpt('spawn_wait_for_ip',
+                default=False,
+                help='Wait for the guest tools to report the IP address of '
+                     'new instances before completing the spawn'),
+    cfg.IntOpt('host_metrics_ttl',
+               default=10,
+               help='Time in seconds after which the host memory, disk and '
+                    'CPU metrics used for the resource and stats reports '
+                    'are sampled again, in background. Instance diagnostics '
+                    'are sampled at most once per interval as well'),
+    cfg.IntOpt('warm_checkpoint_timeout',
+               default=600,
+               help='Maximum time in seconds to wait for the guest tools '
+                    'to start before taking the warm checkpoint of '
+                    'instances spawned from images with the '
+                    '"vix_warm_checkpoint" property'),
 ]
 
 CONF = cfg.CONF
 CONF.register_opts(vix_opts, 'vix')
 CONF.import_opt('use_cow_images', 'nova.virt.driver')
 CONF.import_opt('vnc_enabled', 'nova.vnc')
+CONF.import_opt('disk_compaction_interval', 'vix.compute.disk_compactor',
+                group='vix')
+
+PRISTINE_SNAPSHOT_NAME = "Nova pristine"
+WARM_CHECKPOINT_NAME = "Nova warm checkpoint"
+
+_WARM_CHECKPOINT_POLL_INTERVAL = 5
 
 
 class VixDriver(driver.ComputeDriver):
@@ -72,18 +124,52 @@ class VixDriver(driver.ComputeDriver):
         self._conn.connect()
         self._image_cache = image_cache.ImageCache()
         self._pathutils = pathutils.PathUtils()
+        self._disk_compactor = disk_compactor.DiskCompactor(self._conn)
+        self._ip_discovery = ipdiscovery.GuestIPDiscovery(self._conn)
+        self._injector = injector.GuestInjector()
+        self._config_drive_builder = config_drive.ConfigDriveBuilder()
+        self._console_log = console_log.ConsoleLog()
+        self._shared_folders = shared_folders.SharedFolderManager()
+        self._screen_capture = screen.ScreenCapture(self._conn)
+        self._resource_index = resource_index.VMXResourceIndex()
+        self._core_allocator = cpu_affinity.CoreAllocator(
+            self._resource_index)
+        self._host_metrics = utils.HostMetricsSampler(
+            self._pathutils.get_instances_dir(), CONF.vix.host_metrics_ttl)
+        self._diagnostics = diagnostics.VMXProcessDiagnostics(
+            self._conn, CONF.vix.host_metrics_ttl)
         self._stats = None
 
     def init_host(self, host):
-        pass
+        self._resource_index.refresh()
+
+        if CONF.vix.host_metrics_ttl > 0:
+            timer = loopingcall.FixedIntervalLoopingCall(
+                self._host_metrics.sample)
+            timer.start(interval=CONF.vix.host_metrics_ttl)
+
+        if CONF.vix.disk_compaction_interval > 0:
+            timer = loopingcall.FixedIntervalLoopingCall(
+                self._disk_compactor.compact_instance_disks)
+            timer.start(interval=CONF.vix.disk_compaction_interval,
+                        initial_delay=CONF.vix.disk_compaction_interval)
+
+        if (CONF.vix.console_log_check_interval > 0 and
+                self._console_log.check_truncate_supported()):
+            timer = loopingcall.FixedIntervalLoopingCall(
+                self._console_log.truncate_logs)
+            timer.start(interval=CONF.vix.console_log_check_interval)
 
     def list_instances(self):
         return self._conn.list_running_vms()
 
     def _delete_existing_instance(self, instance_name, destroy_disks=True):
         vmx_path = self._pathutils.get_vmx_path(instance_name)
+        self._ip_discovery.invalidate(vmx_path)
+        self._screen_capture.invalidate(vmx_path)
         if self._conn.vm_exists(vmx_path):
             self._conn.unregister_vm_and_delete_files(vmx_path, destroy_disks)
+        self._resource_index.remove(vmx_path)
 
     def _clone_vmdk_vm(self, src_vmdk, root_vmdk_path, dest_vmx_path):
         src_vmdk_base_path = os.path.splitext(src_vmdk)[0]
@@ -120,6 +206,33 @@ class VixDriver(driver.ComputeDriver):
         vixutils.set_vmx_value(dest_vmsd_path, "sentinel0",
                                root_vmdk_filename)
 
+    def _create_blank_disk(self, disk_path, size_mb):
+        template_path = self._image_cache.get_cached_blank_disk(size_mb)
+        self._pathutils.copy_sparse(template_path, disk_path)
+
+    def _create_ephemeral_disks(self, instance):
+        instance_name = instance['name']
+        disk_paths = []
+
+        ephemeral_gb = instance.get('ephemeral_gb')
+        if ephemeral_gb:
+            LOG.debug(_('Creating ephemeral disk for instance: %s'),
+                      instance_name)
+            ephemeral_vmdk_path = self._pathutils.get_ephemeral_vmdk_path(
+                instance_name)
+            self._create_blank_disk(ephemeral_vmdk_path, ephemeral_gb * 1024)
+            disk_paths.append(ephemeral_vmdk_path)
+
+        swap_mb = flavors.extract_flavor(instance).get('swap')
+        if swap_mb:
+            LOG.debug(_('Creating swap disk for instance: %s'),
+                      instance_name)
+            swap_vmdk_path = self._pathutils.get_swap_vmdk_path(instance_name)
+            self._create_blank_disk(swap_vmdk_path, swap_mb)
+            disk_paths.append(swap_vmdk_path)
+
+        return disk_paths
+
     def _check_player_compatibility(self, cow):
         if vixutils.get_vix_host_type() == vixutils.VIX_VMWARE_PLAYER:
             if cow:
@@ -130,6 +243,39 @@ class VixDriver(driver.ComputeDriver):
                 raise NotImplementedError(_("VNC connections are not supported"
                                             " on VMWare Player"))
 
+    def _check_nested_virt_support(self):
+        if not (self._conn.nested_virt_support() &
+                vixutils.SUPPORTS_NESTED_VIRT_VMX):
+            raise utils.VixException(_("The host CPU does not support "
+                                       "nested virtualization"))
+
+    def _get_device_models(self, properties, guest_os):
+        """Returns the disk controller and NIC model of the image, using
+        the paravirtual devices if the image has the guest tools installed.
+        """
+        guest_tools_str = str(properties.get("vix_guest_tools", "false"))
+        guest_tools = guest_tools_str.lower() in ["true", "1", "yes"]
+
+        disk_controller = properties.get("vix_disk_controller")
+        if not disk_controller:
+            if guest_tools and vixutils.is_device_supported(
+                    guest_os, vixutils.DISK_CONTROLLER_PVSCSI):
+                disk_controller = vixutils.DISK_CONTROLLER_PVSCSI
+            else:
+                disk_controller = vixutils.DISK_CONTROLLER_LSISAS1068
+
+        nic_model = properties.get("vix_nic_model")
+        if not nic_model:
+            if guest_tools and vixutils.is_device_supported(
+                    guest_os, vixutils.NIC_MODEL_VMXNET3):
+                nic_model = vixutils.NIC_MODEL_VMXNET3
+            else:
+                nic_model = vixutils.NIC_MODEL_E1000E
+
+        vixutils.check_device_compatibility(guest_os, disk_controller,
+                                            nic_model)
+        return (disk_controller, nic_model)
+
     def spawn(self, context, instance, image_meta, injected_files,
               admin_password, network_info=None, block_device_info=None):
 
@@ -146,6 +292,8 @@ class VixDriver(driver.ComputeDriver):
         floppy_image_id = properties.get("vix_floppy_image")
         tools_iso = properties.get("vix_tools_iso")
         boot_order = properties.get("vix_boot_order", "hdd,cdrom,floppy")
+        warm_checkpoint_str = properties.get("vix_warm_checkpoint", "false")
+        warm_checkpoint = warm_checkpoint_str.lower() in ["true", "1", "yes"]
 
         cow_str = properties.get("cow", str(CONF.use_cow_images))
         cow = cow_str.lower() in ["true", "1", "yes"]
@@ -153,6 +301,17 @@ class VixDriver(driver.ComputeDriver):
         LOG.info(_("CoW image: %s" % cow))
 
         self._check_player_compatibility(cow)
+        if nested_hypervisor:
+            self._check_nested_virt_support()
+        (disk_controller, nic_model) = self._get_device_models(properties,
+                                                               guest_os)
+
+        instance_type = self.virtapi.instance_type_get(
+            context, instance['instance_type_id'])
+        extra_specs = instance_type.get('extra_specs', {})
+        vm_shared_folders = self._shared_folders.get_shared_folders(
+            properties, extra_specs)
+        vm_memory_profile = memory_profile.get_memory_profile(extra_specs)
 
         self._delete_existing_instance(instance_name)
 
@@ -175,6 +334,9 @@ class VixDriver(driver.ComputeDriver):
             else:
                 self._pathutils.copy(base_vmdk_path, root_vmdk_path)
 
+            disk_paths = [root_vmdk_path]
+            disk_paths += self._create_ephemeral_disks(instance)
+
             iso_paths = []
             for image_id in iso_image_ids:
                 if image_id:
@@ -189,6 +351,12 @@ class VixDriver(driver.ComputeDriver):
                                               "%s.iso" % tools_iso)
                 iso_paths.append(tools_iso_path)
 
+            if configdrive.required_by(instance):
+                config_drive_path = (
+                    self._config_drive_builder.create_config_drive(
+                        instance, injected_files, admin_password))
+                iso_paths.append(config_drive_path)
+
             # Make sure that the vm will have a disconnected DVD drive
             # just in case the user will want to install the tools
             if not iso_paths:
@@ -216,41 +384,200 @@ class VixDriver(driver.ComputeDriver):
                 networks.append((vixutils.NETWORK_NAT,
                                  vif['address']))
 
+            serial_port_path = self._pathutils.get_console_log_path(
+                instance_name)
+
+            additional_config = self._core_allocator.get_vmx_config(
+                instance, extra_specs)
+            if CONF.vix.guestinfo_metadata:
+                additional_config.update(guestinfo.get_vmx_config(
+                    guestinfo.get_variables(instance, network_info)))
+
             if cow:
                 self._conn.update_vm(vmx_path=vmx_path,
                                      display_name=display_name,
                                      guest_os=guest_os,
                                      num_vcpus=instance['vcpus'],
                                      mem_size_mb=instance['memory_mb'],
-                                     #disk_paths=[root_vmdk_path],
+                                     disk_paths=disk_paths,
                                      iso_paths=iso_paths,
                                      floppy_path=floppy_path,
                                      networks=networks,
                                      boot_order=boot_order,
                                      vnc_enabled=CONF.vnc_enabled,
                                      vnc_port=vnc_port,
-                                     nested_hypervisor=nested_hypervisor)
+                                     nested_hypervisor=nested_hypervisor,
+                                     serial_port_path=serial_port_path,
+                                     memory_profile=vm_memory_profile,
+                                     disk_controller=disk_controller,
+                                     nic_model=nic_model,
+                                     additional_config=additional_config)
             else:
                 self._conn.create_vm(vmx_path=vmx_path,
                                      display_name=display_name,
                                      guest_os=guest_os,
                                      num_vcpus=instance['vcpus'],
                                      mem_size_mb=instance['memory_mb'],
-                                     disk_paths=[root_vmdk_path],
+                                     disk_paths=disk_paths,
                                      iso_paths=iso_paths,
                                      floppy_path=floppy_path,
                                      networks=networks,
                                      boot_order=boot_order,
                                      vnc_enabled=CONF.vnc_enabled,
                                      vnc_port=vnc_port,
-                                     nested_hypervisor=nested_hypervisor)
+                                     nested_hypervisor=nested_hypervisor,
+                                     serial_port_path=serial_port_path,
+                                     memory_profile=vm_memory_profile,
+                                     disk_controller=disk_controller,
+                                     nic_model=nic_model,
+                                     additional_config=additional_config)
+            self._resource_index.update(vmx_path)
 
             with self._conn.open_vm(vmx_path) as vm:
+                if CONF.vix.pristine_snapshot:
+                    self._create_pristine_snapshot(vm, root_image_id)
                 vm.power_on(CONF.vix.show_gui)
+                self._core_allocator.apply_process_affinity(vmx_path)
+
+                self._injector.inject(vm, instance_name, guest_os,
+                                      properties, injected_files,
+                                      admin_password)
+                self._shared_folders.add_shared_folders(vm,
+                                                        vm_shared_folders)
+
+            if warm_checkpoint:
+                self._create_warm_checkpoint(vmx_path, root_image_id)
+
+            if CONF.vix.spawn_wait_for_ip:
+                ip_address = self._ip_discovery.get_ip_address(
+                    vmx_path).wait()
+                LOG.info(_("Instance %(instance_name)s IP address: "
+                           "%(ip_address)s") %
+                         {'instance_name': instance_name,
+                          'ip_address': ip_address})
         except Exception:
             with excutils.save_and_reraise_exception():
                 self._delete_existing_instance(instance_name)
 
+    def _create_pristine_snapshot(self, vm, image_id):
+        if vixutils.get_vix_host_type() == vixutils.VIX_VMWARE_PLAYER:
+            LOG.warn(_("VMware Player does not support snapshots, skipping "
+                       "the pristine snapshot"))
+            return
+
+        # The image id is stored in the description, as a rebuild can
+        # target a different image
+        with vm.create_snapshot(name=PRISTINE_SNAPSHOT_NAME,
+                                description=image_id):
+            pass
+
+    def _create_warm_checkpoint(self, vmx_path, image_id):
+        if vixutils.get_vix_host_type() == vixutils.VIX_VMWARE_PLAYER:
+            LOG.warn(_("VMware Player does not support snapshots, skipping "
+                       "the warm checkpoint"))
+            return
+
+        start = time.time()
+
+        def _create_checkpoint_when_booted():
+            try:
+                if not self._conn.vm_exists(vmx_path):
+                    raise loopingcall.LoopingCallDone(False)
+
+                with self._conn.open_vm(vmx_path) as vm:
+                    # The guest tools are running once the guest OS has
+                    # booted
+                    if (vm.get_power_state() &
+                            vixlib.VIX_POWERSTATE_TOOLS_RUNNING):
+                        LOG.debug(_("Creating warm checkpoint: %s") %
+                                  vmx_path)
+                        with vm.create_snapshot(include_memory=True,
+                                                name=WARM_CHECKPOINT_NAME,
+                                                description=image_id):
+                            pass
+                        raise loopingcall.LoopingCallDone(True)
+
+                if time.time() - start > CONF.vix.warm_checkpoint_timeout:
+                    LOG.warn(_("Timeout waiting for the guest tools, "
+                               "skipping the warm checkpoint: %s") %
+                             vmx_path)
+                    raise loopingcall.LoopingCallDone(False)
+            except loopingcall.LoopingCallDone:
+                raise
+            except Exception as ex:
+                LOG.warn(_("Warm checkpoint failed for %(vmx_path)s: "
+                           "%(ex)s") % {'vmx_path': vmx_path, 'ex': ex})
+                raise loopingcall.LoopingCallDone(False)
+
+        # Does not block the spawn while the guest boots
+        timer = loopingcall.FixedIntervalLoopingCall(
+            _create_checkpoint_when_booted)
+        timer.start(interval=_WARM_CHECKPOINT_POLL_INTERVAL)
+        return timer
+
+    def _get_rebuild_snapshot(self, vm, image_id):
+        # Warm checkpoints are preferred, as they skip the guest boot
+        for name in [WARM_CHECKPOINT_NAME, PRISTINE_SNAPSHOT_NAME]:
+            snapshot = vm.get_named_snapshot(name)
+            if snapshot:
+                if snapshot.get_description() == image_id:
+                    return snapshot
+                snapshot.close()
+
+    def rebuild(self, context, instance, image_meta, injected_files,
+                admin_password, bdms, detach_block_devices,
+                attach_block_devices, network_info=None,
+                recreate=False, block_device_info=None):
+        # NotImplementedError makes the compute manager fall back to the
+        # default destroy and spawn implementation
+        if recreate:
+            raise NotImplementedError(_("Unsupported feature"))
+
+        vmx_path = self._pathutils.get_vmx_path(instance['name'])
+        if not self._conn.vm_exists(vmx_path):
+            raise NotImplementedError(_("Instance not found"))
+
+        properties = image_meta.get("properties", {})
+        instance_type = self.virtapi.instance_type_get(
+            context, instance['instance_type_id'])
+        extra_specs = instance_type.get('extra_specs', {})
+        vm_shared_folders = self._shared_folders.get_shared_folders(
+            properties, extra_specs)
+
+        with self._conn.open_vm(vmx_path) as vm:
+            snapshot = self._get_rebuild_snapshot(vm, image_meta.get('id'))
+            if not snapshot:
+                raise NotImplementedError(_("No pristine snapshot or warm "
+                                            "checkpoint found for the "
+                                            "image"))
+
+            self._ip_discovery.invalidate(vmx_path)
+
+            with snapshot:
+                self.virtapi.instance_update(
+                    context, instance['uuid'],
+                    {'task_state': task_states.REBUILD_SPAWNING,
+                     'expected_task_state': task_states.REBUILDING})
+
+                LOG.debug(_("Reverting instance %s to snapshot") %
+                          instance['name'])
+                vm.revert_to_snapshot(snapshot, CONF.vix.show_gui)
+
+            # Reverting to a warm checkpoint resumes the instance
+            if not (vm.get_power_state() &
+                    vixlib.VIX_POWERSTATE_POWERED_ON):
+                self._power_on_vm(instance, vm)
+
+            # The metadata might have changed since the snapshot was taken
+            if CONF.vix.guestinfo_metadata:
+                vm.write_variables(guestinfo.get_variables(instance,
+                                                           network_info))
+
+            guest_os = properties.get("vix_guestos", CONF.vix.default_guestos)
+            self._injector.inject(vm, instance['name'], guest_os, properties,
+                                  injected_files, admin_password)
+            self._shared_folders.add_shared_folders(vm, vm_shared_folders)
+
     def _exec_vm_action(self, instance, action):
         vmx_path = self._pathutils.get_vmx_path(instance['name'])
 
@@ -260,10 +587,16 @@ class VixDriver(driver.ComputeDriver):
         with self._conn.open_vm(vmx_path) as vm:
             return action(vm)
 
+    def _exec_vm_power_action(self, instance, action):
+        # The guest IP address can change after a power transition
+        vmx_path = self._pathutils.get_vmx_path(instance['name'])
+        self._ip_discovery.invalidate(vmx_path)
+        return self._exec_vm_action(instance, action)
+
     def reboot(self, context, instance, network_info, reboot_type,
                block_device_info=None, bad_volumes_callback=None):
         #TODO: pass reboot_type
-        self._exec_vm_action(instance, lambda vm: vm.reboot())
+        self._exec_vm_power_action(instance, lambda vm: vm.reboot())
 
     def destroy(self, instance, network_info, block_device_info=None,
                 destroy_disks=True, context=None):
@@ -288,17 +621,16 @@ class VixDriver(driver.ComputeDriver):
         raise NotImplementedError(_("Unsupported feature"))
 
     def _get_host_memory_info(self):
-        (total_mem, free_mem) = utils.get_host_memory_info()
-        total_mem_mb = total_mem / (1024 * 1024)
-        free_mem_mb = free_mem / (1024 * 1024)
+        metrics = self._host_metrics.get_metrics()
+        total_mem_mb = metrics.total_mem / (1024 * 1024)
+        free_mem_mb = metrics.free_mem / (1024 * 1024)
 
         return (total_mem_mb, free_mem_mb, total_mem_mb - free_mem_mb)
 
     def _get_local_hdd_info_gb(self):
-        (total_disk, free_disk) = utils.get_disk_info(
-            self._pathutils.get_instances_dir())
-        total_dik_gb = total_disk / (1024 * 1024 * 1024)
-        free_disk_gb = free_disk / (1024 * 1024 * 1024)
+        metrics = self._host_metrics.get_metrics()
+        total_dik_gb = metrics.total_disk / (1024 * 1024 * 1024)
+        free_disk_gb = metrics.free_disk / (1024 * 1024 * 1024)
 
         return (total_dik_gb, free_disk_gb, total_dik_gb - free_disk_gb)
 
@@ -314,9 +646,14 @@ class VixDriver(driver.ComputeDriver):
          free_hdd_gb,
          used_hdd_gb) = self._get_local_hdd_info_gb()
 
-        # Todo(alexpilotti): add CPU info
-        cpu_info = []
-        vcpus = utils.get_cpu_count()
+        # Resources allocated to the instances, not the host usage
+        (vcpus_used,
+         used_mem_mb,
+         used_disk) = self._resource_index.get_totals()
+        used_hdd_gb = used_disk / (1024 * 1024 * 1024)
+
+        cpu_info = cpuutils.get_cpu_info()
+        vcpus = self._host_metrics.get_metrics().cpu_count
 
         dic = {'vcpus': vcpus,
                'memory_mb': total_mem_mb,
@@ -326,7 +663,7 @@ class VixDriver(driver.ComputeDriver):
                'hypervisor_type': "vix",
                'hypervisor_version': self._get_hypervisor_version(),
                'hypervisor_hostname': platform.node(),
-               'vcpus_used': 0,
+               'vcpus_used': vcpus_used,
                'cpu_info': jsonutils.dumps(cpu_info),
                'supported_instances': jsonutils.dumps([('i686', 'vix', 'hvm'),
                                                        ('x86_64', 'vix',
@@ -352,6 +689,9 @@ class VixDriver(driver.ComputeDriver):
         data["host_memory_overhead"] = used_mem_mb
         data["host_memory_free"] = free_mem_mb
         data["host_memory_free_computed"] = free_mem_mb
+        metrics = self._host_metrics.get_metrics()
+        data["cpu_percent"] = metrics.cpu_percent
+        data["load_average"] = metrics.load_average
         data["supported_instances"] = [('i686', 'vix', 'hvm'),
                                        ('x86_64', 'vix', 'hvm')]
         data["hypervisor_hostname"] = platform.node()
@@ -379,18 +719,26 @@ class VixDriver(driver.ComputeDriver):
 
         update_task_state(task_state=task_states.IMAGE_PENDING_UPLOAD)
 
+        # The root disk can be a delta of root.vmdk if the instance has
+        # snapshots, e.g. the pristine snapshot
+        root_vmdk_path = os.path.join(
+            os.path.dirname(vmx_path),
+            vixutils.get_vmx_value(vmx_path, "scsi0:0.fileName"))
+
         with self._conn.open_vm(vmx_path) as vm:
             with vm.create_snapshot(name="Nova snapshot") as snapshot:
                 try:
-                    root_vmdk_path = self._pathutils.get_root_vmdk_path(
-                        instance_name)
-
                     update_task_state(
                         task_state=task_states.IMAGE_UPLOADING,
                         expected_state=task_states.IMAGE_PENDING_UPLOAD)
 
+                    parent_image_id = None
+                    if CONF.vix.incremental_snapshots:
+                        parent_image_id = instance['image_ref']
+
                     self._image_cache.save_glance_image(context, name,
-                                                        root_vmdk_path)
+                                                        root_vmdk_path,
+                                                        parent_image_id)
                 finally:
                     vm.remove_snapshot(snapshot)
 
@@ -401,19 +749,26 @@ class VixDriver(driver.ComputeDriver):
         self._exec_vm_action(instance, lambda vm: vm.unpause())
 
     def suspend(self, instance):
-        self._exec_vm_action(instance, lambda vm: vm.suspend())
+        self._exec_vm_power_action(instance, lambda vm: vm.suspend())
 
     def resume(self, instance, network_info, block_device_info=None):
-        self._exec_vm_action(instance,
-                             lambda vm: vm.power_on(CONF.vix.show_gui))
+        self._exec_vm_power_action(
+            instance, lambda vm: self._power_on_vm(instance, vm))
 
     def power_off(self, instance):
-        self._exec_vm_action(instance, lambda vm: vm.power_off())
+        self._exec_vm_power_action(instance, lambda vm: vm.power_off())
 
     def power_on(self, context, instance, network_info,
                  block_device_info=None):
-        self._exec_vm_action(instance,
-                             lambda vm: vm.power_on(CONF.vix.show_gui))
+        self._exec_vm_power_action(
+            instance, lambda vm: self._power_on_vm(instance, vm))
+
+    def _power_on_vm(self, instance, vm):
+        # The console log is in use as long as the instance is running
+        self._console_log.rotate(instance['name'])
+        vm.power_on(CONF.vix.show_gui)
+        self._core_allocator.apply_process_affinity(
+            self._pathutils.get_vmx_path(instance['name']))
 
     def live_migration(self, context, instance_ref, dest, post_method,
                        recover_method, block_migration=False,
@@ -490,5 +845,13 @@ class VixDriver(driver.ComputeDriver):
         return {'host': host, 'port': vnc_port, 'internal_access_path': None}
 
     def get_console_output(self, instance):
-        LOG.debug(_("get_console_output called"), instance=instance)
-        return ''
+        return self._console_log.get_console_output(instance['name'])
+
+    def get_diagnostics(self, instance):
+        vmx_path = self._pathutils.get_vmx_path(instance['name'])
+        # Empty if the instance is not running
+        return self._diagnostics.get_diagnostics(vmx_path) or {}
+
+    def get_screen_image(self, instance):
+        vmx_path = self._pathutils.get_vmx_path(instance['name'])
+        return self._screen_capture.get_screen_image(vmx_path)
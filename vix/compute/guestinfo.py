@@ -0,0 +1,95 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Instance metadata published as guestinfo variables.
+"""
+import base64
+import gzip
+import io
+
+from nova.openstack.common import jsonutils
+from nova import utils as nova_utils
+from oslo.config import cfg
+
+guestinfo_opts = [
+    cfg.BoolOpt('guestinfo_metadata',
+                default=False,
+                help='Publish the instance metadata, network configuration '
+                     'and user data as guestinfo variables'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(guestinfo_opts, 'vix')
+
+GUESTINFO_PREFIX = "guestinfo."
+
+ENCODING_BASE64 = "base64"
+ENCODING_GZIP_BASE64 = "gzip+base64"
+
+
+def _gzip_base64_encode(data):
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode="wb") as f:
+        f.write(data)
+    return base64.b64encode(buf.getvalue())
+
+
+def get_network_config(network_info):
+    # NAT networking only, addresses are assigned by the VMware DHCP server
+    config = []
+    for (i, vif) in enumerate(network_info or []):
+        config.append({"type": "physical",
+                       "name": "eth%d" % i,
+                       "mac_address": vif['address'],
+                       "subnets": [{"type": "dhcp"}]})
+    return {"version": 1, "config": config}
+
+
+def get_metadata(instance, network_info):
+    metadata = {"instance-id": instance['uuid'],
+                "uuid": instance['uuid'],
+                "local-hostname": instance['hostname'],
+                "hostname": instance['hostname'],
+                "name": instance['display_name'],
+                "availability_zone": instance['availability_zone'],
+                "launch_index": instance['launch_index'],
+                "meta": nova_utils.instance_meta(instance),
+                "network": get_network_config(network_info)}
+
+    if instance['key_data']:
+        metadata["public_keys"] = {instance['key_name']:
+                                   instance['key_data']}
+    return metadata
+
+
+def get_variables(instance, network_info):
+    """Returns the guest variables, without the "guestinfo." prefix."""
+    metadata = jsonutils.dumps(get_metadata(instance, network_info))
+    variables = {"metadata": _gzip_base64_encode(metadata),
+                 "metadata.encoding": ENCODING_GZIP_BASE64}
+
+    # Nova stores the user data base64 encoded
+    user_data = instance['user_data']
+    if user_data:
+        variables["userdata"] = user_data
+        variables["userdata.encoding"] = ENCODING_BASE64
+    return variables
+
+
+def get_vmx_config(variables):
+    return dict([(GUESTINFO_PREFIX + name, value)
+                 for (name, value) in variables.items()])
@@ -0,0 +1,44 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Guest tools state of the instances.
+"""
+import time
+
+from nova.openstack.common import loopingcall
+
+from vix import vixlib
+
+_TOOLS_POLL_INTERVAL = 2
+
+
+def wait_for_tools(vm, timeout, poll_interval=_TOOLS_POLL_INTERVAL):
+    """Waits for the guest tools to be running, yielding to the other
+    greenthreads instead of blocking in a VIX job.
+
+    Returns False if the guest tools are not running within timeout seconds.
+    """
+    start = time.time()
+
+    def _check_tools_running():
+        if vm.get_power_state() & vixlib.VIX_POWERSTATE_TOOLS_RUNNING:
+            raise loopingcall.LoopingCallDone(True)
+        if time.time() - start > timeout:
+            raise loopingcall.LoopingCallDone(False)
+
+    timer = loopingcall.FixedIntervalLoopingCall(_check_tools_running)
+    return timer.start(interval=poll_interval).wait()
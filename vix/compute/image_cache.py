@@ -29,51 +29,156 @@ from nova.virt import images
 from oslo.config import cfg
 
 from vix.compute import pathutils
+from vix import disk_manager
+from vix import vmdkutils
 
 LOG = logging.getLogger(__name__)
 
 CONF = cfg.CONF
 CONF.import_opt('use_cow_images', 'nova.virt.driver')
 
+VMDK_DISK_TYPE_STREAM_OPTIMIZED = "streamOptimized"
+
 
 class ImageCache(object):
     def __init__(self):
         self._pathutils = pathutils.PathUtils()
+        self._disk_manager = disk_manager.DiskManager()
 
     def get_image_info(self, context, image_id):
         (image_service, image_id) = glance.get_remote_image_service(context,
                                                                     image_id)
         return image_service.show(context, image_id)
 
-    def save_glance_image(self, context, name, image_vmdk_path):
+    def _get_cached_image_path(self, image_id, disk_format):
+        base_vmdk_dir = self._pathutils.get_base_vmdk_dir()
+        return os.path.join(base_vmdk_dir, image_id + "." + disk_format)
+
+    def save_glance_image(self, context, name, image_vmdk_path,
+                          parent_image_id=None):
         (glance_image_service,
          image_id) = glance.get_remote_image_service(context, name)
         image_metadata = {"is_public": False,
                           "disk_format": "vmdk",
                           "container_format": "bare",
-                          "properties": {}}
-        with open(image_vmdk_path, 'rb') as f:
-            glance_image_service.update(context, image_id, image_metadata, f)
+                          "properties": {
+                              "vmware_disktype":
+                              VMDK_DISK_TYPE_STREAM_OPTIMIZED}}
+
+        base_vmdk_path = None
+        if parent_image_id:
+            base_vmdk_path = self._get_cached_image_path(
+                parent_image_id, disk_manager.DISK_TYPE_VMDK)
+            if self._pathutils.exists(base_vmdk_path):
+                image_metadata["properties"]["vix_parent_image_id"] = (
+                    parent_image_id)
+            else:
+                LOG.warn(_("Cached image %s not found, uploading a full "
+                           "snapshot") % parent_image_id)
+                base_vmdk_path = None
+
+        # Reads the whole disk chain, including the parent of linked clones,
+        # skipping unallocated and zero grains. Grains are compressed while
+        # being uploaded, without temporary files.
+        with vmdkutils.VMDKDisk(image_vmdk_path) as disk:
+            base_disk = None
+            try:
+                if base_vmdk_path:
+                    # Only the grains that differ from the parent image are
+                    # uploaded
+                    base_disk = vmdkutils.VMDKDisk(base_vmdk_path)
+                data = vmdkutils.ChunkedReader(
+                    vmdkutils.get_stream_optimized_chunks(
+                        disk, base_disk=base_disk))
+                glance_image_service.update(context, image_id,
+                                            image_metadata, data)
+            finally:
+                if base_disk:
+                    base_disk.close()
+
+    def _merge_delta_image(self, context, delta_vmdk_path, parent_image_id,
+                           image_path, disk_format, user_id, project_id):
+        # Parent images can be deltas as well, flattened recursively
+        parent_image_path = self.get_cached_image(context, parent_image_id,
+                                                  user_id, project_id)
+        merged_vmdk_path = "%s.merged" % image_path
+        try:
+            with vmdkutils.VMDKDisk(parent_image_path) as parent_disk:
+                with vmdkutils.VMDKDisk(delta_vmdk_path,
+                                        parent_disk) as disk:
+                    with open(merged_vmdk_path, 'wb') as f:
+                        for chunk in vmdkutils.get_stream_optimized_chunks(
+                                disk, compression_level=1):
+                            f.write(chunk)
+
+            self._disk_manager.convert_disk(merged_vmdk_path, image_path,
+                                            disk_format)
+        finally:
+            self._pathutils.check_remove(merged_vmdk_path)
 
     def get_cached_image(self, context, image_id, user_id, project_id):
 
         image_info = self.get_image_info(context, image_id)
+        properties = image_info.get("properties", {})
         disk_format = image_info.get("disk_format")
+        # streamOptimized disks cannot be used directly by VMware
+        # Workstation and need to be converted when fetched
+        stream_optimized = (properties.get("vmware_disktype") ==
+                            VMDK_DISK_TYPE_STREAM_OPTIMIZED)
+        parent_image_id = properties.get("vix_parent_image_id")
 
-        base_vmdk_dir = self._pathutils.get_base_vmdk_dir()
-        image_path = os.path.join(base_vmdk_dir, image_id + "." + disk_format)
+        image_path = self._get_cached_image_path(image_id, disk_format)
 
         @utils.synchronized(image_path)
         def fetch_image_if_not_existing():
             if not self._pathutils.exists(image_path):
+                fetch_path = image_path
+                if stream_optimized or parent_image_id:
+                    fetch_path = "%s.stream" % image_path
                 try:
-                    images.fetch(context, image_id, image_path,
+                    images.fetch(context, image_id, fetch_path,
                                  user_id, project_id)
+                    if parent_image_id:
+                        self._merge_delta_image(context, fetch_path,
+                                                parent_image_id, image_path,
+                                                disk_format, user_id,
+                                                project_id)
+                    elif stream_optimized:
+                        self._disk_manager.convert_disk(fetch_path,
+                                                        image_path,
+                                                        disk_format)
                 except Exception:
                     with excutils.save_and_reraise_exception():
                         if self._pathutils.exists(image_path):
                             self._pathutils.remove(image_path)
+                finally:
+                    if fetch_path != image_path:
+                        self._pathutils.check_remove(fetch_path)
 
             return image_path
 
         return fetch_image_if_not_existing()
+
+    def get_cached_blank_disk(self, size_mb,
+                              disk_type=disk_manager.DISK_TYPE_VMDK):
+        base_vmdk_dir = self._pathutils.get_base_vmdk_dir(create_dir=True)
+        disk_path = os.path.join(base_vmdk_dir, "blank-%(size_mb)sMB.%(ext)s" %
+                                 {"size_mb": size_mb, "ext": disk_type})
+
+        @utils.synchronized(disk_path)
+        def create_disk_if_not_existing():
+            if not self._pathutils.exists(disk_path):
+                LOG.debug(_("Creating blank disk template: %s") % disk_path)
+                # Create the template under a temporary name, so that a
+                # partially created disk will never be used as a template
+                tmp_disk_path = "%s.tmp" % disk_path
+                try:
+                    self._disk_manager.create_disk(tmp_disk_path, size_mb,
+                                                   disk_type)
+                    self._pathutils.rename(tmp_disk_path, disk_path)
+                finally:
+                    self._pathutils.check_remove(tmp_disk_path)
+
+            return disk_path
+
+        return create_disk_if_not_existing()
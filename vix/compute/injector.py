@@ -0,0 +1,183 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Injection of files and of the admin password in running guests through the
+guest tools.
+"""
+import io
+import os
+import pipes
+import tarfile
+import time
+
+from nova.openstack.common.gettextutils import _
+from nova.openstack.common import log as logging
+from oslo.config import cfg
+
+from vix.compute import guesttools
+from vix.compute import pathutils
+from vix import utils
+
+LOG = logging.getLogger(__name__)
+
+injector_opts = [
+    cfg.StrOpt('guest_username',
+               default=None,
+               help='User name used to log in the guests for injecting '
+                    'files and the admin password if not specified by the '
+                    'image "vix_guest_username" property'),
+    cfg.StrOpt('guest_password',
+               default=None,
+               secret=True,
+               help='Password used to log in the guests if not specified '
+                    'by the image "vix_guest_password" property'),
+    cfg.BoolOpt('inject_password',
+                default=False,
+                help='Set the password of the guest user to the instance '
+                     'admin password at spawn'),
+    cfg.IntOpt('guest_tools_timeout',
+               default=600,
+               help='Maximum time in seconds to wait for the guest tools '
+                    'before injecting files, which are skipped on timeout'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(injector_opts, 'vix')
+
+# Streamed to chpasswd, never extracted in the guest file system
+_PASSWORD_MEMBER_NAME = ".nova-admin-password"
+
+
+def _get_member_name(path):
+    member_name = path.lstrip("/")
+    if not member_name or ".." in member_name.split("/"):
+        raise utils.VixException(_("Invalid injected file path: %s") % path)
+    return member_name
+
+
+def _add_archive_member(archive, name, contents, mode=0o644):
+    if isinstance(contents, unicode):
+        contents = contents.encode('utf-8')
+
+    member = tarfile.TarInfo(name)
+    member.size = len(contents)
+    member.mode = mode
+    member.mtime = time.time()
+    archive.addfile(member, io.BytesIO(contents))
+
+
+def create_archive(archive_path, injected_files, username=None,
+                   admin_password=None):
+    """Packs the injected files and the admin password in a tar.gz file.
+
+    Files are added with their absolute guest path, relative to the root.
+    """
+    members = [(_get_member_name(path), contents)
+               for (path, contents) in injected_files]
+
+    # Readable only by the owner, as it can contain the admin password
+    fd = os.open(archive_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC |
+                 getattr(os, 'O_BINARY', 0), 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        with tarfile.open(archive_path, "w:gz", fileobj=f) as archive:
+            for (name, contents) in members:
+                _add_archive_member(archive, name, contents)
+            if admin_password:
+                _add_archive_member(archive, _PASSWORD_MEMBER_NAME,
+                                    u"%s:%s\n" % (username, admin_password),
+                                    0o600)
+
+
+def get_extract_command(guest_archive_path, has_files, has_password):
+    archive = pipes.quote(guest_archive_path)
+    commands = []
+    if has_files:
+        commands.append("tar -xzf %(archive)s -C / --exclude=%(password)s" %
+                        {'archive': archive,
+                         'password': _PASSWORD_MEMBER_NAME})
+    if has_password:
+        commands.append("tar -xzOf %(archive)s %(password)s | chpasswd" %
+                        {'archive': archive,
+                         'password': _PASSWORD_MEMBER_NAME})
+    # The archive is removed regardless of the result
+    return "(%s); ret=$?; rm -f %s; exit $ret" % (" && ".join(commands),
+                                                  archive)
+
+
+class GuestInjector(object):
+    def __init__(self):
+        self._pathutils = pathutils.PathUtils()
+
+    def inject(self, vm, instance_name, guest_os, properties, injected_files,
+               admin_password):
+        """Injects the files and the admin password in a running guest.
+
+        All the content is transferred to the guest as a single archive
+        and extracted with a single command in the same guest session.
+        """
+        if not CONF.vix.inject_password:
+            admin_password = None
+        if not injected_files and not admin_password:
+            return
+
+        username = properties.get("vix_guest_username",
+                                  CONF.vix.guest_username)
+        password = properties.get("vix_guest_password",
+                                  CONF.vix.guest_password)
+        if not username:
+            LOG.warn(_("Guest credentials not set, skipping the injection "
+                       "of files and admin password for instance: %s") %
+                     instance_name)
+            return
+
+        if guest_os.lower().startswith("win"):
+            LOG.warn(_("File and admin password injection is not supported "
+                       "for Windows guests, skipping it for instance: %s") %
+                     instance_name)
+            return
+
+        if not guesttools.wait_for_tools(vm, CONF.vix.guest_tools_timeout):
+            LOG.warn(_("Timeout waiting for the guest tools, skipping the "
+                       "injection of files and admin password for instance: "
+                       "%s") % instance_name)
+            return
+
+        archive_path = self._pathutils.get_injection_archive_path(
+            instance_name)
+        self._pathutils.check_remove(archive_path)
+        create_archive(archive_path, injected_files, username,
+                       admin_password)
+        try:
+            vm.login_in_guest(username, password)
+            try:
+                guest_archive_path = vm.create_temp_file_in_guest()
+                vm.copy_file_from_host_to_guest(archive_path,
+                                                guest_archive_path)
+
+                command = get_extract_command(guest_archive_path,
+                                              bool(injected_files),
+                                              bool(admin_password))
+                exit_code = vm.run_program_in_guest(
+                    "/bin/sh", "-c %s" % pipes.quote(command))
+                if exit_code:
+                    raise utils.VixException(
+                        _("Injecting files in the guest failed with exit "
+                          "code: %d") % exit_code)
+            finally:
+                vm.logout_from_guest()
+        finally:
+            self._pathutils.check_remove(archive_path)
@@ -0,0 +1,209 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Guest IP address discovery.
+"""
+import time
+
+import eventlet
+from eventlet import event
+from eventlet import queue
+from nova.openstack.common.gettextutils import _
+from nova.openstack.common import log as logging
+from oslo.config import cfg
+
+from vix.compute import dhcpleases
+from vix import utils
+from vix import vixlib
+from vix import vixutils
+
+LOG = logging.getLogger(__name__)
+
+ip_discovery_opts = [
+    cfg.IntOpt('guest_ip_discovery_timeout',
+               default=600,
+               help='Maximum time in seconds to wait for the IP address of '
+                    'an instance to be reported by the guest tools'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(ip_discovery_opts, 'vix')
+
+_INITIAL_POLL_INTERVAL = 0.02
+_MAX_POLL_INTERVAL = 2
+
+
+def _is_valid_ip_address(ip_address):
+    # Link local addresses are assigned while DHCP is not completed
+    return bool(ip_address) and not ip_address.startswith('169.254.')
+
+
+class _IPAddressRequest(object):
+    def __init__(self, vmx_path, deadline):
+        self.vmx_path = vmx_path
+        self.deadline = deadline
+        self.event = event.Event()
+        self.vm = None
+        self.job = None
+        self.mac_addresses = None
+        self.tools_running = False
+        self.interval = _INITIAL_POLL_INTERVAL
+        self.next_poll = 0
+
+    def close(self):
+        if self.job:
+            self.job.close()
+            self.job = None
+        if self.vm:
+            self.vm.close()
+            self.vm = None
+
+
+class GuestIPDiscovery(object):
+    def __init__(self, conn):
+        self._conn = conn
+        self._dhcp_leases = dhcpleases.DHCPLeases()
+        self._ip_addresses = {}
+        self._requests = {}
+        self._wakeup = queue.LightQueue()
+        self._running = False
+
+    def get_ip_address(self, vmx_path, timeout_seconds=None):
+        """Returns an event sent with the guest IP address once available.
+
+        IP addresses are cached until the next power transition of the
+        instance.
+        """
+        ip_address = self._ip_addresses.get(vmx_path)
+        if ip_address:
+            ip_event = event.Event()
+            ip_event.send(ip_address)
+            return ip_event
+
+        request = self._requests.get(vmx_path)
+        if not request:
+            if timeout_seconds is None:
+                timeout_seconds = CONF.vix.guest_ip_discovery_timeout
+            request = _IPAddressRequest(vmx_path, time.time() +
+                                        timeout_seconds)
+            self._requests[vmx_path] = request
+
+            if self._running:
+                self._wakeup.put(vmx_path)
+            else:
+                self._running = True
+                eventlet.spawn_n(self._run)
+
+        return request.event
+
+    def invalidate(self, vmx_path):
+        self._ip_addresses.pop(vmx_path, None)
+
+    def _complete(self, request, ip_address=None, ex=None):
+        del self._requests[request.vmx_path]
+        request.close()
+
+        if ex:
+            request.event.send_exception(ex)
+        else:
+            self._ip_addresses[request.vmx_path] = ip_address
+            request.event.send(ip_address)
+
+    def _get_leased_ip_address(self, request):
+        if not request.mac_addresses:
+            # Generated MAC addresses are set at the first power on
+            request.mac_addresses = vixutils.get_vmx_mac_addresses(
+                request.vmx_path)
+
+        for mac_address in request.mac_addresses:
+            ip_address = self._dhcp_leases.get_ip_address(mac_address)
+            if _is_valid_ip_address(ip_address):
+                return ip_address
+
+    def _poll(self, request):
+        if not request.vm:
+            request.vm = self._conn.open_vm(request.vmx_path)
+
+        ip_address = self._get_leased_ip_address(request)
+        if ip_address:
+            return ip_address
+
+        if request.job:
+            if not request.job.is_completed():
+                return None
+            try:
+                ip_address = request.job.get_string_result(
+                    vixlib.VIX_PROPERTY_JOB_RESULT_VM_VARIABLE_STRING)
+            finally:
+                request.job.close()
+                request.job = None
+
+            if _is_valid_ip_address(ip_address):
+                return ip_address
+        elif (request.vm.get_power_state() &
+                vixlib.VIX_POWERSTATE_TOOLS_RUNNING):
+            if not request.tools_running:
+                # The guest finished booting, poll quickly again
+                request.tools_running = True
+                request.interval = _INITIAL_POLL_INTERVAL
+            request.job = request.vm.read_variable_async("ip")
+
+    def _poll_requests(self):
+        now = time.time()
+        for request in self._requests.values():
+            if now < request.next_poll:
+                continue
+
+            try:
+                ip_address = self._poll(request)
+            except Exception as ex:
+                if not request.vm:
+                    self._complete(request, ex=ex)
+                    continue
+                # Errors are expected while the guest reboots
+                LOG.debug(_("Failed to read the IP address of %(vmx_path)s: "
+                            "%(ex)s") % {'vmx_path': request.vmx_path,
+                                         'ex': ex})
+                ip_address = None
+
+            if ip_address:
+                self._complete(request, ip_address)
+            elif now > request.deadline:
+                self._complete(request, ex=utils.VixException(
+                    _("Timeout exceeded waiting for the IP address of: %s") %
+                    request.vmx_path))
+            else:
+                request.next_poll = now + request.interval
+                request.interval = min(request.interval * 2,
+                                       _MAX_POLL_INTERVAL)
+
+    def _run(self):
+        try:
+            while self._requests:
+                self._poll_requests()
+
+                if self._requests:
+                    next_poll = min([r.next_poll for r in
+                                     self._requests.values()])
+                    try:
+                        # Wakes up as soon as a new request is added
+                        self._wakeup.get(timeout=max(0, next_poll -
+                                                     time.time()))
+                    except queue.Empty:
+                        pass
+        finally:
+            self._running = False
@@ -0,0 +1,92 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Memory backing settings of the instances.
+"""
+from nova.openstack.common.gettextutils import _
+from oslo.config import cfg
+
+from vix import utils
+
+memory_profile_opts = [
+    cfg.BoolOpt('mem_use_named_file',
+                default=None,
+                help='Back the guest memory with a .vmem file in the '
+                     'instance directory. If false, anonymous host memory '
+                     'is used instead'),
+    cfg.IntOpt('mem_trim_rate',
+               default=None,
+               help='Rate at which unused guest memory is returned to the '
+                    'host, 0 disables memory trimming'),
+    cfg.BoolOpt('mem_page_sharing',
+                default=None,
+                help='Share identical memory pages between the instances'),
+    cfg.IntOpt('min_vm_mem_pct',
+               default=None,
+               help='Percentage of the guest memory to be kept in host '
+                    'RAM, between 0 and 100'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(memory_profile_opts, 'vix')
+
+EXTRA_SPEC_PREFIX = "vix:"
+
+_BOOL_SETTINGS = ["mem_use_named_file", "mem_page_sharing"]
+_INT_SETTINGS = {"mem_trim_rate": (0, None),
+                 "min_vm_mem_pct": (0, 100)}
+
+
+def _parse_bool(name, value):
+    value = str(value).lower()
+    if value in ["true", "1", "yes"]:
+        return True
+    if value in ["false", "0", "no"]:
+        return False
+    raise utils.VixException(_("Invalid boolean value for %(name)s: "
+                               "%(value)s") % {'name': name, 'value': value})
+
+
+def _parse_int(name, value, min_value, max_value):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        value = None
+    if (value is None or value < min_value or
+            (max_value is not None and value > max_value)):
+        raise utils.VixException(_("Invalid value for %s") % name)
+    return value
+
+
+def get_memory_profile(extra_specs):
+    """Returns the memory settings of the instance, as expected by
+    VixConnection.create_vm, omitting the unset ones.
+    """
+    profile = {}
+    for name in _BOOL_SETTINGS + _INT_SETTINGS.keys():
+        value = extra_specs.get(EXTRA_SPEC_PREFIX + name)
+        if value is None:
+            value = getattr(CONF.vix, name)
+        if value is None:
+            continue
+
+        if name in _BOOL_SETTINGS:
+            profile[name] = _parse_bool(name, value)
+        else:
+            (min_value, max_value) = _INT_SETTINGS[name]
+            profile[name] = _parse_int(name, value, min_value, max_value)
+    return profile
@@ -50,6 +50,19 @@ class PathUtils(object):
     def copyfile(self, src, dest):
         self.copy(src, dest)
 
+    def copy_sparse(self, src, dest):
+        # Sparse disk templates are mostly holes. On Linux, cp can clone
+        # the extents (reflink) on filesystems supporting it or preserve
+        # the holes otherwise, avoiding to write zeros to the target.
+        if sys.platform.startswith("linux"):
+            output, ret = utils.execute('/bin/cp', '-f', '--sparse=always',
+                                        '--reflink=auto', src, dest)
+            if ret:
+                raise IOError(_('The file copy from %(src)s to %(dest)s '
+                                'failed') % {'src': src, 'dest': dest})
+        else:
+            self.copy(src, dest)
+
     def copy(self, src, dest):
         # With large files this is 2x-3x faster than shutil.copy(src, dest),
         # especially when copying to a UNC target.
@@ -108,9 +121,29 @@ class PathUtils(object):
         instance_path = self.get_instance_dir(instance_name)
         return os.path.join(instance_path, 'root.vmdk')
 
+    def get_ephemeral_vmdk_path(self, instance_name):
+        instance_path = self.get_instance_dir(instance_name)
+        return os.path.join(instance_path, 'ephemeral.vmdk')
+
+    def get_swap_vmdk_path(self, instance_name):
+        instance_path = self.get_instance_dir(instance_name)
+        return os.path.join(instance_path, 'swap.vmdk')
+
     def get_floppy_path(self, instance_name):
         instance_path = self.get_instance_dir(instance_name)
         return os.path.join(instance_path, 'floppy.flp')
 
-    def get_base_vmdk_dir(self):
-        return self._get_instances_sub_dir('_base')
+    def get_config_drive_path(self, instance_name):
+        instance_path = self.get_instance_dir(instance_name)
+        return os.path.join(instance_path, 'configdrive.iso')
+
+    def get_injection_archive_path(self, instance_name):
+        instance_path = self.get_instance_dir(instance_name)
+        return os.path.join(instance_path, 'injected_files.tar.gz')
+
+    def get_console_log_path(self, instance_name):
+        instance_path = self.get_instance_dir(instance_name)
+        return os.path.join(instance_path, 'console.log')
+
+    def get_base_vmdk_dir(self, create_dir=False):
+        return self._get_instances_sub_dir('_base', create_dir)
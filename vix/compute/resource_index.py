@@ -0,0 +1,164 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Index of the resources allocated to the instances.
+"""
+import os
+import re
+
+from nova.openstack.common.gettextutils import _
+from nova.openstack.common import log as logging
+
+from vix.compute import cpu_affinity
+from vix.compute import pathutils
+from vix import utils
+from vix import vixutils
+from vix import vmdkutils
+
+LOG = logging.getLogger(__name__)
+
+_DISK_FILE_NAME_RE = re.compile(
+    r'^((?:scsi|ide|sata|nvme)\d+:\d+)\.fileName$')
+
+
+class VMXResources(object):
+    def __init__(self, mtime=0, vcpus=0, memory_mb=0, disk_bytes=0,
+                 disk_paths=None, cpu_affinity=None):
+        self.mtime = mtime
+        self.vcpus = vcpus
+        self.memory_mb = memory_mb
+        self.disk_bytes = disk_bytes
+        self.disk_paths = disk_paths or []
+        self.cpu_affinity = cpu_affinity
+
+
+def _get_disk_paths(vmx_path, config):
+    disk_paths = []
+    for (name, value) in sorted(config.items()):
+        m = _DISK_FILE_NAME_RE.match(name)
+        if (m and value.lower().endswith(".vmdk") and
+                config.get("%s.present" % m.group(1), "").upper() == "TRUE"):
+            disk_paths.append(os.path.join(os.path.dirname(vmx_path), value))
+    return disk_paths
+
+
+def _get_disk_bytes(disk_paths):
+    disk_bytes = 0
+    for disk_path in disk_paths:
+        try:
+            disk_bytes += vmdkutils.get_disk_capacity(disk_path)
+        except (IOError, OSError) as ex:
+            LOG.warn(_("Cannot read the capacity of disk %(disk_path)s: "
+                       "%(ex)s") % {'disk_path': disk_path, 'ex': ex})
+    return disk_bytes
+
+
+def get_vmx_resources(vmx_path, mtime=0):
+    config = vixutils.load_config_file_values(vmx_path)
+    disk_paths = _get_disk_paths(vmx_path, config)
+    return VMXResources(mtime=mtime,
+                        vcpus=int(config.get("numvcpus", 1)),
+                        memory_mb=int(config.get("memsize", 0)),
+                        disk_bytes=_get_disk_bytes(disk_paths),
+                        disk_paths=disk_paths,
+                        cpu_affinity=cpu_affinity.get_vmx_cores(
+                            config, utils.get_cpu_count()))
+
+
+class VMXResourceIndex(object):
+    def __init__(self):
+        self._pathutils = pathutils.PathUtils()
+        self._resources = {}
+        self._vcpus = 0
+        self._memory_mb = 0
+        self._disk_bytes = 0
+        self._scanned = False
+
+    def _add_totals(self, resources, sign):
+        self._vcpus += sign * resources.vcpus
+        self._memory_mb += sign * resources.memory_mb
+        self._disk_bytes += sign * resources.disk_bytes
+
+    def remove(self, vmx_path):
+        resources = self._resources.pop(vmx_path, None)
+        if resources:
+            self._add_totals(resources, -1)
+
+    def update(self, vmx_path):
+        """Parses the VMX file again if changed since it was indexed."""
+        try:
+            mtime = os.stat(vmx_path).st_mtime
+        except OSError:
+            self.remove(vmx_path)
+            return
+
+        resources = self._resources.get(vmx_path)
+        if resources and resources.mtime == mtime:
+            return
+
+        try:
+            new_resources = get_vmx_resources(vmx_path, mtime)
+        except (IOError, ValueError) as ex:
+            LOG.warn(_("Cannot index the resources of %(vmx_path)s: "
+                       "%(ex)s") % {'vmx_path': vmx_path, 'ex': ex})
+            self.remove(vmx_path)
+            return
+
+        self.remove(vmx_path)
+        self._resources[vmx_path] = new_resources
+        self._add_totals(new_resources, 1)
+
+    def refresh(self):
+        """Scans the instances directory, parsing only the VMX files added
+        or changed since the previous scan.
+        """
+        instances_dir = self._pathutils.get_instances_dir()
+        vmx_paths = set()
+        if os.path.isdir(instances_dir):
+            for instance_name in os.listdir(instances_dir):
+                vmx_path = self._pathutils.get_vmx_path(instance_name)
+                if os.path.isfile(vmx_path):
+                    vmx_paths.add(vmx_path)
+
+        for vmx_path in set(self._resources.keys()) - vmx_paths:
+            self.remove(vmx_path)
+        for vmx_path in vmx_paths:
+            self.update(vmx_path)
+        self._scanned = True
+
+    def get_cpu_affinity(self, vmx_path):
+        resources = self._resources.get(vmx_path)
+        if resources:
+            return resources.cpu_affinity
+
+    def get_cpu_affinities(self):
+        """Returns the host cores assigned to each instance with a CPU
+        affinity.
+        """
+        if not self._scanned:
+            self.refresh()
+        return [resources.cpu_affinity
+                for resources in self._resources.values()
+                if resources.cpu_affinity]
+
+    def get_totals(self):
+        """Returns the vCPUs, memory in MB and disk capacity in bytes
+        allocated to all the instances.
+        """
+        if not self._scanned:
+            self.refresh()
+        return (self._vcpus, self._memory_mb, self._disk_bytes)
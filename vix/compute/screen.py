@@ -0,0 +1,84 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Rate limited instance screen captures.
+"""
+import time
+
+from nova.openstack.common.gettextutils import _
+from nova.openstack.common import log as logging
+from oslo.config import cfg
+
+from vix import utils
+from vix import vixutils
+
+LOG = logging.getLogger(__name__)
+
+screen_opts = [
+    cfg.IntOpt('screen_capture_interval',
+               default=10,
+               help='Minimum interval in seconds between screen captures '
+                    'of the same instance'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(screen_opts, 'vix')
+CONF.import_opt('guest_username', 'vix.compute.injector', group='vix')
+CONF.import_opt('guest_password', 'vix.compute.injector', group='vix')
+
+
+class _ScreenImage(object):
+    def __init__(self, capture_time, image_data=None):
+        self.capture_time = capture_time
+        self.image_data = image_data
+
+
+class ScreenCapture(object):
+    def __init__(self, conn):
+        # Screen captures require a guest login
+        self._session_pool = vixutils.GuestSessionPool(
+            conn, CONF.vix.guest_username, CONF.vix.guest_password)
+        self._images = {}
+
+    def get_screen_image(self, vmx_path):
+        """Returns the PNG screen image of the virtual machine, captured no
+        more than screen_capture_interval seconds ago.
+        """
+        now = time.time()
+        image = self._images.get(vmx_path)
+        if (image and
+                now - image.capture_time < CONF.vix.screen_capture_interval):
+            if image.image_data is None:
+                raise utils.VixException(
+                    _("Screen capture not available: %s") % vmx_path)
+            return image.image_data
+
+        if not CONF.vix.guest_username:
+            raise utils.VixException(
+                _("Guest credentials not set, screen capture not available"))
+
+        # Failed captures are rate limited as well
+        self._images[vmx_path] = _ScreenImage(now)
+        LOG.debug(_("Capturing screen: %s") % vmx_path)
+        image_data = self._session_pool.execute(
+            vmx_path, lambda vm: vm.capture_screen())
+        self._images[vmx_path] = _ScreenImage(now, image_data)
+        return image_data
+
+    def invalidate(self, vmx_path):
+        self._images.pop(vmx_path, None)
+        self._session_pool.invalidate(vmx_path)
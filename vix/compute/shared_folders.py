@@ -0,0 +1,150 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Host directories exposed to the instances as shared folders.
+"""
+import os
+import re
+
+from nova.openstack.common.gettextutils import _
+from nova.openstack.common import log as logging
+from oslo.config import cfg
+
+from vix.compute import guesttools
+from vix import utils
+from vix import vixlib
+from vix import vixutils
+
+LOG = logging.getLogger(__name__)
+
+shared_folders_opts = [
+    cfg.ListOpt('shared_folders_allowed_paths',
+                default=[],
+                help='Host directories that can be exposed to the instances '
+                     'as shared folders, including their subdirectories'),
+    cfg.BoolOpt('shared_folders_allow_write',
+                default=False,
+                help='Allow shared folders to be writable from the guests'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(shared_folders_opts, 'vix')
+CONF.import_opt('guest_tools_timeout', 'vix.compute.injector', group='vix')
+
+IMAGE_PROPERTY = "vix_shared_folders"
+EXTRA_SPEC = "vix:shared_folders"
+
+_SHARE_NAME_REGEX = r"^[\w.-]+$"
+
+
+class SharedFolder(object):
+    def __init__(self, share_name, host_path, writable=False):
+        self.share_name = share_name
+        self.host_path = host_path
+        self.writable = writable
+
+
+def _is_path_allowed(host_path):
+    for allowed_path in CONF.vix.shared_folders_allowed_paths:
+        allowed_path = os.path.realpath(allowed_path)
+        if (host_path == allowed_path or
+                host_path.startswith(os.path.join(allowed_path, ''))):
+            return True
+    return False
+
+
+def parse_shared_folders(value):
+    shared_folders = []
+    for entry in value.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+
+        (share_name, sep, host_path) = entry.partition("=")
+        share_name = share_name.strip()
+        if not sep or not re.match(_SHARE_NAME_REGEX, share_name):
+            raise utils.VixException(_("Invalid shared folder: %s") % entry)
+
+        writable = False
+        # Colons are part of Windows host paths, e.g. "C:\data"
+        (path, sep, access) = host_path.rpartition(":")
+        if sep and access in ["ro", "rw"]:
+            host_path = path
+            writable = access == "rw"
+
+        shared_folders.append(SharedFolder(share_name, host_path.strip(),
+                                           writable))
+    return shared_folders
+
+
+class SharedFolderManager(object):
+    def get_shared_folders(self, properties, extra_specs):
+        """Returns the validated shared folders requested by the image and
+        by the flavor, the latter taking precedence for equal names.
+        """
+        shared_folders = {}
+        for value in [properties.get(IMAGE_PROPERTY),
+                      extra_specs.get(EXTRA_SPEC)]:
+            for shared_folder in parse_shared_folders(value or ""):
+                shared_folders[shared_folder.share_name] = shared_folder
+
+        for shared_folder in shared_folders.values():
+            shared_folder.host_path = os.path.realpath(
+                shared_folder.host_path)
+            if not _is_path_allowed(shared_folder.host_path):
+                raise utils.VixException(
+                    _("Host path not allowed for shared folders: %s") %
+                    shared_folder.host_path)
+            if not os.path.isdir(shared_folder.host_path):
+                raise utils.VixException(
+                    _("Shared folder host path not found: %s") %
+                    shared_folder.host_path)
+            if (shared_folder.writable and
+                    not CONF.vix.shared_folders_allow_write):
+                raise utils.VixException(
+                    _("Writable shared folders are not allowed: %s") %
+                    shared_folder.share_name)
+
+        return sorted(shared_folders.values(), key=lambda f: f.share_name)
+
+    def add_shared_folders(self, vm, shared_folders):
+        if not shared_folders:
+            return
+
+        # Shared folders can be added only with the guest tools running
+        if not guesttools.wait_for_tools(vm, CONF.vix.guest_tools_timeout):
+            LOG.warn(_("Timeout waiting for the guest tools, skipping the "
+                       "shared folders: %s") %
+                     ", ".join([f.share_name for f in shared_folders]))
+            return
+
+        vm.enable_shared_folders(True)
+        for shared_folder in shared_folders:
+            LOG.debug(_("Adding shared folder %(share_name)s: "
+                        "%(host_path)s") % shared_folder.__dict__)
+            try:
+                vm.add_shared_folder(shared_folder.share_name,
+                                     shared_folder.host_path,
+                                     shared_folder.writable)
+            except utils.VixException as ex:
+                # Warm checkpoints include the shared folders added at spawn
+                if (vixutils.get_exception_error_code(ex) !=
+                        vixlib.VIX_E_ALREADY_EXISTS):
+                    raise
+                vm.set_shared_folder_state(shared_folder.share_name,
+                                           shared_folder.host_path,
+                                           shared_folder.writable)
@@ -0,0 +1,128 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Host CPU vendor, model, topology and features.
+"""
+
+import glob
+import os
+import platform
+
+from vix import utils
+
+_PROC_CPUINFO_PATH = "/proc/cpuinfo"
+_SYSFS_CPU_TOPOLOGY_GLOB = "/sys/devices/system/cpu/cpu[0-9]*/topology"
+
+_VENDORS = {"GenuineIntel": "Intel",
+            "AuthenticAMD": "AMD"}
+
+_cpu_info = None
+
+
+def parse_proc_cpuinfo(data):
+    """Returns a dict of the values of each logical CPU."""
+    processors = []
+    processor = {}
+    for line in data.splitlines():
+        (name, sep, value) = line.partition(":")
+        if sep:
+            processor[name.strip()] = value.strip()
+        elif processor:
+            processors.append(processor)
+            processor = {}
+    if processor:
+        processors.append(processor)
+    return processors
+
+
+def _read_file(path):
+    with open(path, 'rb') as f:
+        return f.read().strip()
+
+
+def _get_sysfs_core_ids():
+    core_ids = []
+    for topology_path in glob.glob(_SYSFS_CPU_TOPOLOGY_GLOB):
+        core_ids.append(
+            (_read_file(os.path.join(topology_path, "physical_package_id")),
+             _read_file(os.path.join(topology_path, "core_id"))))
+    return core_ids
+
+
+def get_topology(core_ids):
+    """Returns the sockets, cores per socket and threads per core given
+    the (package id, core id) of each logical CPU.
+    """
+    sockets = len(set([package_id for (package_id, core_id) in core_ids]))
+    cores = len(set(core_ids))
+    return {"sockets": sockets,
+            "cores": cores // sockets,
+            "threads": len(core_ids) // cores}
+
+
+def _get_linux_cpu_info():
+    processors = parse_proc_cpuinfo(_read_file(_PROC_CPUINFO_PATH))
+    processor = processors[0]
+
+    try:
+        core_ids = _get_sysfs_core_ids()
+    except (IOError, OSError):
+        core_ids = None
+    if not core_ids:
+        core_ids = [(p.get("physical id", "0"),
+                     p.get("core id", p.get("processor")))
+                    for p in processors]
+
+    vendor_id = processor.get("vendor_id")
+    return {"vendor": _VENDORS.get(vendor_id, vendor_id),
+            "model": processor.get("model name"),
+            "arch": platform.machine(),
+            "topology": get_topology(core_ids),
+            "features": sorted(processor.get("flags", "").split())}
+
+
+def _get_generic_cpu_info():
+    cpu_count = utils.get_cpu_count()
+    return {"vendor": None,
+            "model": platform.processor(),
+            "arch": platform.machine(),
+            "topology": {"sockets": 1, "cores": cpu_count, "threads": 1},
+            "features": None}
+
+
+def get_cpu_info():
+    """Returns the host CPU vendor, model, arch, topology and features. The
+    features are None if they cannot be probed on the host platform.
+    """
+    global _cpu_info
+
+    if not _cpu_info:
+        if os.path.exists(_PROC_CPUINFO_PATH):
+            _cpu_info = _get_linux_cpu_info()
+        else:
+            _cpu_info = _get_generic_cpu_info()
+    return _cpu_info
+
+
+def has_hw_virtualization(features):
+    return bool(set(["vmx", "svm"]) & set(features))
+
+
+def has_second_level_address_translation(features):
+    # Intel EPT or AMD RVI / NPT
+    return bool(set(["ept", "npt"]) & set(features))
@@ -49,6 +49,15 @@ class DiskManager(object):
                 "lsilogic", "-t", "0", disk_path]
         self._exec_cmd(args)
 
+    def _get_low_priority_args(self, args):
+        if sys.platform == "win32":
+            return args
+
+        low_priority_args = ["nice", "-n", "19"]
+        if os.path.exists("/usr/bin/ionice"):
+            low_priority_args += ["/usr/bin/ionice", "-c", "3"]
+        return low_priority_args + args
+
     def _exec_cmd(self, args):
         p = subprocess.Popen(args,
                              stdout=subprocess.PIPE,
@@ -123,3 +132,37 @@ class DiskManager(object):
             self._resize_disk_vdisk_man(disk_path, new_size_mb)
         else:
             self._resize_disk_qemu(disk_path, new_size_mb, new_disk_type)
+
+    def check_compact_disk_supported(self):
+        return self._check_vdisk_man_exists()
+
+    def compact_disk(self, disk_path, low_priority=True):
+        # Only vdiskmanager can compact a disk in place, preserving the
+        # parent relationship of linked clone delta disks
+        if not self._check_vdisk_man_exists():
+            raise utils.VixException(_("vmware-vdiskmanager is required to "
+                                       "compact disks"))
+        vdisk_man_path = self._get_vdisk_man_path()
+
+        for option in ["-d", "-k"]:
+            args = [vdisk_man_path, option, disk_path]
+            if low_priority:
+                args = self._get_low_priority_args(args)
+            self._exec_cmd(args)
+
+    def _convert_disk_vdisk_man(self, src_path, dest_path):
+        vdisk_man_path = self._get_vdisk_man_path()
+
+        args = [vdisk_man_path, "-r", src_path, "-t", "0", dest_path]
+        self._exec_cmd(args)
+
+    def _convert_disk_qemu(self, src_path, dest_path, dest_disk_type):
+        args = ["qemu-img", "convert", "-O", dest_disk_type, src_path,
+                dest_path]
+        self._exec_cmd(args)
+
+    def convert_disk(self, src_path, dest_path, dest_disk_type):
+        if dest_disk_type == DISK_TYPE_VMDK and self._check_vdisk_man_exists():
+            self._convert_disk_vdisk_man(src_path, dest_path)
+        else:
+            self._convert_disk_qemu(src_path, dest_path, dest_disk_type)
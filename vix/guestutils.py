@@ -0,0 +1,241 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Command execution and file transfers in guests.
+"""
+import os
+import pipes
+import tempfile
+import time
+
+from vix import utils
+from vix import vixlib
+from vix import vixutils
+
+_OUTPUT_POLL_INTERVAL = 1
+_OUTPUT_MAX_POLL_INTERVAL = 10
+_TRANSFER_POLL_INTERVAL = 0.1
+_MAX_TRANSFERS = 4
+
+
+def get_shell_command(command, output_path, windows=False):
+    """Returns the program and arguments running command in a guest shell,
+    redirecting its standard output and error to output_path.
+    """
+    if windows:
+        return ("cmd.exe", '/c "%s > "%s" 2>&1"' % (command, output_path))
+    else:
+        return ("/bin/sh", "-c %s" % pipes.quote(
+            "(%s) > %s 2>&1" % (command, pipes.quote(output_path))))
+
+
+def join_guest_path(guest_dir, name, windows=False):
+    sep = "\\" if windows else "/"
+    return guest_dir.rstrip(sep) + sep + name
+
+
+def _list_guest_dir(session_pool, vmx_path, guest_dir):
+    """Returns the guest files by name, creating the directory if missing."""
+    try:
+        files = session_pool.execute(
+            vmx_path, lambda vm: vm.list_directory_in_guest(guest_dir))
+    except utils.VixException as ex:
+        if (vixutils.get_exception_error_code(ex) not in
+                [vixlib.VIX_E_FILE_NOT_FOUND, vixlib.VIX_E_NOT_A_DIRECTORY]):
+            raise
+        session_pool.execute(
+            vmx_path, lambda vm: vm.create_directory_in_guest(guest_dir))
+        files = []
+    return dict([(f["name"], f) for f in files])
+
+
+def _is_file_changed(host_path, guest_file):
+    if not guest_file or guest_file["flags"] & (
+            vixlib.VIX_FILE_ATTRIBUTES_DIRECTORY):
+        return True
+    host_stat = os.stat(host_path)
+    # The guest file modification time is set when copied to the guest
+    return (guest_file["size"] != host_stat.st_size or
+            guest_file["mod_time"] < int(host_stat.st_mtime))
+
+
+def _get_changed_files(session_pool, vmx_path, host_dir, guest_dir,
+                       windows):
+    changed_files = []
+    for (dir_path, dir_names, file_names) in os.walk(host_dir):
+        guest_path = guest_dir
+        rel_path = os.path.relpath(dir_path, host_dir)
+        if rel_path != os.curdir:
+            for name in rel_path.split(os.sep):
+                guest_path = join_guest_path(guest_path, name, windows)
+
+        guest_files = _list_guest_dir(session_pool, vmx_path, guest_path)
+        for name in sorted(file_names):
+            host_path = os.path.join(dir_path, name)
+            if _is_file_changed(host_path, guest_files.get(name)):
+                changed_files.append(
+                    (host_path, join_guest_path(guest_path, name, windows)))
+    return changed_files
+
+
+def sync_directory_to_guest(session_pool, vmx_path, host_dir, guest_dir,
+                            windows=False, max_transfers=_MAX_TRANSFERS,
+                            poll_interval=_TRANSFER_POLL_INTERVAL):
+    """Copies the files of host_dir missing or changed in guest_dir,
+    running up to max_transfers copies at once. Returns the number of
+    copied files.
+    """
+    pending_files = _get_changed_files(session_pool, vmx_path, host_dir,
+                                       guest_dir, windows)
+    copied_files = len(pending_files)
+    pending_files.reverse()
+
+    jobs = []
+    try:
+        while pending_files or jobs:
+            while pending_files and len(jobs) < max_transfers:
+                (host_path, guest_path) = pending_files.pop()
+                jobs.append(session_pool.execute(
+                    vmx_path,
+                    lambda vm: vm.copy_file_from_host_to_guest_async(
+                        host_path, guest_path)))
+
+            completed_jobs = [job for job in jobs if job.is_completed()]
+            for job in completed_jobs:
+                jobs.remove(job)
+                try:
+                    job.wait()
+                finally:
+                    job.close()
+
+            if not completed_jobs:
+                time.sleep(poll_interval)
+    finally:
+        for job in jobs:
+            job.close()
+
+    return copied_files
+
+
+class GuestProcess(object):
+    def __init__(self, session_pool, vmx_path, job, guest_output_path):
+        self._session_pool = session_pool
+        self._vmx_path = vmx_path
+        self._job = job
+        self._guest_output_path = guest_output_path
+        (fd, self._host_output_path) = tempfile.mkstemp()
+        os.close(fd)
+        self._offset = 0
+        self._exit_code = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def read_output(self):
+        """Returns the output written since the previous call."""
+        file_info = self._session_pool.execute(
+            self._vmx_path,
+            lambda vm: vm.get_file_info_in_guest(self._guest_output_path))
+        if file_info["size"] <= self._offset:
+            # No new output, skip copying the file
+            return ""
+
+        self._session_pool.execute(
+            self._vmx_path, lambda vm: vm.copy_file_from_guest_to_host(
+                self._guest_output_path, self._host_output_path))
+        with open(self._host_output_path, 'rb') as f:
+            f.seek(self._offset)
+            output = f.read()
+        self._offset += len(output)
+        return output
+
+    def poll(self):
+        """Returns the exit code, or None if the command is still running."""
+        if self._exit_code is None and self._job.is_completed():
+            self._exit_code = self._job.get_int_result(
+                vixlib.VIX_PROPERTY_JOB_RESULT_GUEST_PROGRAM_EXIT_CODE)
+        return self._exit_code
+
+    def wait(self, output_callback=None,
+             poll_interval=_OUTPUT_POLL_INTERVAL):
+        """Waits for the command to complete, returning the exit code and
+        the output not already passed to output_callback, if provided.
+        The poll interval doubles while no new output is available.
+        """
+        output = []
+        interval = poll_interval
+        try:
+            while True:
+                exit_code = self.poll()
+                # Read after polling, to get all the output once completed
+                data = self.read_output()
+                if data:
+                    if output_callback:
+                        output_callback(data)
+                    else:
+                        output.append(data)
+                if exit_code is not None:
+                    return (exit_code, "".join(output))
+                time.sleep(interval)
+                if data:
+                    interval = poll_interval
+                else:
+                    interval = min(interval * 2,
+                                   max(poll_interval,
+                                       _OUTPUT_MAX_POLL_INTERVAL))
+        finally:
+            self.close()
+
+    def close(self):
+        if self._job:
+            self._job.close()
+            self._job = None
+            try:
+                self._session_pool.execute(
+                    self._vmx_path, lambda vm: vm.delete_file_in_guest(
+                        self._guest_output_path))
+            finally:
+                os.remove(self._host_output_path)
+
+
+class GuestExecutor(object):
+    def __init__(self, session_pool):
+        self._session_pool = session_pool
+
+    def execute(self, vmx_path, command, windows=False):
+        """Starts a shell command in the guest, returning a GuestProcess."""
+        guest_output_path = self._session_pool.execute(
+            vmx_path, lambda vm: vm.create_temp_file_in_guest())
+        (program_path, command_line) = get_shell_command(
+            command, guest_output_path, windows)
+        try:
+            job = self._session_pool.execute(
+                vmx_path, lambda vm: vm.run_program_in_guest_async(
+                    program_path, command_line))
+        except Exception:
+            self._session_pool.execute(
+                vmx_path,
+                lambda vm: vm.delete_file_in_guest(guest_output_path))
+            raise
+        return GuestProcess(self._session_pool, vmx_path, job,
+                            guest_output_path)
+
+    def close(self):
+        self._session_pool.close()
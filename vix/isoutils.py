@@ -0,0 +1,367 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+ISO 9660 image writer with Joliet extensions.
+"""
+
+import hashlib
+import re
+import struct
+import time
+
+from nova.openstack.common.gettextutils import _
+from vix import utils
+
+SECTOR_SIZE = 2048
+
+_SYSTEM_AREA_SECTORS = 16
+
+_VD_TYPE_PRIMARY = 1
+_VD_TYPE_SUPPLEMENTARY = 2
+_VD_TYPE_TERMINATOR = 255
+
+_JOLIET_ESCAPE_SEQUENCE = "%/E"
+_JOLIET_MAX_NAME_LENGTH = 64
+
+_FILE_FLAG_DIRECTORY = 2
+
+
+def _both_endian_16(value):
+    return struct.pack("<H", value) + struct.pack(">H", value)
+
+
+def _both_endian_32(value):
+    return struct.pack("<I", value) + struct.pack(">I", value)
+
+
+def _get_num_sectors(size):
+    return (size + SECTOR_SIZE - 1) // SECTOR_SIZE
+
+
+def _pad_sector(data):
+    return data + "\0" * (_get_num_sectors(len(data)) * SECTOR_SIZE -
+                          len(data))
+
+
+def _get_record_date(t):
+    return struct.pack("BBBBBBb", t.tm_year - 1900, t.tm_mon, t.tm_mday,
+                       t.tm_hour, t.tm_min, t.tm_sec, 0)
+
+
+def _get_volume_date(t):
+    return time.strftime("%Y%m%d%H%M%S00", t) + "\0"
+
+
+class _Node(object):
+    def __init__(self, name, parent=None, contents=None, digest=None):
+        self.name = name
+        self.parent = parent
+        self.contents = contents
+        self.digest = digest
+        self.children = {}
+        # Per hierarchy (primary, Joliet) names, extents and sizes
+        self.identifiers = [None, None]
+        self.extents = [0, 0]
+        self.sizes = [0, 0]
+        self.numbers = [0, 0]
+
+    def is_dir(self):
+        return self.contents is None
+
+
+def _get_primary_identifier(name, is_dir, used_identifiers):
+    # ISO 9660 level 1: d-characters only, 8.3 file names
+    name = re.sub(r"[^A-Z0-9_.]", "_", name.upper())
+    if is_dir:
+        base, ext = name.replace(".", "_")[:8], ""
+    else:
+        base, sep, ext = name.rpartition(".")
+        if not sep:
+            base, ext = ext, ""
+        base = base.replace(".", "_")[:8]
+        ext = ext[:3]
+
+    i = 0
+    while True:
+        identifier = base
+        if ext:
+            identifier += "." + ext
+        if not is_dir:
+            identifier += ";1"
+        if identifier not in used_identifiers:
+            return identifier
+        i += 1
+        suffix = str(i)
+        base = base[:8 - len(suffix)] + suffix
+
+
+def _get_joliet_identifier(name):
+    if isinstance(name, str):
+        name = name.decode("utf-8")
+    return name[:_JOLIET_MAX_NAME_LENGTH].encode("utf-16-be")
+
+
+class ISOWriter(object):
+    """Writes ISO 9660 images including a Joliet hierarchy.
+
+    The primary hierarchy uses ISO 9660 level 1 names, while the Joliet
+    one preserves the original names (up to 64 characters). Both
+    hierarchies reference the same file extents and files with identical
+    contents are written only once.
+    """
+
+    def __init__(self, volume_id):
+        self._volume_id = volume_id
+        self._root = _Node("")
+        self._time = time.gmtime()
+
+    def _get_dir(self, path_parts):
+        node = self._root
+        for part in path_parts:
+            child = node.children.get(part)
+            if not child:
+                child = _Node(part, node)
+                node.children[part] = child
+            elif not child.is_dir():
+                raise utils.VixException(_("Path conflicts with a file: %s") %
+                                         "/".join(path_parts))
+            node = child
+        return node
+
+    def add_file(self, path, contents):
+        parts = [p for p in path.split("/") if p]
+        if not parts:
+            raise utils.VixException(_("Invalid file path: %s") % path)
+
+        parent = self._get_dir(parts[:-1])
+        if parts[-1] in parent.children:
+            raise utils.VixException(_("Duplicate file path: %s") % path)
+
+        digest = hashlib.sha1(contents).digest()
+        parent.children[parts[-1]] = _Node(parts[-1], parent, contents,
+                                           digest)
+
+    def _get_dirs(self, hierarchy):
+        # Path table order: by level, then by parent number and identifier
+        dirs = [self._root]
+        i = 0
+        while i < len(dirs):
+            node = dirs[i]
+            node.numbers[hierarchy] = i + 1
+            dirs += [c for c in self._get_sorted_children(node, hierarchy)
+                     if c.is_dir()]
+            i += 1
+        return dirs
+
+    def _get_sorted_children(self, node, hierarchy):
+        return sorted(node.children.values(),
+                      key=lambda c: c.identifiers[hierarchy])
+
+    def _assign_identifiers(self, node):
+        used_identifiers = set()
+        for name in sorted(node.children):
+            child = node.children[name]
+            identifier = _get_primary_identifier(name, child.is_dir(),
+                                                 used_identifiers)
+            used_identifiers.add(identifier)
+            child.identifiers = [identifier, _get_joliet_identifier(name)]
+            if child.is_dir():
+                self._assign_identifiers(child)
+
+    def _get_dir_record(self, node, identifier, hierarchy):
+        if node.is_dir():
+            extent = node.extents[hierarchy]
+            size = node.sizes[hierarchy]
+            flags = _FILE_FLAG_DIRECTORY
+        else:
+            extent = node.extents[0]
+            size = len(node.contents)
+            flags = 0
+
+        record_len = 33 + len(identifier)
+        if record_len % 2:
+            record_len += 1
+
+        record = (struct.pack("BB", record_len, 0) +
+                  _both_endian_32(extent) +
+                  _both_endian_32(size) +
+                  _get_record_date(self._time) +
+                  struct.pack("BBB", flags, 0, 0) +
+                  _both_endian_16(1) +
+                  struct.pack("B", len(identifier)) +
+                  identifier)
+        return record + "\0" * (record_len - len(record))
+
+    def _get_dir_records(self, node, hierarchy):
+        parent = node.parent or node
+        records = [self._get_dir_record(node, "\0", hierarchy),
+                   self._get_dir_record(parent, "\1", hierarchy)]
+        for child in self._get_sorted_children(node, hierarchy):
+            records.append(self._get_dir_record(
+                child, child.identifiers[hierarchy], hierarchy))
+
+        # Directory records cannot span sector boundaries
+        data = ""
+        for record in records:
+            sector_left = SECTOR_SIZE - len(data) % SECTOR_SIZE
+            if len(record) > sector_left:
+                data += "\0" * sector_left
+            data += record
+        return _pad_sector(data)
+
+    def _get_dir_extent_size(self, node, hierarchy):
+        # Extents are not assigned yet, only the size is needed
+        return len(self._get_dir_records(node, hierarchy))
+
+    def _get_path_table(self, dirs, hierarchy, big_endian):
+        fmt = ">IH" if big_endian else "<IH"
+        data = ""
+        for node in dirs:
+            identifier = node.identifiers[hierarchy] or "\0"
+            if node.parent:
+                parent_number = node.parent.numbers[hierarchy]
+            else:
+                parent_number = 1
+            data += (struct.pack("BB", len(identifier), 0) +
+                     struct.pack(fmt, node.extents[hierarchy],
+                                 parent_number) +
+                     identifier)
+            if len(identifier) % 2:
+                data += "\0"
+        return data
+
+    def _get_volume_descriptor(self, vd_type, num_sectors, root,
+                               path_table_size, l_path_table_extent,
+                               m_path_table_extent, hierarchy):
+        if vd_type == _VD_TYPE_SUPPLEMENTARY:
+            def text(value, length):
+                # UCS-2 big endian, padded with spaces
+                value = value.encode("utf-16-be")[:length]
+                return (value + "\0 " * length)[:length]
+            escape_sequences = _JOLIET_ESCAPE_SEQUENCE
+        else:
+            def text(value, length):
+                return value[:length].ljust(length)
+            escape_sequences = ""
+
+        date = _get_volume_date(self._time)
+        no_date = "0" * 16 + "\0"
+
+        data = (struct.pack("B", vd_type) + "CD001" +
+                struct.pack("BB", 1, 0) +
+                text("", 32) +
+                text(self._volume_id, 32) +
+                "\0" * 8 +
+                _both_endian_32(num_sectors) +
+                escape_sequences.ljust(32, "\0") +
+                _both_endian_16(1) +
+                _both_endian_16(1) +
+                _both_endian_16(SECTOR_SIZE) +
+                _both_endian_32(path_table_size) +
+                struct.pack("<II", l_path_table_extent, 0) +
+                struct.pack(">II", m_path_table_extent, 0) +
+                self._get_dir_record(root, "\0", hierarchy) +
+                text("", 128) +
+                text("", 128) +
+                text("", 128) +
+                text("", 128) +
+                text("", 37) +
+                text("", 37) +
+                text("", 37) +
+                date + date + no_date + date +
+                struct.pack("BB", 1, 0))
+        return _pad_sector(data)
+
+    def _get_terminator(self):
+        return _pad_sector(struct.pack("B", _VD_TYPE_TERMINATOR) + "CD001" +
+                           struct.pack("B", 1))
+
+    def write(self, path):
+        self._assign_identifiers(self._root)
+        hierarchy_dirs = [self._get_dirs(0), self._get_dirs(1)]
+
+        # Volume descriptors: primary, Joliet and terminator
+        extent = _SYSTEM_AREA_SECTORS + 3
+
+        path_table_sizes = []
+        path_table_extents = []
+        for hierarchy in [0, 1]:
+            size = len(self._get_path_table(hierarchy_dirs[hierarchy],
+                                            hierarchy, False))
+            path_table_sizes.append(size)
+            # Little endian and big endian path tables
+            path_table_extents.append(
+                (extent, extent + _get_num_sectors(size)))
+            extent += 2 * _get_num_sectors(size)
+
+        for hierarchy in [0, 1]:
+            for node in hierarchy_dirs[hierarchy]:
+                node.sizes[hierarchy] = self._get_dir_extent_size(node,
+                                                                  hierarchy)
+                node.extents[hierarchy] = extent
+                extent += node.sizes[hierarchy] // SECTOR_SIZE
+
+        # Files with the same contents share the same extent
+        files = []
+        file_extents = {}
+        for node in hierarchy_dirs[0]:
+            for child in self._get_sorted_children(node, 0):
+                if child.is_dir():
+                    continue
+                if not child.contents:
+                    child.extents[0] = 0
+                elif child.digest in file_extents:
+                    child.extents[0] = file_extents[child.digest]
+                else:
+                    child.extents[0] = extent
+                    file_extents[child.digest] = extent
+                    files.append(child)
+                    extent += _get_num_sectors(len(child.contents))
+        num_sectors = extent
+
+        with open(path, 'wb') as f:
+            f.write("\0" * SECTOR_SIZE * _SYSTEM_AREA_SECTORS)
+            f.write(self._get_volume_descriptor(
+                _VD_TYPE_PRIMARY, num_sectors, self._root,
+                path_table_sizes[0], path_table_extents[0][0],
+                path_table_extents[0][1], 0))
+            f.write(self._get_volume_descriptor(
+                _VD_TYPE_SUPPLEMENTARY, num_sectors, self._root,
+                path_table_sizes[1], path_table_extents[1][0],
+                path_table_extents[1][1], 1))
+            f.write(self._get_terminator())
+
+            for hierarchy in [0, 1]:
+                for big_endian in [False, True]:
+                    f.write(_pad_sector(self._get_path_table(
+                        hierarchy_dirs[hierarchy], hierarchy, big_endian)))
+
+            for hierarchy in [0, 1]:
+                for node in hierarchy_dirs[hierarchy]:
+                    f.write(self._get_dir_records(node, hierarchy))
+
+            for node in files:
+                f.write(_pad_sector(node.contents))
+
+
+def write_iso(path, files, volume_id):
+    """Writes an ISO image containing the given (path, contents) files."""
+    writer = ISOWriter(volume_id)
+    for (file_path, contents) in files:
+        writer.add_file(file_path, contents)
+    writer.write(path)
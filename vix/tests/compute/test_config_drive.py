@@ -0,0 +1,75 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+import unittest
+
+from nova import exception
+
+from vix.compute import config_drive
+
+
+class ConfigDriveBuilderTestCase(unittest.TestCase):
+    """Unit tests for the config drive builder"""
+
+    def setUp(self):
+        self._builder = config_drive.ConfigDriveBuilder()
+        self._builder._pathutils = mock.MagicMock()
+        self._builder._pathutils.get_config_drive_path.return_value = (
+            'fake/configdrive/path')
+
+    @mock.patch('vix.isoutils.write_iso')
+    @mock.patch('nova.api.metadata.base.InstanceMetadata')
+    def _test_create_config_drive(self, mock_instance_metadata,
+                                  mock_write_iso, inject_password):
+        fake_instance = {'name': 'fake_name'}
+        fake_injected_files = [('/etc/fake', 'fake_contents')]
+        config_drive.CONF.set_override('config_drive_inject_password',
+                                       inject_password, 'vix')
+        self.addCleanup(config_drive.CONF.clear_override,
+                        'config_drive_inject_password', 'vix')
+
+        response = self._builder.create_config_drive(
+            fake_instance, fake_injected_files, 'fake_password')
+
+        if inject_password:
+            expected_extra_md = {'admin_pass': 'fake_password'}
+        else:
+            expected_extra_md = {}
+        mock_instance_metadata.assert_called_once_with(
+            fake_instance, content=fake_injected_files,
+            extra_md=expected_extra_md)
+        inst_md = mock_instance_metadata.return_value
+        mock_write_iso.assert_called_once_with(
+            'fake/configdrive/path', inst_md.metadata_for_config_drive(),
+            config_drive.CONFIG_DRIVE_VOLUME_ID)
+        self.assertEqual(response, 'fake/configdrive/path')
+
+    def test_create_config_drive(self):
+        self._test_create_config_drive(inject_password=False)
+
+    def test_create_config_drive_inject_password(self):
+        self._test_create_config_drive(inject_password=True)
+
+    def test_create_config_drive_unsupported_format(self):
+        config_drive.CONF.set_override('config_drive_format', 'vfat')
+        self.addCleanup(config_drive.CONF.clear_override,
+                        'config_drive_format')
+
+        self.assertRaises(exception.ConfigDriveUnsupportedFormat,
+                          self._builder.create_config_drive,
+                          {'name': 'fake_name'}, [], None)
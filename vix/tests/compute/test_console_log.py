@@ -0,0 +1,166 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import io
+import mock
+import os
+import unittest
+
+from vix.compute import console_log
+
+
+class ConsoleLogTestCase(unittest.TestCase):
+    """Unit tests for the instance console logs"""
+
+    def setUp(self):
+        self._console_log = console_log.ConsoleLog()
+        self._console_log._pathutils = mock.MagicMock()
+        self._console_log._pathutils.get_console_log_path.return_value = (
+            'fake/console.log')
+
+    def test_read_tail(self):
+        with mock.patch('vix.compute.console_log.open',
+                        create=True) as mock_open:
+            mock_open.return_value = io.BytesIO("0123456789")
+            response = console_log.read_tail('fake/path', 4)
+
+        mock_open.assert_called_once_with('fake/path', 'rb')
+        self.assertEqual(response, "6789")
+
+    @mock.patch('os.path.exists')
+    def test_read_tail_not_found(self, mock_exists):
+        mock_exists.return_value = False
+
+        with mock.patch('vix.compute.console_log.open',
+                        create=True) as mock_open:
+            mock_open.side_effect = IOError()
+            response = console_log.read_tail('fake/path', 4)
+
+        self.assertEqual(response, "")
+
+    @mock.patch('vix.compute.console_log.read_tail')
+    def _test_get_console_output(self, mock_read_tail, log_length):
+        log = "a" * log_length
+        rotated_log = "b" * console_log.MAX_CONSOLE_BYTES
+        mock_read_tail.side_effect = lambda path, max_bytes: (
+            {'fake/console.log': log,
+             'fake/console.log.0': rotated_log}[path][-max_bytes:])
+
+        response = self._console_log.get_console_output('fake_name')
+
+        self._console_log._pathutils.get_console_log_path.assert_called_with(
+            'fake_name')
+        self.assertEqual(len(response), console_log.MAX_CONSOLE_BYTES)
+        self.assertTrue(response.endswith(log))
+        return mock_read_tail
+
+    def test_get_console_output(self):
+        mock_read_tail = self._test_get_console_output(
+            log_length=console_log.MAX_CONSOLE_BYTES)
+        mock_read_tail.assert_called_once_with(
+            'fake/console.log', console_log.MAX_CONSOLE_BYTES)
+
+    def test_get_console_output_rotated(self):
+        mock_read_tail = self._test_get_console_output(log_length=10)
+        mock_read_tail.assert_called_with(
+            'fake/console.log.0', console_log.MAX_CONSOLE_BYTES - 10)
+
+    @mock.patch('os.path.getsize')
+    def _test_rotate(self, mock_getsize, log_size):
+        console_log.CONF.set_override('console_log_max_size_mb', 1, 'vix')
+        self.addCleanup(console_log.CONF.clear_override,
+                        'console_log_max_size_mb', 'vix')
+        self._console_log._pathutils.exists.return_value = True
+        mock_getsize.return_value = log_size
+
+        self._console_log.rotate('fake_name')
+
+        mock_getsize.assert_called_once_with('fake/console.log')
+        pathutils = self._console_log._pathutils
+        if log_size > 1024 * 1024:
+            pathutils.check_remove.assert_called_once_with(
+                'fake/console.log.0')
+            pathutils.rename.assert_called_once_with('fake/console.log',
+                                                     'fake/console.log.0')
+        else:
+            self.assertFalse(pathutils.rename.called)
+
+    def test_rotate(self):
+        self._test_rotate(log_size=1024 * 1024 + 1)
+
+    def test_rotate_not_needed(self):
+        self._test_rotate(log_size=1024 * 1024)
+
+    @mock.patch('os.stat')
+    def test_get_log_size_sparse(self, mock_stat):
+        mock_stat.return_value.st_size = 4096
+        mock_stat.return_value.st_blocks = 2
+
+        response = self._console_log._get_log_size('fake/console.log')
+
+        mock_stat.assert_called_once_with('fake/console.log')
+        self.assertEqual(response, 1024)
+
+    @mock.patch('vix.compute.console_log.read_tail')
+    def test_truncate(self, mock_read_tail):
+        mock_read_tail.return_value = "\0\0fake_tail"
+        rotated_log = mock.MagicMock()
+        log = mock.MagicMock()
+
+        with mock.patch('vix.compute.console_log.open',
+                        create=True) as mock_open:
+            mock_open.side_effect = [rotated_log, log]
+            self._console_log._truncate('fake/console.log')
+
+        mock_read_tail.assert_called_once_with(
+            'fake/console.log', self._console_log._get_max_size())
+        self.assertEqual(mock_open.call_args_list,
+                         [mock.call('fake/console.log.0', 'wb'),
+                          mock.call('fake/console.log', 'r+b')])
+        rotated_log.__enter__.return_value.write.assert_called_once_with(
+            "fake_tail")
+        log.__enter__.return_value.truncate.assert_called_once_with()
+
+    @mock.patch('os.listdir')
+    @mock.patch('os.path.isfile')
+    @mock.patch('os.path.isdir')
+    def test_truncate_logs(self, mock_isdir, mock_isfile, mock_listdir):
+        self._console_log._pathutils.get_console_log_path.side_effect = (
+            lambda instance_name: os.path.join(instance_name, 'console.log'))
+        mock_isdir.return_value = True
+        mock_isfile.return_value = True
+        mock_listdir.return_value = ['small', 'large', 'failed']
+        log_sizes = {'small': 1, 'large': 2 ** 30, 'failed': 2 ** 30}
+        self._console_log._get_log_size = mock.MagicMock(
+            side_effect=lambda log_path: log_sizes[os.path.dirname(log_path)])
+        self._console_log._truncate = mock.MagicMock(
+            side_effect=[None, IOError()])
+
+        self._console_log.truncate_logs()
+
+        self.assertEqual(self._console_log._truncate.call_args_list,
+                         [mock.call(os.path.join('large', 'console.log')),
+                          mock.call(os.path.join('failed', 'console.log'))])
+
+    @mock.patch('os.path.isdir')
+    def test_truncate_logs_no_instances_dir(self, mock_isdir):
+        mock_isdir.return_value = False
+
+        self._console_log.truncate_logs()
+
+        pathutils = self._console_log._pathutils
+        self.assertFalse(pathutils.get_console_log_path.called)
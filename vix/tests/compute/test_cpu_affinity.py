@@ -0,0 +1,121 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+import unittest
+
+from nova.openstack.common import processutils
+
+from vix.compute import cpu_affinity
+
+
+class CoreAllocatorTestCase(unittest.TestCase):
+    """Unit tests for the host CPU core allocator"""
+
+    def setUp(self):
+        self._resource_index = mock.MagicMock()
+        self._allocator = cpu_affinity.CoreAllocator(self._resource_index)
+
+    def test_get_vmx_config(self):
+        response = cpu_affinity.get_vmx_config([1, 2], 4)
+        self.assertEqual(response, {"processor0.use": "FALSE",
+                                    "processor3.use": "FALSE"})
+
+    def test_get_vmx_cores(self):
+        response = cpu_affinity.get_vmx_cores(
+            {"processor0.use": "FALSE", "processor3.use": "false"}, 4)
+        self.assertEqual(response, [1, 2])
+
+    def test_get_vmx_cores_none(self):
+        response = cpu_affinity.get_vmx_cores({"numvcpus": "2"}, 4)
+        self.assertIsNone(response)
+
+    @mock.patch('vix.utils.get_cpu_count')
+    def test_allocate(self, mock_get_cpu_count):
+        mock_get_cpu_count.return_value = 4
+        self._resource_index.get_cpu_affinities.return_value = [[0, 1], [0]]
+
+        response = self._allocator.allocate(2)
+
+        self.assertEqual(response, [2, 3])
+
+    @mock.patch('vix.utils.get_cpu_count')
+    def test_allocate_all_cores(self, mock_get_cpu_count):
+        mock_get_cpu_count.return_value = 2
+
+        response = self._allocator.allocate(2)
+
+        self.assertIsNone(response)
+        self.assertFalse(self._resource_index.get_cpu_affinities.called)
+
+    @mock.patch('vix.utils.get_cpu_count')
+    def _test_get_vmx_config(self, mock_get_cpu_count, extra_specs):
+        mock_get_cpu_count.return_value = 4
+        self._resource_index.get_cpu_affinities.return_value = [[0]]
+        fake_instance = {'name': 'fake_name', 'vcpus': 2}
+
+        return self._allocator.get_vmx_config(fake_instance, extra_specs)
+
+    def test_get_instance_vmx_config(self):
+        response = self._test_get_vmx_config(
+            extra_specs={cpu_affinity.EXTRA_SPEC: "true"})
+        self.assertEqual(response, {"processor0.use": "FALSE",
+                                    "processor3.use": "FALSE"})
+
+    def test_get_instance_vmx_config_disabled(self):
+        response = self._test_get_vmx_config(extra_specs={})
+        self.assertEqual(response, {})
+
+    def _set_override(self, name, value):
+        cpu_affinity.CONF.set_override(name, value, 'vix')
+        self.addCleanup(cpu_affinity.CONF.clear_override, name, 'vix')
+
+    @mock.patch('nova.utils.execute')
+    @mock.patch('vix.compute.diagnostics.get_vmx_process_ids')
+    def _test_apply_process_affinity(self, mock_get_vmx_process_ids,
+                                     mock_execute, taskset=True,
+                                     platform='linux2', execute_error=None):
+        self._set_override('cpu_affinity_taskset', taskset)
+        self._resource_index.get_cpu_affinity.return_value = [1, 2]
+        mock_get_vmx_process_ids.return_value = [10]
+        mock_execute.side_effect = execute_error
+
+        with mock.patch('sys.platform', platform):
+            self._allocator.apply_process_affinity('fake/vmx/path')
+
+        return mock_execute
+
+    def test_apply_process_affinity(self):
+        mock_execute = self._test_apply_process_affinity()
+
+        self._resource_index.get_cpu_affinity.assert_called_once_with(
+            'fake/vmx/path')
+        mock_execute.assert_called_once_with('taskset', '-a', '-p', '-c',
+                                             '1,2', '10', run_as_root=True)
+
+    def test_apply_process_affinity_failure(self):
+        mock_execute = self._test_apply_process_affinity(
+            execute_error=processutils.ProcessExecutionError())
+        self.assertTrue(mock_execute.called)
+
+    def test_apply_process_affinity_disabled(self):
+        mock_execute = self._test_apply_process_affinity(taskset=False)
+        self.assertFalse(mock_execute.called)
+
+    def test_apply_process_affinity_other_platform(self):
+        mock_execute = self._test_apply_process_affinity(platform='win32')
+        self.assertFalse(mock_execute.called)
@@ -0,0 +1,162 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import io
+import mock
+import unittest
+
+from vix.compute import dhcpleases
+
+_LEASE_1 = """
+lease 192.168.1.128 {
+\tstarts 4 2013/10/17 10:00:00;
+\tends 4 2037/10/17 10:30:00;
+\thardware ethernet 00:0C:29:AA:BB:01;
+}
+"""
+
+_LEASE_2 = """
+# A comment
+lease 192.168.1.129 {
+\tstarts 4 2013/10/17 10:00:00;
+\tends never;
+\thardware ethernet 00:0c:29:aa:bb:02;
+}
+"""
+
+_LEASE_EXPIRED = """
+lease 192.168.1.130 {
+\tstarts 4 2013/10/17 10:00:00;
+\tends 4 2013/10/17 10:30:00;
+\thardware ethernet 00:0c:29:aa:bb:03;
+}
+"""
+
+_LEASE_REASSIGNED = """
+lease 192.168.1.128 {
+\tends never;
+\thardware ethernet 00:0c:29:aa:bb:04;
+}
+"""
+
+_LEASE_INCOMPLETE = """
+lease 192.168.1.131 {
+\tends never;
+"""
+
+
+class DHCPLeasesTestCase(unittest.TestCase):
+    """Unit tests for the DHCP leases index"""
+
+    def setUp(self):
+        self._leases = dhcpleases.DHCPLeases('fake_dir/fake.leases')
+        # Disable inotify, changes are detected with os.stat
+        self._leases._watch_failed = True
+        self._data = ""
+        self._ino = 1
+
+    def _get_ip_address(self, mac_address):
+        fake_stat = mock.MagicMock()
+        fake_stat.st_dev = 1
+        fake_stat.st_ino = self._ino
+        fake_stat.st_size = len(self._data)
+
+        with mock.patch('os.stat', return_value=fake_stat):
+            with mock.patch('vix.compute.dhcpleases.open',
+                            create=True) as mock_open:
+                mock_open.side_effect = lambda *args: io.BytesIO(self._data)
+                return self._leases.get_ip_address(mac_address)
+
+    def test_parse_leases(self):
+        data = _LEASE_1 + _LEASE_2 + _LEASE_INCOMPLETE
+        (leases, parsed_length) = dhcpleases.parse_leases(data)
+
+        self.assertEqual(leases, [
+            ('192.168.1.128', '00:0c:29:aa:bb:01', 2139388200),
+            ('192.168.1.129', '00:0c:29:aa:bb:02', None)])
+        self.assertEqual(parsed_length, len(_LEASE_1 + _LEASE_2) - 1)
+
+    def test_get_ip_address(self):
+        self._data = _LEASE_1 + _LEASE_2 + _LEASE_EXPIRED
+
+        self.assertEqual(self._get_ip_address('00:0c:29:aa:bb:01'),
+                         '192.168.1.128')
+        self.assertEqual(self._get_ip_address('00:0C:29:AA:BB:02'),
+                         '192.168.1.129')
+        self.assertIsNone(self._get_ip_address('00:0c:29:aa:bb:03'))
+        self.assertIsNone(self._get_ip_address('00:0c:29:aa:bb:05'))
+
+    def test_get_ip_address_incremental(self):
+        self._data = _LEASE_1 + _LEASE_INCOMPLETE
+        self.assertIsNone(self._get_ip_address('00:0c:29:aa:bb:02'))
+        offset = self._leases._offset
+
+        self._data += "\thardware ethernet 00:0c:29:aa:bb:02;\n}\n"
+        self._data += _LEASE_REASSIGNED
+
+        self.assertEqual(self._get_ip_address('00:0c:29:aa:bb:02'),
+                         '192.168.1.131')
+        self.assertTrue(self._leases._offset > offset)
+        # The lease of the reassigned IP address is superseded
+        self.assertIsNone(self._get_ip_address('00:0c:29:aa:bb:01'))
+        self.assertEqual(self._get_ip_address('00:0c:29:aa:bb:04'),
+                         '192.168.1.128')
+
+    def test_get_ip_address_mac_releases(self):
+        lease = "lease %s {\n\tends never;\n\thardware ethernet %s;\n}\n"
+        self._data = (lease % ('192.168.1.5', '00:0c:29:aa:bb:01') +
+                      lease % ('192.168.1.6', '00:0c:29:aa:bb:01') +
+                      lease % ('192.168.1.5', '00:0c:29:aa:bb:02'))
+
+        # The previous lease of the first MAC address does not supersede
+        # its current one
+        self.assertEqual(self._get_ip_address('00:0c:29:aa:bb:01'),
+                         '192.168.1.6')
+        self.assertEqual(self._get_ip_address('00:0c:29:aa:bb:02'),
+                         '192.168.1.5')
+        self.assertEqual(self._leases._mac_addresses,
+                         {'192.168.1.5': '00:0c:29:aa:bb:02',
+                          '192.168.1.6': '00:0c:29:aa:bb:01'})
+
+    def test_get_ip_address_rewritten(self):
+        self._data = _LEASE_1
+        self.assertEqual(self._get_ip_address('00:0c:29:aa:bb:01'),
+                         '192.168.1.128')
+
+        self._ino = 2
+        self._data = _LEASE_2
+        self.assertIsNone(self._get_ip_address('00:0c:29:aa:bb:01'))
+        self.assertEqual(self._get_ip_address('00:0c:29:aa:bb:02'),
+                         '192.168.1.129')
+
+    def test_get_ip_address_no_file(self):
+        with mock.patch('os.stat', side_effect=OSError):
+            self.assertIsNone(
+                self._leases.get_ip_address('00:0c:29:aa:bb:01'))
+
+    def test_get_ip_address_watch_unchanged(self):
+        self._leases._file_id = (1, 1)
+        self._leases._ip_addresses['00:0c:29:aa:bb:01'] = ('192.168.1.128',
+                                                           None)
+        self._leases._watch = mock.MagicMock()
+        self._leases._watch.has_changed.return_value = False
+
+        with mock.patch('os.stat') as mock_stat:
+            response = self._leases.get_ip_address('00:0c:29:aa:bb:01')
+
+        self.assertEqual(response, '192.168.1.128')
+        self.assertFalse(mock_stat.called)
@@ -0,0 +1,85 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+import unittest
+
+from vix.compute import diagnostics
+
+
+class VMXProcessDiagnosticsTestCase(unittest.TestCase):
+    """Unit tests for the vmware-vmx process diagnostics"""
+
+    def setUp(self):
+        self._conn = mock.MagicMock()
+        self._conn.list_running_vms.return_value = ['/instances/a/a.vmx',
+                                                    '/instances/b/b.vmx']
+        self._diagnostics = diagnostics.VMXProcessDiagnostics(self._conn,
+                                                              ttl=10)
+
+    def _get_process_info(self, pid, vmx_path, cpu_time, read_bytes):
+        return {"pid": pid,
+                "cmdline": ["vmware-vmx", "-s", "fake=1", vmx_path],
+                "cpu_time": cpu_time,
+                "rss": 1024,
+                "read_bytes": read_bytes,
+                "write_bytes": None}
+
+    @mock.patch('time.time')
+    @mock.patch('vix.utils.get_processes_info')
+    def test_get_diagnostics(self, mock_get_processes_info, mock_time):
+        mock_get_processes_info.side_effect = [
+            [self._get_process_info(1, '/instances/a/a.vmx', 1.0, 100),
+             self._get_process_info(2, '/other/c.vmx', 1.0, 100)],
+            [self._get_process_info(1, '/instances/a/a.vmx', 6.0, 2100),
+             self._get_process_info(3, '/instances/b/b.vmx', 1.0, 100)]]
+
+        responses = []
+        for now in [100, 105, 110]:
+            mock_time.return_value = now
+            responses.append(self._diagnostics.get_diagnostics(
+                '/instances/a/a.vmx'))
+        response_b = self._diagnostics.get_diagnostics('/instances/b/b.vmx')
+        response_c = self._diagnostics.get_diagnostics('/other/c.vmx')
+
+        mock_get_processes_info.assert_called_with(
+            diagnostics.VMX_PROCESS_NAMES)
+        self.assertEqual(mock_get_processes_info.call_count, 2)
+        self.assertEqual(responses[0], {"cpu_time": 1.0,
+                                        "memory_rss": 1024,
+                                        "disk_read_bytes": 100,
+                                        "disk_write_bytes": None})
+        self.assertIs(responses[0], responses[1])
+        self.assertEqual(responses[2], {"cpu_time": 6.0,
+                                        "cpu_percent": 50.0,
+                                        "memory_rss": 1024,
+                                        "disk_read_bytes": 2100,
+                                        "disk_read_bytes_rate": 200.0,
+                                        "disk_write_bytes": None,
+                                        "disk_write_bytes_rate": None})
+        self.assertNotIn("cpu_percent", response_b)
+        self.assertIsNone(response_c)
+
+    @mock.patch('vix.utils.get_processes_info')
+    def test_get_vmx_process_ids(self, mock_get_processes_info):
+        mock_get_processes_info.return_value = [
+            self._get_process_info(1, '/instances/a/a.vmx', 1.0, 100),
+            self._get_process_info(2, '/instances/b/b.vmx', 1.0, 100)]
+
+        response = diagnostics.get_vmx_process_ids('/instances/b/./b.vmx')
+
+        self.assertEqual(response, [2])
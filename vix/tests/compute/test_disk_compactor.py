@@ -0,0 +1,135 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+import unittest
+
+from vix.compute import disk_compactor
+from vix import vixlib
+from vix import vixutils
+
+
+class DiskCompactorTestCase(unittest.TestCase):
+    """Unit tests for the DiskCompactor class"""
+
+    def setUp(self):
+        self._conn = mock.MagicMock()
+        self._disk_compactor = disk_compactor.DiskCompactor(self._conn)
+        self._disk_compactor._pathutils = mock.MagicMock()
+        self._disk_compactor._disk_manager = mock.MagicMock()
+
+    @mock.patch('vix.vixutils.load_config_file_values')
+    def test_get_vm_disk_paths(self, mock_load_config_file_values):
+        mock_load_config_file_values.return_value = {
+            'scsi0:0.fileName': 'root-000001.vmdk',
+            'scsi0:1.fileName': '/fake/dir/ephemeral.vmdk',
+            'ide1:0.fileName': 'fake.iso',
+            'displayName': 'fake'}
+
+        response = self._disk_compactor._get_vm_disk_paths(
+            '/fake/dir/fake.vmx')
+
+        self.assertEqual(sorted(response), ['/fake/dir/ephemeral.vmdk',
+                                            '/fake/dir/root-000001.vmdk'])
+
+    @mock.patch('os.path.getsize')
+    @mock.patch('os.listdir')
+    def test_get_disk_files_size(self, mock_listdir, mock_getsize):
+        mock_listdir.return_value = ['root.vmdk', 'root-s001.vmdk',
+                                     'fake.vmx']
+        mock_getsize.return_value = 1024
+
+        response = self._disk_compactor._get_disk_files_size('fake/dir')
+
+        self.assertEqual(response, 2048)
+
+    def _test_is_compactable(self, power_state, expected, snapshots=None):
+        fake_vm = self._conn.open_vm.return_value.__enter__.return_value
+        fake_vm.get_power_state.return_value = power_state
+        fake_vm.snapshot_tree.return_value = vixutils.SnapshotTree(
+            snapshots or [])
+
+        response = self._disk_compactor._is_compactable('fake/path')
+
+        self._conn.open_vm.assert_called_with('fake/path')
+        self.assertEqual(response, expected)
+
+    def test_is_compactable_powered_off(self):
+        self._test_is_compactable(vixlib.VIX_POWERSTATE_POWERED_OFF, True)
+
+    def test_is_compactable_suspended(self):
+        self._test_is_compactable(vixlib.VIX_POWERSTATE_SUSPENDED, True)
+
+    def test_is_compactable_powered_on(self):
+        self._test_is_compactable(vixlib.VIX_POWERSTATE_POWERED_ON |
+                                  vixlib.VIX_POWERSTATE_TOOLS_RUNNING, False)
+
+    def test_is_compactable_snapshots(self):
+        self._test_is_compactable(
+            vixlib.VIX_POWERSTATE_POWERED_OFF, False,
+            snapshots=[vixutils.SnapshotTreeNode('fake_name', '')])
+
+    def test_compact_vm_disks(self):
+        fake_vmx_path = 'fake/dir/fake.vmx'
+        fake_disk_path = 'fake/dir/root.vmdk'
+        self._disk_compactor._get_vm_disk_paths = mock.MagicMock(
+            return_value=[fake_disk_path])
+        self._disk_compactor._get_disk_files_size = mock.MagicMock(
+            side_effect=[3072, 1024])
+
+        response = self._disk_compactor.compact_vm_disks(fake_vmx_path)
+
+        self._disk_compactor._disk_manager.compact_disk.assert_called_with(
+            fake_disk_path)
+        self.assertEqual(response, 2048)
+
+    def _test_compact_instance_disks(self, io_rate_mb):
+        fake_vmx_paths = ['fake/path1', 'fake/path2']
+        self._disk_compactor._get_instance_vmx_paths = mock.MagicMock(
+            return_value=fake_vmx_paths)
+        self._disk_compactor._is_compactable = mock.MagicMock(
+            side_effect=[True, False])
+        self._disk_compactor._get_host_io_rate_mb = mock.MagicMock(
+            return_value=io_rate_mb)
+        self._disk_compactor.compact_vm_disks = mock.MagicMock(
+            return_value=1024)
+
+        response = self._disk_compactor.compact_instance_disks()
+
+        if io_rate_mb > disk_compactor.CONF.vix.disk_compaction_max_host_io_mb:
+            self.assertFalse(self._disk_compactor.compact_vm_disks.called)
+            self.assertEqual(response, 0)
+        else:
+            self._disk_compactor.compact_vm_disks.assert_called_once_with(
+                'fake/path1')
+            self.assertEqual(response, 1024)
+
+    def test_compact_instance_disks(self):
+        self._test_compact_instance_disks(io_rate_mb=0)
+
+    def test_compact_instance_disks_high_io(self):
+        self._test_compact_instance_disks(io_rate_mb=1024)
+
+    def test_compact_instance_disks_not_supported(self):
+        self._disk_compactor._disk_manager.check_compact_disk_supported = (
+            mock.MagicMock(return_value=False))
+        self._disk_compactor._get_instance_vmx_paths = mock.MagicMock()
+
+        response = self._disk_compactor.compact_instance_disks()
+
+        self.assertFalse(self._disk_compactor._get_instance_vmx_paths.called)
+        self.assertEqual(response, 0)
@@ -22,6 +22,7 @@ import unittest
 
 from nova.compute import task_states
 from nova.openstack.common import jsonutils
+from nova.openstack.common import loopingcall
 from oslo.config import cfg
 from vix.compute import driver
 from vix import utils
@@ -41,6 +42,44 @@ class VixDriverTestCase(unittest.TestCase):
         self._driver._pathutils = mock.MagicMock()
         self._driver._image_cache = mock.MagicMock()
         self._driver._conn = mock.MagicMock()
+        self._driver._console_log = mock.MagicMock()
+        self._driver._screen_capture = mock.MagicMock()
+        self._driver._resource_index = mock.MagicMock()
+        self._driver._host_metrics = mock.MagicMock()
+        self._driver._diagnostics = mock.MagicMock()
+        self._driver._core_allocator = mock.MagicMock()
+
+    @mock.patch('nova.openstack.common.loopingcall.FixedIntervalLoopingCall')
+    def test_init_host(self, mock_looping_call):
+        driver.CONF.set_override('disk_compaction_interval', 3600, 'vix')
+        try:
+            self._driver.init_host('fake_host')
+        finally:
+            driver.CONF.clear_override('disk_compaction_interval', 'vix')
+
+        self._driver._resource_index.refresh.assert_called_once_with()
+        mock_looping_call.assert_any_call(self._driver._host_metrics.sample)
+        mock_looping_call.return_value.start.assert_any_call(
+            interval=driver.CONF.vix.host_metrics_ttl)
+        mock_looping_call.assert_any_call(
+            self._driver._disk_compactor.compact_instance_disks)
+        mock_looping_call.return_value.start.assert_any_call(
+            interval=3600, initial_delay=3600)
+        mock_looping_call.assert_called_with(
+            self._driver._console_log.truncate_logs)
+        mock_looping_call.return_value.start.assert_called_with(
+            interval=driver.CONF.vix.console_log_check_interval)
+
+    @mock.patch('nova.openstack.common.loopingcall.FixedIntervalLoopingCall')
+    def test_init_host_console_log_truncate_unsupported(self,
+                                                        mock_looping_call):
+        self._driver._console_log.check_truncate_supported.return_value = (
+            False)
+
+        self._driver.init_host('fake_host')
+
+        self.assertNotIn(mock.call(self._driver._console_log.truncate_logs),
+                         mock_looping_call.call_args_list)
 
     def test_list_instances(self):
         self._driver.list_instances()
@@ -54,9 +93,12 @@ class VixDriverTestCase(unittest.TestCase):
         self._driver._delete_existing_instance(fake_instance_name)
 
         self._driver._pathutils.get_vmx_path.assert_called_with('fake_name')
+        self._driver._screen_capture.invalidate.assert_called_once_with(
+            fake_path)
         self._driver._conn.vm_exists.assert_called_with(fake_path)
         self._driver._conn.unregister_vm_and_delete_files.assert_called_with(
             fake_path, True)
+        self._driver._resource_index.remove.assert_called_once_with(fake_path)
 
     @mock.patch('vix.vixutils.get_vmx_value')
     @mock.patch('vix.vixutils.set_vmx_value')
@@ -92,7 +134,35 @@ class VixDriverTestCase(unittest.TestCase):
         self.assertRaises(NotImplementedError,
                           self._driver._check_player_compatibility, True)
 
-    def _test_spawn(self, cow):
+    def test_get_device_models(self):
+        response = self._driver._get_device_models({}, 'rhel6-64')
+        self.assertEqual(response, (vixutils.DISK_CONTROLLER_LSISAS1068,
+                                    vixutils.NIC_MODEL_E1000E))
+
+    def test_get_device_models_guest_tools(self):
+        response = self._driver._get_device_models(
+            {'vix_guest_tools': 'true'}, 'winXPPro')
+        self.assertEqual(response, (vixutils.DISK_CONTROLLER_LSISAS1068,
+                                    vixutils.NIC_MODEL_VMXNET3))
+
+    def test_get_device_models_properties(self):
+        response = self._driver._get_device_models(
+            {'vix_disk_controller': 'pvscsi', 'vix_nic_model': 'e1000'},
+            'rhel6-64')
+        self.assertEqual(response, ('pvscsi', 'e1000'))
+
+    def test_get_device_models_incompatible(self):
+        self.assertRaises(utils.VixException,
+                          self._driver._get_device_models,
+                          {'vix_disk_controller': 'pvscsi'}, 'winXPPro')
+
+    @mock.patch('vix.compute.memory_profile.get_memory_profile')
+    @mock.patch('vix.compute.guestinfo.get_variables')
+    @mock.patch('nova.virt.configdrive.required_by')
+    def _test_spawn(self, mock_required_by, mock_get_variables,
+                    mock_get_memory_profile, cow,
+                    pristine_snapshot=False, wait_for_ip=False,
+                    config_drive=False, guestinfo_metadata=False):
 
         fake_admin_password = 'fake password'
         fake_instance = mock.MagicMock()
@@ -107,9 +177,14 @@ class VixDriverTestCase(unittest.TestCase):
         fake_r_path = 'fake/root/vmdk/path'
         fake_vmx_path = 'fake/vmx/path'
         fake_floppy_path = 'fake/floppy/path'
+        fake_ephemeral_path = 'fake/ephemeral/vmdk/path'
 
         self._driver._image_cache.get_image_info.return_value = fake_image_info
+        self._driver._create_ephemeral_disks = mock.MagicMock(
+            return_value=[fake_ephemeral_path])
         self._driver._check_player_compatibility = mock.MagicMock()
+        self._driver._get_device_models = mock.MagicMock(
+            return_value=('pvscsi', 'vmxnet3'))
         self._driver._delete_existing_instance = mock.MagicMock()
         self._driver._clone_vmdk_vm = mock.MagicMock()
         self._driver._image_cache.get_cached_image.return_value = fake_b_path
@@ -121,6 +196,37 @@ class VixDriverTestCase(unittest.TestCase):
         fake_image_info.get().get().split.return_value = fake_iso_image_ids
         utils.get_free_port = mock.MagicMock()
         utils.get_free_port.return_value = 9999
+        self._driver._create_pristine_snapshot = mock.MagicMock()
+        self._driver._create_warm_checkpoint = mock.MagicMock()
+        driver.CONF.set_override('pristine_snapshot', pristine_snapshot,
+                                 'vix')
+        self.addCleanup(driver.CONF.clear_override, 'pristine_snapshot',
+                        'vix')
+        self._driver._ip_discovery = mock.MagicMock()
+        self._driver._injector = mock.MagicMock()
+        self._driver._config_drive_builder = mock.MagicMock()
+        self._driver._shared_folders = mock.MagicMock()
+        get_shared_folders = self._driver._shared_folders.get_shared_folders
+        create_config_drive = (
+            self._driver._config_drive_builder.create_config_drive)
+        create_config_drive.return_value = 'fake/configdrive/path'
+        mock_required_by.return_value = config_drive
+        expected_iso_paths = [fake_b_path, fake_b_path]
+        if config_drive:
+            expected_iso_paths.append('fake/configdrive/path')
+        driver.CONF.set_override('spawn_wait_for_ip', wait_for_ip, 'vix')
+        self.addCleanup(driver.CONF.clear_override, 'spawn_wait_for_ip',
+                        'vix')
+        driver.CONF.set_override('guestinfo_metadata', guestinfo_metadata,
+                                 'vix')
+        self.addCleanup(driver.CONF.clear_override, 'guestinfo_metadata',
+                        'vix')
+        mock_get_variables.return_value = {'metadata': 'fake_metadata'}
+        get_vmx_config = self._driver._core_allocator.get_vmx_config
+        get_vmx_config.return_value = {'processor0.use': 'FALSE'}
+        expected_additional_config = {'processor0.use': 'FALSE'}
+        if guestinfo_metadata:
+            expected_additional_config['guestinfo.metadata'] = 'fake_metadata'
 
         self._driver.spawn(context=fake_context, instance=fake_instance,
                            image_meta=fake_image_meta,
@@ -134,6 +240,8 @@ class VixDriverTestCase(unittest.TestCase):
             fake_context, fake_instance['image_ref'])
 
         self._driver._check_player_compatibility.assert_called_with(cow)
+        self._driver._get_device_models.assert_called_once_with(
+            fake_image_info.get(), fake_image_info.get().get())
         self._driver._delete_existing_instance.assert_called_with(
             fake_instance['name'])
         self._driver._pathutils.create_instance_dir.assert_called_with(
@@ -154,12 +262,18 @@ class VixDriverTestCase(unittest.TestCase):
                 guest_os=fake_image_info.get().get(),
                 num_vcpus=fake_instance['vcpus'],
                 mem_size_mb=fake_instance['memory_mb'],
-                iso_paths=[fake_b_path, fake_b_path],
+                disk_paths=[fake_r_path, fake_ephemeral_path],
+                iso_paths=expected_iso_paths,
                 floppy_path=fake_floppy_path,
                 networks=[],
                 boot_order=fake_image_info.get().get(),
                 vnc_enabled=True,
-                vnc_port=9999, nested_hypervisor=fake_image_info.get().get())
+                vnc_port=9999, nested_hypervisor=fake_image_info.get().get(),
+                serial_port_path=(
+                    self._driver._pathutils.get_console_log_path.return_value),
+                memory_profile=mock_get_memory_profile.return_value,
+                disk_controller='pvscsi', nic_model='vmxnet3',
+                additional_config=expected_additional_config)
         else:
             self.assertEqual(self._driver._pathutils.copy.call_count, 2)
             self._driver._conn.create_vm.assert_called_with(
@@ -168,28 +282,353 @@ class VixDriverTestCase(unittest.TestCase):
                 guest_os=fake_image_info.get().get(),
                 num_vcpus=fake_instance['vcpus'],
                 mem_size_mb=fake_instance['memory_mb'],
-                disk_paths=[fake_r_path],
-                iso_paths=[fake_b_path, fake_b_path],
+                disk_paths=[fake_r_path, fake_ephemeral_path],
+                iso_paths=expected_iso_paths,
                 floppy_path=fake_floppy_path,
                 networks=[],
                 boot_order=fake_image_info.get().get(),
                 vnc_enabled=True,
-                vnc_port=9999, nested_hypervisor=fake_image_info.get().get())
-
+                vnc_port=9999, nested_hypervisor=fake_image_info.get().get(),
+                serial_port_path=(
+                    self._driver._pathutils.get_console_log_path.return_value),
+                memory_profile=mock_get_memory_profile.return_value,
+                disk_controller='pvscsi', nic_model='vmxnet3',
+                additional_config=expected_additional_config)
+
+        self._driver._create_ephemeral_disks.assert_called_with(fake_instance)
+        if guestinfo_metadata:
+            mock_get_variables.assert_called_once_with(fake_instance,
+                                                       fake_network_info)
+        else:
+            self.assertFalse(mock_get_variables.called)
+        mock_required_by.assert_called_once_with(fake_instance)
+        if config_drive:
+            create_config_drive.assert_called_once_with(
+                fake_instance, fake_injected_files, fake_admin_password)
+        else:
+            self.assertFalse(create_config_drive.called)
         os.path.join.assert_called_with(
             self._driver._conn.get_tools_iso_path(),
             "%s.iso" % fake_image_info.get().get())
         self._driver._pathutils.get_floppy_path.assert_called_with(
             fake_instance['name'])
         utils.get_free_port.assert_called_once()
+        self._driver._resource_index.update.assert_called_once_with(
+            fake_vmx_path)
         self._driver._conn.open_vm.assert_called_with(fake_vmx_path)
+        fake_vm = self._driver._conn.open_vm.return_value.__enter__()
+        if pristine_snapshot:
+            self._driver._create_pristine_snapshot.assert_called_once_with(
+                fake_vm, fake_instance['image_ref'])
+        else:
+            self.assertFalse(self._driver._create_pristine_snapshot.called)
+        fake_vm.power_on.assert_called_once_with(driver.CONF.vix.show_gui)
+        self._driver._injector.inject.assert_called_once_with(
+            fake_vm, fake_instance['name'], fake_image_info.get().get(),
+            fake_image_info.get(), fake_injected_files, fake_admin_password)
+        self._driver.virtapi.instance_type_get.assert_called_once_with(
+            fake_context, fake_instance['instance_type_id'])
+        instance_type = self._driver.virtapi.instance_type_get.return_value
+        get_shared_folders.assert_called_once_with(
+            fake_image_info.get(), instance_type.get())
+        add_shared_folders = self._driver._shared_folders.add_shared_folders
+        add_shared_folders.assert_called_once_with(
+            fake_vm, get_shared_folders.return_value)
+        mock_get_memory_profile.assert_called_once_with(instance_type.get())
+        get_vmx_config.assert_called_once_with(fake_instance,
+                                               instance_type.get())
+        apply_process_affinity = (
+            self._driver._core_allocator.apply_process_affinity)
+        apply_process_affinity.assert_called_once_with(fake_vmx_path)
+        if wait_for_ip:
+            self._driver._ip_discovery.get_ip_address.assert_called_once_with(
+                fake_vmx_path)
+            get_ip_address = self._driver._ip_discovery.get_ip_address
+            get_ip_address.return_value.wait.assert_called_once_with()
+        else:
+            self.assertFalse(self._driver._ip_discovery.get_ip_address.called)
 
     def test_spawn_cow(self):
         self._test_spawn(cow=True)
 
+    def test_spawn_pristine_snapshot(self):
+        self._test_spawn(cow=True, pristine_snapshot=True)
+
     def test_spawn_no_cow(self):
         self._test_spawn(cow=False)
 
+    def test_spawn_wait_for_ip(self):
+        self._test_spawn(cow=True, wait_for_ip=True)
+
+    def test_spawn_config_drive(self):
+        self._test_spawn(cow=False, config_drive=True)
+
+    def test_spawn_guestinfo_metadata(self):
+        self._test_spawn(cow=False, guestinfo_metadata=True)
+
+    @mock.patch('vix.vixutils.get_vix_host_type')
+    def _test_create_pristine_snapshot(self, mock_get_vix_host_type,
+                                       host_type):
+        fake_vm = mock.MagicMock()
+        mock_get_vix_host_type.return_value = host_type
+
+        self._driver._create_pristine_snapshot(fake_vm, 'fake_image_id')
+
+        if host_type == vixutils.VIX_VMWARE_PLAYER:
+            self.assertFalse(fake_vm.create_snapshot.called)
+        else:
+            fake_vm.create_snapshot.assert_called_once_with(
+                name=driver.PRISTINE_SNAPSHOT_NAME,
+                description='fake_image_id')
+
+    def test_create_pristine_snapshot(self):
+        self._test_create_pristine_snapshot(
+            host_type=vixutils.VIX_VMWARE_WORKSTATION)
+
+    def test_create_pristine_snapshot_player(self):
+        self._test_create_pristine_snapshot(
+            host_type=vixutils.VIX_VMWARE_PLAYER)
+
+    @mock.patch('vix.compute.guestinfo.get_variables')
+    def _test_rebuild(self, mock_get_variables, recreate=False,
+                      vm_exists=True, snapshot_exists=True, powered_on=False,
+                      guestinfo_metadata=False):
+        fake_context = mock.MagicMock()
+        fake_instance = {'name': 'fake_name', 'uuid': 'fake_uuid',
+                         'instance_type_id': 'fake_type_id'}
+        fake_image_meta = {'id': 'fake_image_id'}
+        fake_extra_specs = {'fake_key': 'fake_value'}
+        fake_vm = self._driver._conn.open_vm.return_value.__enter__()
+        fake_snapshot = mock.MagicMock()
+        self._driver._conn.vm_exists.return_value = vm_exists
+        self._driver.virtapi = mock.MagicMock()
+        self._driver.virtapi.instance_type_get.return_value = {
+            'extra_specs': fake_extra_specs}
+        self._driver._get_rebuild_snapshot = mock.MagicMock()
+        self._driver._injector = mock.MagicMock()
+        self._driver._shared_folders = mock.MagicMock()
+        driver.CONF.set_override('guestinfo_metadata', guestinfo_metadata,
+                                 'vix')
+        self.addCleanup(driver.CONF.clear_override, 'guestinfo_metadata',
+                        'vix')
+        if snapshot_exists:
+            self._driver._get_rebuild_snapshot.return_value = fake_snapshot
+        else:
+            self._driver._get_rebuild_snapshot.return_value = None
+        if powered_on:
+            fake_vm.get_power_state.return_value = (
+                vixlib.VIX_POWERSTATE_POWERED_ON)
+        else:
+            fake_vm.get_power_state.return_value = (
+                vixlib.VIX_POWERSTATE_POWERED_OFF)
+
+        if recreate or not vm_exists or not snapshot_exists:
+            self.assertRaises(NotImplementedError, self._driver.rebuild,
+                              fake_context, fake_instance, fake_image_meta,
+                              None, None, None, None, None,
+                              recreate=recreate)
+            self.assertFalse(fake_vm.revert_to_snapshot.called)
+            self.assertFalse(fake_vm.power_on.called)
+            self.assertFalse(self._driver._injector.inject.called)
+            self.assertFalse(
+                self._driver._shared_folders.add_shared_folders.called)
+        else:
+            self._driver.rebuild(fake_context, fake_instance,
+                                 fake_image_meta, None, None, None, None,
+                                 None)
+
+            self._driver._get_rebuild_snapshot.assert_called_once_with(
+                fake_vm, 'fake_image_id')
+            self._driver.virtapi.instance_update.assert_called_once_with(
+                fake_context, 'fake_uuid',
+                {'task_state': task_states.REBUILD_SPAWNING,
+                 'expected_task_state': task_states.REBUILDING})
+            fake_vm.revert_to_snapshot.assert_called_once_with(
+                fake_snapshot, driver.CONF.vix.show_gui)
+            if powered_on:
+                self.assertFalse(fake_vm.power_on.called)
+            else:
+                fake_vm.power_on.assert_called_once_with(
+                    driver.CONF.vix.show_gui)
+            if guestinfo_metadata:
+                mock_get_variables.assert_called_once_with(fake_instance,
+                                                           None)
+                fake_vm.write_variables.assert_called_once_with(
+                    mock_get_variables.return_value)
+            else:
+                self.assertFalse(fake_vm.write_variables.called)
+            self._driver._injector.inject.assert_called_once_with(
+                fake_vm, 'fake_name', driver.CONF.vix.default_guestos, {},
+                None, None)
+            self._driver.virtapi.instance_type_get.assert_called_once_with(
+                fake_context, 'fake_type_id')
+            shared_folders = self._driver._shared_folders
+            shared_folders.get_shared_folders.assert_called_once_with(
+                {}, fake_extra_specs)
+            shared_folders.add_shared_folders.assert_called_once_with(
+                fake_vm, shared_folders.get_shared_folders.return_value)
+
+    def test_rebuild(self):
+        self._test_rebuild()
+
+    def test_rebuild_warm_checkpoint(self):
+        self._test_rebuild(powered_on=True)
+
+    def test_rebuild_guestinfo_metadata(self):
+        self._test_rebuild(guestinfo_metadata=True)
+
+    def test_rebuild_recreate(self):
+        self._test_rebuild(recreate=True)
+
+    def test_rebuild_no_vm(self):
+        self._test_rebuild(vm_exists=False)
+
+    def test_rebuild_no_snapshot(self):
+        self._test_rebuild(snapshot_exists=False)
+
+    def _test_get_rebuild_snapshot(self, descriptions):
+        fake_vm = mock.MagicMock()
+        fake_snapshots = {}
+        for (name, description) in descriptions.items():
+            fake_snapshots[name] = mock.MagicMock()
+            fake_snapshots[name].get_description.return_value = description
+        fake_vm.get_named_snapshot.side_effect = fake_snapshots.get
+
+        response = self._driver._get_rebuild_snapshot(fake_vm,
+                                                      'fake_image_id')
+
+        for name in [driver.WARM_CHECKPOINT_NAME,
+                     driver.PRISTINE_SNAPSHOT_NAME]:
+            if descriptions.get(name) == 'fake_image_id':
+                self.assertEqual(response, fake_snapshots[name])
+                return
+            elif name in fake_snapshots:
+                fake_snapshots[name].close.assert_called_once_with()
+        self.assertIsNone(response)
+
+    def test_get_rebuild_snapshot_warm_checkpoint(self):
+        self._test_get_rebuild_snapshot(
+            {driver.WARM_CHECKPOINT_NAME: 'fake_image_id',
+             driver.PRISTINE_SNAPSHOT_NAME: 'fake_image_id'})
+
+    def test_get_rebuild_snapshot_pristine(self):
+        self._test_get_rebuild_snapshot(
+            {driver.WARM_CHECKPOINT_NAME: 'other_image_id',
+             driver.PRISTINE_SNAPSHOT_NAME: 'fake_image_id'})
+
+    def test_get_rebuild_snapshot_different_image(self):
+        self._test_get_rebuild_snapshot(
+            {driver.PRISTINE_SNAPSHOT_NAME: 'other_image_id'})
+
+    @mock.patch('nova.openstack.common.loopingcall.FixedIntervalLoopingCall')
+    @mock.patch('vix.vixutils.get_vix_host_type')
+    def _test_create_warm_checkpoint(self, mock_get_vix_host_type,
+                                     mock_looping_call, tools_running=True,
+                                     vm_exists=True):
+        fake_vm = self._driver._conn.open_vm.return_value.__enter__()
+        mock_get_vix_host_type.return_value = (
+            vixutils.VIX_VMWARE_WORKSTATION)
+        self._driver._conn.vm_exists.return_value = vm_exists
+        if tools_running:
+            fake_vm.get_power_state.return_value = (
+                vixlib.VIX_POWERSTATE_POWERED_ON |
+                vixlib.VIX_POWERSTATE_TOOLS_RUNNING)
+        else:
+            fake_vm.get_power_state.return_value = (
+                vixlib.VIX_POWERSTATE_POWERED_ON)
+
+        self._driver._create_warm_checkpoint('fake/vmx/path',
+                                             'fake_image_id')
+
+        mock_looping_call.return_value.start.assert_called_once_with(
+            interval=driver._WARM_CHECKPOINT_POLL_INTERVAL)
+        create_checkpoint_when_booted = mock_looping_call.call_args[0][0]
+
+        if tools_running or not vm_exists:
+            self.assertRaises(loopingcall.LoopingCallDone,
+                              create_checkpoint_when_booted)
+        else:
+            create_checkpoint_when_booted()
+
+        if tools_running and vm_exists:
+            fake_vm.create_snapshot.assert_called_once_with(
+                include_memory=True, name=driver.WARM_CHECKPOINT_NAME,
+                description='fake_image_id')
+        else:
+            self.assertFalse(fake_vm.create_snapshot.called)
+
+    def test_create_warm_checkpoint(self):
+        self._test_create_warm_checkpoint()
+
+    def test_create_warm_checkpoint_tools_not_running(self):
+        self._test_create_warm_checkpoint(tools_running=False)
+
+    def test_create_warm_checkpoint_vm_deleted(self):
+        self._test_create_warm_checkpoint(vm_exists=False)
+
+    @mock.patch('nova.openstack.common.loopingcall.FixedIntervalLoopingCall')
+    @mock.patch('vix.vixutils.get_vix_host_type')
+    def test_create_warm_checkpoint_player(self, mock_get_vix_host_type,
+                                           mock_looping_call):
+        mock_get_vix_host_type.return_value = vixutils.VIX_VMWARE_PLAYER
+
+        self._driver._create_warm_checkpoint('fake/vmx/path',
+                                             'fake_image_id')
+
+        self.assertFalse(mock_looping_call.called)
+
+    def test_create_blank_disk(self):
+        fake_disk_path = 'fake/disk/path'
+        fake_template_path = 'fake/template/path'
+        self._driver._image_cache.get_cached_blank_disk.return_value = (
+            fake_template_path)
+
+        self._driver._create_blank_disk(fake_disk_path, 1024)
+
+        self._driver._image_cache.get_cached_blank_disk.assert_called_with(
+            1024)
+        self._driver._pathutils.copy_sparse.assert_called_with(
+            fake_template_path, fake_disk_path)
+
+    @mock.patch('nova.compute.flavors.extract_flavor')
+    def _test_create_ephemeral_disks(self, mock_extract_flavor,
+                                     ephemeral_gb, swap_mb):
+        fake_instance = {'name': 'fake_name', 'ephemeral_gb': ephemeral_gb}
+        fake_ephemeral_path = 'fake/ephemeral/vmdk/path'
+        fake_swap_path = 'fake/swap/vmdk/path'
+        mock_extract_flavor.return_value = {'swap': swap_mb}
+        self._driver._create_blank_disk = mock.MagicMock()
+        self._driver._pathutils.get_ephemeral_vmdk_path.return_value = (
+            fake_ephemeral_path)
+        self._driver._pathutils.get_swap_vmdk_path.return_value = (
+            fake_swap_path)
+
+        response = self._driver._create_ephemeral_disks(fake_instance)
+
+        expected_calls = []
+        expected_paths = []
+        if ephemeral_gb:
+            expected_calls.append(mock.call(fake_ephemeral_path,
+                                            ephemeral_gb * 1024))
+            expected_paths.append(fake_ephemeral_path)
+        if swap_mb:
+            expected_calls.append(mock.call(fake_swap_path, swap_mb))
+            expected_paths.append(fake_swap_path)
+
+        mock_extract_flavor.assert_called_with(fake_instance)
+        self.assertEqual(self._driver._create_blank_disk.mock_calls,
+                         expected_calls)
+        self.assertEqual(response, expected_paths)
+
+    def test_create_ephemeral_disks(self):
+        self._test_create_ephemeral_disks(ephemeral_gb=10, swap_mb=512)
+
+    def test_create_ephemeral_disks_no_swap(self):
+        self._test_create_ephemeral_disks(ephemeral_gb=10, swap_mb=0)
+
+    def test_create_ephemeral_disks_none(self):
+        self._test_create_ephemeral_disks(ephemeral_gb=0, swap_mb=0)
+
     def _test_exec_vm_action(self, vm_exists):
         fake_instance = mock.MagicMock()
         fake_action = mock.MagicMock()
@@ -212,6 +651,23 @@ class VixDriverTestCase(unittest.TestCase):
     def test_exec_vm_action_vm_exists_true(self):
         self._test_exec_vm_action(True)
 
+    def test_exec_vm_power_action(self):
+        fake_instance = mock.MagicMock()
+        fake_action = mock.MagicMock()
+        fake_path = 'fake/path'
+        self._driver._pathutils.get_vmx_path.return_value = fake_path
+        self._driver._ip_discovery = mock.MagicMock()
+        self._driver._exec_vm_action = mock.MagicMock()
+
+        response = self._driver._exec_vm_power_action(fake_instance,
+                                                      fake_action)
+
+        self._driver._ip_discovery.invalidate.assert_called_once_with(
+            fake_path)
+        self._driver._exec_vm_action.assert_called_once_with(fake_instance,
+                                                             fake_action)
+        self.assertEqual(response, self._driver._exec_vm_action.return_value)
+
     @mock.patch('vix.vixutils.VixVM.reboot')
     def test_reboot(self, mock_reboot):
         fake_instance = mock.MagicMock()
@@ -268,49 +724,60 @@ class VixDriverTestCase(unittest.TestCase):
                           fake_instance)
 
     def test_get_host_memory_info(self):
-        total_mem = 2147483648
-        free_mem = 1073741824
-        utils.get_host_memory_info = mock.MagicMock()
-        utils.get_host_memory_info.return_value = (total_mem, free_mem)
+        self._mock_host_metrics()
+
         response = self._driver._get_host_memory_info()
-        utils.get_host_memory_info.assert_called_once()
+
+        self._driver._host_metrics.get_metrics.assert_called_once_with()
         self.assertEqual(response, (2048, 1024, 1024))
 
     def test_get_local_hdd_info_gb(self):
-        total_disk = 2147483648
-        free_disk = 1073741824
-        fake_dir = 'fake dir'
-        utils.get_disk_info = mock.MagicMock()
-        utils.get_disk_info.return_value = (total_disk, free_disk)
-        self._driver._pathutils.get_instances_dir = mock.MagicMock()
-        self._driver._pathutils.get_instances_dir.return_value = fake_dir
+        self._mock_host_metrics()
+
         response = self._driver._get_local_hdd_info_gb()
-        utils.get_disk_info.assert_called_once_with(fake_dir)
+
+        self._driver._host_metrics.get_metrics.assert_called_once_with()
         self.assertEqual(response, (2, 1, 1))
 
+    def test_check_nested_virt_support(self):
+        self._driver._conn.nested_virt_support.return_value = (
+            vixutils.SUPPORTS_NESTED_VIRT_VMX)
+        self._driver._check_nested_virt_support()
+
+    def test_check_nested_virt_support_not_supported(self):
+        self._driver._conn.nested_virt_support.return_value = 0
+        self.assertRaises(utils.VixException,
+                          self._driver._check_nested_virt_support)
+
     def test_get_hypervisor_version(self):
         self._driver._conn.get_software_version.return_value = 10
         response = self._driver._get_hypervisor_version()
         self._driver._conn.get_software_version.assert_called_once()
         self.assertEqual(response, 10)
 
-    def test_get_available_resource(self):
+    def _mock_host_metrics(self):
+        metrics = self._driver._host_metrics.get_metrics.return_value
+        metrics.total_disk = 2 * 1024 * 1024 * 1024
+        metrics.free_disk = 1 * 1024 * 1024 * 1024
+        metrics.total_mem = 2048 * 1024 * 1024
+        metrics.free_mem = 1024 * 1024 * 1024
+        metrics.cpu_count = 2
+        metrics.cpu_percent = 25.0
+        metrics.load_average = (1.0, 0.5, 0.25)
+
+    @mock.patch('vix.cpuutils.get_cpu_info')
+    def test_get_available_resource(self, mock_get_cpu_info):
         fake_nodename = 'fake_name'
-        total_disk = 2 * 1024 * 1024 * 1024
-        free_disk = 1 * 1024 * 1024 * 1024
-        total_mem = 2048 * 1024 * 1024
-        free_mem = 1024 * 1024 * 1024
         vcpus = 2
-        fake_dir = 'fake dir'
         compare_dict = {'vcpus': vcpus,
                         'memory_mb': 2048,
-                        'memory_mb_used': 1024,
+                        'memory_mb_used': 512,
                         'local_gb': 2,
-                        'local_gb_used': 1,
+                        'local_gb_used': 3,
                         'hypervisor_type': "vix",
                         'hypervisor_version': 10,
                         'hypervisor_hostname': 'fake_hostname',
-                        'vcpus_used': 0,
+                        'vcpus_used': 4,
                         'cpu_info': 0,
                         'supported_instances': 0}
 
@@ -320,30 +787,22 @@ class VixDriverTestCase(unittest.TestCase):
         platform.node.return_value = 'fake_hostname'
         self._driver._conn.get_software_version = mock.MagicMock()
         self._driver._conn.get_software_version.return_value = 10
-        utils.get_host_memory_info = mock.MagicMock()
-        utils.get_host_memory_info.return_value = (total_mem, free_mem)
-        utils.get_disk_info = mock.MagicMock()
-        utils.get_disk_info.return_value = (total_disk, free_disk)
-        self._driver._pathutils.get_instances_dir = mock.MagicMock()
-        self._driver._pathutils.get_instances_dir.return_value = fake_dir
-        utils.get_cpu_count = mock.MagicMock()
-        utils.get_cpu_count.return_value = vcpus
+        self._mock_host_metrics()
+        self._driver._resource_index.get_totals.return_value = (
+            4, 512, 3 * 1024 * 1024 * 1024)
 
         response = self._driver.get_available_resource(fake_nodename)
-        utils.get_host_memory_info.assert_called_once()
-        utils.get_disk_info.assert_called_once_with(fake_dir)
+        self.assertFalse(self._driver._host_metrics.sample.called)
         self._driver._conn.get_software_version.assert_called_once()
         platform.node.assert_called_once()
         self.assertEqual(jsonutils.dumps.call_count, 2)
+        jsonutils.dumps.assert_any_call(mock_get_cpu_info.return_value)
         self.assertEqual(response, compare_dict)
 
     def test_update_stats(self):
-        total_disk = 2 * 1024 * 1024 * 1024
-        free_disk = 1 * 1024 * 1024 * 1024
-        total_mem = 2048 * 1024 * 1024
-        free_mem = 1024 * 1024 * 1024
-        fake_dir = 'fake dir'
-        compare_dict = {'host_memory_total': 2048,
+        compare_dict = {'cpu_percent': 25.0,
+                        'load_average': (1.0, 0.5, 0.25),
+                        'host_memory_total': 2048,
                         'host_memory_overhead': 1024,
                         'host_memory_free': 1024,
                         'host_memory_free_computed': 1024,
@@ -355,17 +814,11 @@ class VixDriverTestCase(unittest.TestCase):
                                                 ('x86_64', 'vix', 'hvm')]}
         platform.node = mock.MagicMock()
         platform.node.return_value = 'fake_hostname'
-        utils.get_host_memory_info = mock.MagicMock()
-        utils.get_host_memory_info.return_value = (total_mem, free_mem)
-        utils.get_disk_info = mock.MagicMock()
-        utils.get_disk_info.return_value = (total_disk, free_disk)
-        self._driver._pathutils.get_instances_dir = mock.MagicMock()
-        self._driver._pathutils.get_instances_dir.return_value = fake_dir
+        self._mock_host_metrics()
 
         self._driver._update_stats()
 
-        utils.get_host_memory_info.assert_called_once()
-        utils.get_disk_info.assert_called_once_with(fake_dir)
+        self.assertFalse(self._driver._host_metrics.sample.called)
         platform.node.assert_called_once()
         self.assertEqual(self._driver._stats, compare_dict)
 
@@ -379,21 +832,27 @@ class VixDriverTestCase(unittest.TestCase):
     def test_get_host_stats_refresh_false(self):
         self._test_get_host_stats(False)
 
-    @mock.patch('vix.vixutils.VixVM.create_snapshot')
-    @mock.patch('vix.vixutils.VixVM.remove_snapshot')
+    @mock.patch('os.path.join')
+    @mock.patch('os.path.dirname')
+    @mock.patch('vix.vixutils.get_vmx_value')
     @mock.patch('vix.vixutils.get_vix_host_type')
     def _test_snapshot(self, feature_supported, mock_get_vix_host_type,
-                       mock_remove_snapshot, mock_create_snapshot):
+                       mock_get_vmx_value, mock_dirname, mock_join,
+                       incremental=False):
         fake_name = 'fake name'
         fake_instance = mock.MagicMock()
+        driver.CONF.set_override('incremental_snapshots', incremental, 'vix')
+        self.addCleanup(driver.CONF.clear_override, 'incremental_snapshots',
+                        'vix')
         fake_context = mock.MagicMock()
         fake_update_task_state = mock.MagicMock()
         fake_path = 'fake/path'
         fake_r_path = 'fake/root/vmdk/path'
         fake_vm = mock.MagicMock()
         self._driver._conn.open_vm.return_value = fake_vm
-        self._driver._pathutils.get_root_vmdk_path.return_value = fake_r_path
         self._driver._pathutils.get_vmx_path.return_value = fake_path
+        mock_dirname.return_value = 'fake'
+        mock_join.return_value = fake_r_path
 
         if not feature_supported:
             host_type = vixutils.VIX_VMWARE_PLAYER
@@ -411,11 +870,22 @@ class VixDriverTestCase(unittest.TestCase):
             self._driver._conn.open_vm.assert_called_with(fake_path)
             print self._driver._conn.open_vm.mock_calls
             self.assertEqual(fake_update_task_state.call_count, 2)
-            fake_vm.__enter__().create_snapshot.assert_called_with(
+            fake_vm_enter = fake_vm.__enter__.return_value
+            fake_vm_enter.create_snapshot.assert_called_with(
                 name="Nova snapshot")
+            mock_get_vmx_value.assert_called_once_with(fake_path,
+                                                       "scsi0:0.fileName")
+            mock_join.assert_called_once_with(
+                'fake', mock_get_vmx_value.return_value)
+            fake_parent_image_id = None
+            if incremental:
+                fake_parent_image_id = fake_instance['image_ref']
             self._driver._image_cache.save_glance_image.assert_called_with(
-                fake_context, fake_name, fake_r_path)
-            mock_remove_snapshot.assert_called_once()
+                fake_context, fake_name, fake_r_path, fake_parent_image_id)
+            fake_snapshot = (
+                fake_vm_enter.create_snapshot.return_value.__enter__())
+            fake_vm_enter.remove_snapshot.assert_called_once_with(
+                fake_snapshot)
 
     def test_snapshot_not_implemented(self):
         self._test_snapshot(False)
@@ -423,6 +893,9 @@ class VixDriverTestCase(unittest.TestCase):
     def test_snapshot(self):
         self._test_snapshot(True)
 
+    def test_snapshot_incremental(self):
+        self._test_snapshot(True, incremental=True)
+
     @mock.patch('vix.vixutils.VixVM.pause')
     def test_pause(self, mock_pause):
         fake_instance = mock.MagicMock()
@@ -463,6 +936,21 @@ class VixDriverTestCase(unittest.TestCase):
                               fake_network_info)
         mock_power_on.assert_called_once()
 
+    def test_power_on_vm(self):
+        fake_instance = {'name': 'fake_name'}
+        fake_vm = mock.MagicMock()
+
+        self._driver._power_on_vm(fake_instance, fake_vm)
+
+        self._driver._console_log.rotate.assert_called_once_with('fake_name')
+        fake_vm.power_on.assert_called_once_with(driver.CONF.vix.show_gui)
+        self._driver._pathutils.get_vmx_path.assert_called_once_with(
+            'fake_name')
+        apply_process_affinity = (
+            self._driver._core_allocator.apply_process_affinity)
+        apply_process_affinity.assert_called_once_with(
+            self._driver._pathutils.get_vmx_path.return_value)
+
     def test_live_migration(self):
         fake_context = mock.MagicMock()
         fake_recover_method = mock.MagicMock()
@@ -551,6 +1039,42 @@ class VixDriverTestCase(unittest.TestCase):
         self._test_get_vnc_console(False)
 
     def test_get_console_output(self):
-        fake_instance = mock.MagicMock()
+        fake_instance = {'name': 'fake_name'}
+        get_console_output = self._driver._console_log.get_console_output
+
         reponse = self._driver.get_console_output(fake_instance)
-        self.assertEqual(reponse, '')
+
+        get_console_output.assert_called_once_with('fake_name')
+        self.assertEqual(reponse, get_console_output.return_value)
+
+    def _test_get_diagnostics(self, fake_diagnostics):
+        fake_instance = {'name': 'fake_name'}
+        get_diagnostics = self._driver._diagnostics.get_diagnostics
+        get_diagnostics.return_value = fake_diagnostics
+
+        response = self._driver.get_diagnostics(fake_instance)
+
+        get_diagnostics.assert_called_once_with(
+            self._driver._pathutils.get_vmx_path.return_value)
+        return response
+
+    def test_get_diagnostics(self):
+        fake_diagnostics = {'cpu_time': 1.0}
+        response = self._test_get_diagnostics(fake_diagnostics)
+        self.assertEqual(response, fake_diagnostics)
+
+    def test_get_diagnostics_not_running(self):
+        response = self._test_get_diagnostics(None)
+        self.assertEqual(response, {})
+
+    def test_get_screen_image(self):
+        fake_instance = {'name': 'fake_name'}
+        get_screen_image = self._driver._screen_capture.get_screen_image
+
+        reponse = self._driver.get_screen_image(fake_instance)
+
+        self._driver._pathutils.get_vmx_path.assert_called_once_with(
+            'fake_name')
+        get_screen_image.assert_called_once_with(
+            self._driver._pathutils.get_vmx_path.return_value)
+        self.assertEqual(reponse, get_screen_image.return_value)
@@ -0,0 +1,93 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import base64
+import gzip
+import io
+import json
+import unittest
+
+from vix.compute import guestinfo
+
+
+class GuestInfoTestCase(unittest.TestCase):
+    """Unit tests for the guestinfo metadata"""
+
+    def _get_fake_instance(self, user_data=None, key_data=None):
+        return {'uuid': 'fake_uuid',
+                'hostname': 'fake-hostname',
+                'display_name': 'fake_name',
+                'availability_zone': 'nova',
+                'launch_index': 0,
+                'metadata': {'fake_key': 'fake_value'},
+                'key_name': 'fake_key_name',
+                'key_data': key_data,
+                'user_data': user_data}
+
+    def _decode_metadata(self, value):
+        buf = io.BytesIO(base64.b64decode(value))
+        with gzip.GzipFile(fileobj=buf, mode="rb") as f:
+            return json.loads(f.read())
+
+    def test_get_network_config(self):
+        fake_network_info = [{'address': '00:0c:29:00:00:01'},
+                             {'address': '00:0c:29:00:00:02'}]
+
+        response = guestinfo.get_network_config(fake_network_info)
+
+        self.assertEqual(response['version'], 1)
+        self.assertEqual(response['config'][1],
+                         {'type': 'physical', 'name': 'eth1',
+                          'mac_address': '00:0c:29:00:00:02',
+                          'subnets': [{'type': 'dhcp'}]})
+
+    def test_get_variables(self):
+        fake_instance = self._get_fake_instance(
+            user_data='ZmFrZQ==', key_data='ssh-rsa fake')
+        fake_network_info = [{'address': '00:0c:29:00:00:01'}]
+
+        response = guestinfo.get_variables(fake_instance, fake_network_info)
+
+        self.assertEqual(response['metadata.encoding'], 'gzip+base64')
+        self.assertEqual(response['userdata'], 'ZmFrZQ==')
+        self.assertEqual(response['userdata.encoding'], 'base64')
+        metadata = self._decode_metadata(response['metadata'])
+        self.assertEqual(metadata['instance-id'], 'fake_uuid')
+        self.assertEqual(metadata['local-hostname'], 'fake-hostname')
+        self.assertEqual(metadata['meta'], {'fake_key': 'fake_value'})
+        self.assertEqual(metadata['public_keys'],
+                         {'fake_key_name': 'ssh-rsa fake'})
+        self.assertEqual(
+            metadata['network']['config'][0]['mac_address'],
+            '00:0c:29:00:00:01')
+
+    def test_get_variables_no_user_data(self):
+        fake_instance = self._get_fake_instance()
+
+        response = guestinfo.get_variables(fake_instance, [])
+
+        self.assertNotIn('userdata', response)
+        self.assertNotIn('userdata.encoding', response)
+        metadata = self._decode_metadata(response['metadata'])
+        self.assertNotIn('public_keys', metadata)
+
+    def test_get_vmx_config(self):
+        response = guestinfo.get_vmx_config({'metadata': 'fake',
+                                             'metadata.encoding': 'base64'})
+
+        self.assertEqual(response, {'guestinfo.metadata': 'fake',
+                                    'guestinfo.metadata.encoding': 'base64'})
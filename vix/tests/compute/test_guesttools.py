@@ -0,0 +1,68 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+import unittest
+
+from nova.openstack.common import loopingcall
+
+from vix.compute import guesttools
+from vix import vixlib
+
+
+class GuestToolsTestCase(unittest.TestCase):
+    """Unit tests for the guest tools state"""
+
+    @mock.patch('time.time')
+    @mock.patch('nova.openstack.common.loopingcall.FixedIntervalLoopingCall')
+    def _test_wait_for_tools(self, mock_looping_call, mock_time, power_state,
+                             elapsed, tools_running=None):
+        fake_vm = mock.MagicMock()
+        fake_vm.get_power_state.return_value = power_state
+        mock_time.return_value = 100
+
+        response = guesttools.wait_for_tools(fake_vm, 10, poll_interval=5)
+
+        mock_looping_call.return_value.start.assert_called_once_with(
+            interval=5)
+        self.assertEqual(
+            response,
+            mock_looping_call.return_value.start.return_value.wait())
+
+        check_tools_running = mock_looping_call.call_args[0][0]
+        mock_time.return_value = 100 + elapsed
+        if tools_running is None:
+            check_tools_running()
+        else:
+            with self.assertRaises(loopingcall.LoopingCallDone) as cm:
+                check_tools_running()
+            self.assertEqual(cm.exception.retvalue, tools_running)
+
+    def test_wait_for_tools_running(self):
+        self._test_wait_for_tools(
+            power_state=(vixlib.VIX_POWERSTATE_POWERED_ON |
+                         vixlib.VIX_POWERSTATE_TOOLS_RUNNING),
+            elapsed=1, tools_running=True)
+
+    def test_wait_for_tools_not_running(self):
+        self._test_wait_for_tools(
+            power_state=vixlib.VIX_POWERSTATE_POWERED_ON, elapsed=1)
+
+    def test_wait_for_tools_timeout(self):
+        self._test_wait_for_tools(
+            power_state=vixlib.VIX_POWERSTATE_POWERED_ON, elapsed=11,
+            tools_running=False)
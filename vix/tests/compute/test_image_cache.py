@@ -53,31 +53,125 @@ class VixUtilsTestCase(unittest.TestCase):
                                                            fake_image_id))
         fake_image_service.show.assert_called_with(fake_context, fake_image_id)
 
-    def test_save_glance_image(self):
+    @mock.patch('vix.vmdkutils.ChunkedReader')
+    @mock.patch('vix.vmdkutils.get_stream_optimized_chunks')
+    @mock.patch('vix.vmdkutils.VMDKDisk')
+    def test_save_glance_image(self, mock_vmdk_disk, mock_get_chunks,
+                               mock_chunked_reader):
         fake_context = mock.MagicMock()
         fake_name = mock.MagicMock()
         fake_image_vmdk_path = mock.MagicMock()
         fake_image_metadata = {"is_public": False,
                                "disk_format": "vmdk",
                                "container_format": "bare",
-                               "properties": {}}
+                               "properties": {
+                                   "vmware_disktype": "streamOptimized"}}
         fake_glance_image_service = mock.MagicMock()
         fake_image_id = mock.MagicMock()
+        fake_disk = mock_vmdk_disk.return_value.__enter__.return_value
 
         glance.get_remote_image_service = mock.MagicMock(
             return_value=(fake_glance_image_service, fake_image_id))
         fake_glance_image_service.update = mock.MagicMock()
 
-        with mock.patch('vix.compute.image_cache.open',
-                        mock.mock_open(read_data='fake data'),
-                        create=True) as m:
-            self._image_cache.save_glance_image(fake_context, fake_name,
-                                                fake_image_vmdk_path)
-            fake_glance_image_service.update.assert_called_with(
-                fake_context, fake_image_id, fake_image_metadata, m())
+        self._image_cache.save_glance_image(fake_context, fake_name,
+                                            fake_image_vmdk_path)
 
         glance.get_remote_image_service.assert_called_with(fake_context,
                                                            fake_name)
+        mock_vmdk_disk.assert_called_once_with(fake_image_vmdk_path)
+        mock_get_chunks.assert_called_once_with(fake_disk, base_disk=None)
+        mock_chunked_reader.assert_called_once_with(
+            mock_get_chunks.return_value)
+        fake_glance_image_service.update.assert_called_with(
+            fake_context, fake_image_id, fake_image_metadata,
+            mock_chunked_reader.return_value)
+
+    @mock.patch('nova.image.glance.get_remote_image_service')
+    @mock.patch('vix.vmdkutils.ChunkedReader')
+    @mock.patch('vix.vmdkutils.get_stream_optimized_chunks')
+    @mock.patch('vix.vmdkutils.VMDKDisk')
+    def _test_save_glance_image_incremental(self, mock_vmdk_disk,
+                                            mock_get_chunks,
+                                            mock_chunked_reader,
+                                            mock_get_remote_image_service,
+                                            base_exists=True):
+        fake_context = mock.MagicMock()
+        fake_parent_image_id = "fake_parent_image_id"
+        fake_base_vmdk_path = "fake/base/fake_parent_image_id.vmdk"
+        fake_glance_image_service = mock.MagicMock()
+        fake_disk = mock_vmdk_disk.return_value.__enter__.return_value
+        fake_base_disk = mock_vmdk_disk.return_value
+
+        mock_get_remote_image_service.return_value = (
+            fake_glance_image_service, mock.sentinel.image_id)
+        self._image_cache._get_cached_image_path = mock.MagicMock(
+            return_value=fake_base_vmdk_path)
+        self._image_cache._pathutils = mock.MagicMock()
+        self._image_cache._pathutils.exists.return_value = base_exists
+
+        self._image_cache.save_glance_image(fake_context, mock.sentinel.name,
+                                            mock.sentinel.path,
+                                            fake_parent_image_id)
+
+        self._image_cache._get_cached_image_path.assert_called_once_with(
+            fake_parent_image_id, "vmdk")
+        fake_image_metadata = fake_glance_image_service.update.call_args[0][2]
+        if base_exists:
+            mock_vmdk_disk.assert_called_with(fake_base_vmdk_path)
+            mock_get_chunks.assert_called_once_with(
+                fake_disk, base_disk=fake_base_disk)
+            fake_base_disk.close.assert_called_once_with()
+            self.assertEqual(
+                fake_image_metadata["properties"]["vix_parent_image_id"],
+                fake_parent_image_id)
+        else:
+            mock_vmdk_disk.assert_called_once_with(mock.sentinel.path)
+            mock_get_chunks.assert_called_once_with(fake_disk,
+                                                    base_disk=None)
+            self.assertNotIn("vix_parent_image_id",
+                             fake_image_metadata["properties"])
+
+    def test_save_glance_image_incremental(self):
+        self._test_save_glance_image_incremental()
+
+    def test_save_glance_image_incremental_no_base(self):
+        self._test_save_glance_image_incremental(base_exists=False)
+
+    @mock.patch('vix.vmdkutils.get_stream_optimized_chunks')
+    @mock.patch('vix.vmdkutils.VMDKDisk')
+    def test_merge_delta_image(self, mock_vmdk_disk, mock_get_chunks):
+        fake_image_path = "fake/base/fake_image_id.vmdk"
+        fake_merged_path = fake_image_path + ".merged"
+        fake_disk = mock_vmdk_disk.return_value.__enter__.return_value
+        mock_get_chunks.return_value = ["fake", "chunks"]
+        self._image_cache.get_cached_image = mock.MagicMock(
+            return_value=mock.sentinel.parent_image_path)
+        self._image_cache._pathutils = mock.MagicMock()
+        self._image_cache._disk_manager = mock.MagicMock()
+
+        with mock.patch('vix.compute.image_cache.open',
+                        mock.mock_open(), create=True) as m:
+            self._image_cache._merge_delta_image(
+                mock.sentinel.context, mock.sentinel.delta_path,
+                mock.sentinel.parent_image_id, fake_image_path, "vmdk",
+                mock.sentinel.user_id, mock.sentinel.project_id)
+
+            m.assert_called_once_with(fake_merged_path, 'wb')
+            self.assertEqual(m().write.mock_calls,
+                             [mock.call("fake"), mock.call("chunks")])
+
+        self._image_cache.get_cached_image.assert_called_once_with(
+            mock.sentinel.context, mock.sentinel.parent_image_id,
+            mock.sentinel.user_id, mock.sentinel.project_id)
+        mock_vmdk_disk.assert_any_call(mock.sentinel.parent_image_path)
+        mock_vmdk_disk.assert_any_call(mock.sentinel.delta_path, fake_disk)
+        mock_get_chunks.assert_called_once_with(fake_disk,
+                                                compression_level=1)
+        self._image_cache._disk_manager.convert_disk.assert_called_once_with(
+            fake_merged_path, fake_image_path, "vmdk")
+        self._image_cache._pathutils.check_remove.assert_called_once_with(
+            fake_merged_path)
 
     def _test_get_cached_image(self, image_exists, exception=False,
                                image_path_exists=False):
@@ -92,7 +186,8 @@ class VixUtilsTestCase(unittest.TestCase):
         self._image_cache.get_image_info = mock.MagicMock()
         self._image_cache.get_image_info.return_value = fake_image_info
         fake_image_info.get = mock.MagicMock()
-        fake_image_info.get.return_value = fake_disk_format
+        fake_image_info.get.side_effect = lambda key, default=None: {
+            "disk_format": fake_disk_format}.get(key, default)
 
         self._image_cache._pathutils.exists = mock.MagicMock()
         self._image_cache._pathutils.exists.return_value = image_exists
@@ -147,3 +242,101 @@ class VixUtilsTestCase(unittest.TestCase):
 
     def test_get_cached_image_not_existent_and_path_exists(self):
         self._test_get_cached_image(False, True, True)
+
+    @mock.patch('nova.virt.images.fetch')
+    @mock.patch('os.path.join')
+    def test_get_cached_image_stream_optimized(self, mock_join, mock_fetch):
+        fake_context = mock.MagicMock()
+        fake_image_id = "fake_image_id"
+        fake_image_path = "fake/base/dir/fake_image_id.vmdk"
+        fake_fetch_path = fake_image_path + ".stream"
+        fake_image_info = {"disk_format": "vmdk",
+                           "properties": {
+                               "vmware_disktype": "streamOptimized"}}
+        self._image_cache.get_image_info = mock.MagicMock(
+            return_value=fake_image_info)
+        self._image_cache._pathutils = mock.MagicMock()
+        self._image_cache._pathutils.exists.return_value = False
+        self._image_cache._disk_manager = mock.MagicMock()
+        mock_join.return_value = fake_image_path
+
+        response = self._image_cache.get_cached_image(
+            fake_context, fake_image_id, mock.sentinel.user_id,
+            mock.sentinel.project_id)
+
+        mock_fetch.assert_called_once_with(fake_context, fake_image_id,
+                                           fake_fetch_path,
+                                           mock.sentinel.user_id,
+                                           mock.sentinel.project_id)
+        self._image_cache._disk_manager.convert_disk.assert_called_once_with(
+            fake_fetch_path, fake_image_path, "vmdk")
+        self._image_cache._pathutils.check_remove.assert_called_once_with(
+            fake_fetch_path)
+        self.assertEqual(response, fake_image_path)
+
+    @mock.patch('nova.virt.images.fetch')
+    @mock.patch('os.path.join')
+    def test_get_cached_image_delta(self, mock_join, mock_fetch):
+        fake_image_path = "fake/base/dir/fake_image_id.vmdk"
+        fake_fetch_path = fake_image_path + ".stream"
+        fake_image_info = {"disk_format": "vmdk",
+                           "properties": {
+                               "vmware_disktype": "streamOptimized",
+                               "vix_parent_image_id": "fake_parent_id"}}
+        self._image_cache.get_image_info = mock.MagicMock(
+            return_value=fake_image_info)
+        self._image_cache._pathutils = mock.MagicMock()
+        self._image_cache._pathutils.exists.return_value = False
+        self._image_cache._disk_manager = mock.MagicMock()
+        self._image_cache._merge_delta_image = mock.MagicMock()
+        mock_join.return_value = fake_image_path
+
+        response = self._image_cache.get_cached_image(
+            mock.sentinel.context, "fake_image_id", mock.sentinel.user_id,
+            mock.sentinel.project_id)
+
+        self._image_cache._merge_delta_image.assert_called_once_with(
+            mock.sentinel.context, fake_fetch_path, "fake_parent_id",
+            fake_image_path, "vmdk", mock.sentinel.user_id,
+            mock.sentinel.project_id)
+        self.assertFalse(self._image_cache._disk_manager.convert_disk.called)
+        self._image_cache._pathutils.check_remove.assert_called_once_with(
+            fake_fetch_path)
+        self.assertEqual(response, fake_image_path)
+
+    @mock.patch('os.path.join')
+    def _test_get_cached_blank_disk(self, mock_join, disk_exists):
+        fake_size_mb = 1024
+        fake_base_vmdk_dir = 'fake/base/dir'
+        fake_disk_path = 'fake/base/dir/blank-1024MB.vmdk'
+        fake_tmp_disk_path = fake_disk_path + '.tmp'
+
+        self._image_cache._pathutils = mock.MagicMock()
+        self._image_cache._pathutils.get_base_vmdk_dir.return_value = (
+            fake_base_vmdk_dir)
+        self._image_cache._pathutils.exists.return_value = disk_exists
+        self._image_cache._disk_manager = mock.MagicMock()
+        mock_join.return_value = fake_disk_path
+
+        response = self._image_cache.get_cached_blank_disk(fake_size_mb)
+
+        self._image_cache._pathutils.get_base_vmdk_dir.assert_called_with(
+            create_dir=True)
+        mock_join.assert_called_with(fake_base_vmdk_dir, "blank-1024MB.vmdk")
+        if disk_exists:
+            self.assertFalse(
+                self._image_cache._disk_manager.create_disk.called)
+        else:
+            self._image_cache._disk_manager.create_disk.assert_called_with(
+                fake_tmp_disk_path, fake_size_mb, "vmdk")
+            self._image_cache._pathutils.rename.assert_called_with(
+                fake_tmp_disk_path, fake_disk_path)
+            self._image_cache._pathutils.check_remove.assert_called_with(
+                fake_tmp_disk_path)
+        self.assertEqual(response, fake_disk_path)
+
+    def test_get_cached_blank_disk_existent(self):
+        self._test_get_cached_blank_disk(disk_exists=True)
+
+    def test_get_cached_blank_disk_not_existent(self):
+        self._test_get_cached_blank_disk(disk_exists=False)
@@ -0,0 +1,197 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import io
+import mock
+import tarfile
+import unittest
+
+from vix.compute import injector
+from vix import utils
+
+_real_tarfile_open = tarfile.open
+
+
+class GuestInjectorTestCase(unittest.TestCase):
+    """Unit tests for the guest files and password injection"""
+
+    def setUp(self):
+        self._injector = injector.GuestInjector()
+        self._injector._pathutils = mock.MagicMock()
+        self._injector._pathutils.get_injection_archive_path.return_value = (
+            'fake/archive/path')
+        self._vm = mock.MagicMock()
+        self._vm.create_temp_file_in_guest.return_value = '/tmp/fake'
+        self._vm.run_program_in_guest.return_value = 0
+
+        injector.CONF.set_override('inject_password', True, 'vix')
+        self.addCleanup(injector.CONF.clear_override, 'inject_password',
+                        'vix')
+        injector.CONF.set_override('guest_username', 'root', 'vix')
+        self.addCleanup(injector.CONF.clear_override, 'guest_username',
+                        'vix')
+
+    @mock.patch('os.fdopen')
+    @mock.patch('os.open')
+    def _test_create_archive(self, mock_os_open, mock_fdopen, contents,
+                             admin_password):
+        data = io.BytesIO()
+        data.close = mock.MagicMock()
+        mock_fdopen.return_value = data
+
+        with mock.patch('tarfile.open') as mock_open:
+            mock_open.side_effect = (
+                lambda path, mode, fileobj: _real_tarfile_open(
+                    fileobj=fileobj, mode=mode))
+            injector.create_archive('fake/path', [('/etc/fake', contents)],
+                                    'root', admin_password)
+
+        self.assertEqual(mock_os_open.call_args[0][0], 'fake/path')
+        self.assertEqual(mock_os_open.call_args[0][2], 0o600)
+        mock_fdopen.assert_called_once_with(mock_os_open.return_value, 'wb')
+        mock_open.assert_called_once_with('fake/path', 'w:gz', fileobj=data)
+        data.seek(0)
+        archive = _real_tarfile_open(fileobj=data, mode='r:gz')
+        self.addCleanup(archive.close)
+        return archive
+
+    def test_create_archive(self):
+        archive = self._test_create_archive(contents='fake_contents',
+                                            admin_password='fake_password')
+
+        self.assertEqual(archive.getnames(),
+                         ['etc/fake', injector._PASSWORD_MEMBER_NAME])
+        self.assertEqual(archive.extractfile('etc/fake').read(),
+                         'fake_contents')
+        password_member = archive.extractfile(injector._PASSWORD_MEMBER_NAME)
+        self.assertEqual(password_member.read(), 'root:fake_password\n')
+
+    def test_create_archive_unicode(self):
+        archive = self._test_create_archive(contents=u'fake_\xe7ontents',
+                                            admin_password=u'fake_p\xe4ss')
+
+        contents_member = archive.getmember('etc/fake')
+        self.assertEqual(contents_member.size, 14)
+        self.assertEqual(archive.extractfile(contents_member).read(),
+                         'fake_\xc3\xa7ontents')
+        password_member = archive.extractfile(injector._PASSWORD_MEMBER_NAME)
+        self.assertEqual(password_member.read(), 'root:fake_p\xc3\xa4ss\n')
+
+    def test_create_archive_invalid_path(self):
+        self.assertRaises(utils.VixException, injector.create_archive,
+                          'fake/path', [('/etc/../fake', 'fake_contents')])
+
+    def test_get_extract_command(self):
+        response = injector.get_extract_command('/tmp/fake', True, True)
+
+        self.assertEqual(
+            response,
+            "(tar -xzf /tmp/fake -C / --exclude=.nova-admin-password && "
+            "tar -xzOf /tmp/fake .nova-admin-password | chpasswd); "
+            "ret=$?; rm -f /tmp/fake; exit $ret")
+
+    def test_get_extract_command_files_only(self):
+        response = injector.get_extract_command('/tmp/fake', True, False)
+
+        self.assertEqual(
+            response,
+            "(tar -xzf /tmp/fake -C / --exclude=.nova-admin-password); "
+            "ret=$?; rm -f /tmp/fake; exit $ret")
+
+    @mock.patch('vix.compute.guesttools.wait_for_tools')
+    @mock.patch('vix.compute.injector.create_archive')
+    def _test_inject(self, mock_create_archive, mock_wait_for_tools,
+                     injected_files=None, admin_password='fake_password',
+                     guest_os='ubuntu-64', properties=None, exit_code=0,
+                     tools_running=True):
+        fake_injected_files = injected_files or []
+        self._vm.run_program_in_guest.return_value = exit_code
+        mock_wait_for_tools.return_value = tools_running
+
+        if exit_code:
+            self.assertRaises(utils.VixException, self._injector.inject,
+                              self._vm, 'fake_name', guest_os,
+                              properties or {}, fake_injected_files,
+                              admin_password)
+        else:
+            self._injector.inject(self._vm, 'fake_name', guest_os,
+                                  properties or {}, fake_injected_files,
+                                  admin_password)
+
+        if mock_create_archive.called:
+            mock_wait_for_tools.assert_called_once_with(
+                self._vm, injector.CONF.vix.guest_tools_timeout)
+        return mock_create_archive
+
+    def test_inject(self):
+        fake_injected_files = [('/etc/fake', 'fake_contents')]
+
+        mock_create_archive = self._test_inject(
+            injected_files=fake_injected_files,
+            properties={'vix_guest_username': 'fake_user',
+                        'vix_guest_password': 'fake_guest_password'})
+
+        mock_create_archive.assert_called_once_with(
+            'fake/archive/path', fake_injected_files, 'fake_user',
+            'fake_password')
+        self._vm.login_in_guest.assert_called_once_with(
+            'fake_user', 'fake_guest_password')
+        self._vm.copy_file_from_host_to_guest.assert_called_once_with(
+            'fake/archive/path', '/tmp/fake')
+        command = injector.get_extract_command('/tmp/fake', True, True)
+        self._vm.run_program_in_guest.assert_called_once_with(
+            "/bin/sh", "-c '%s'" % command)
+        self._vm.logout_from_guest.assert_called_once_with()
+        # Removed before creating the archive and after the injection
+        self.assertEqual(
+            self._injector._pathutils.check_remove.call_args_list,
+            [mock.call('fake/archive/path')] * 2)
+
+    def test_inject_failed(self):
+        self._test_inject(exit_code=1)
+
+        self._vm.logout_from_guest.assert_called_once_with()
+        self._injector._pathutils.check_remove.assert_called_with(
+            'fake/archive/path')
+
+    def test_inject_tools_timeout(self):
+        mock_create_archive = self._test_inject(tools_running=False)
+
+        self.assertFalse(mock_create_archive.called)
+        self.assertFalse(self._vm.login_in_guest.called)
+
+    def test_inject_password_disabled(self):
+        injector.CONF.set_override('inject_password', False, 'vix')
+
+        mock_create_archive = self._test_inject()
+
+        self.assertFalse(mock_create_archive.called)
+        self.assertFalse(self._vm.login_in_guest.called)
+
+    def test_inject_no_credentials(self):
+        injector.CONF.set_override('guest_username', None, 'vix')
+
+        mock_create_archive = self._test_inject()
+
+        self.assertFalse(mock_create_archive.called)
+        self.assertFalse(self._vm.login_in_guest.called)
+
+    def test_inject_windows(self):
+        mock_create_archive = self._test_inject(guest_os='windows8srv-64')
+
+        self.assertFalse(mock_create_archive.called)
+        self.assertFalse(self._vm.login_in_guest.called)
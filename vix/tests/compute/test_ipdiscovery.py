@@ -0,0 +1,259 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+import unittest
+
+from vix.compute import ipdiscovery
+from vix import utils
+from vix import vixlib
+
+
+class GuestIPDiscoveryTestCase(unittest.TestCase):
+    """Unit tests for the GuestIPDiscovery class"""
+
+    def setUp(self):
+        self._conn = mock.MagicMock()
+        self._ip_discovery = ipdiscovery.GuestIPDiscovery(self._conn)
+        self._ip_discovery._dhcp_leases = mock.MagicMock()
+        self._ip_discovery._dhcp_leases.get_ip_address.return_value = None
+
+        patcher = mock.patch('vix.vixutils.get_vmx_mac_addresses')
+        self._mock_get_vmx_mac_addresses = patcher.start()
+        self._mock_get_vmx_mac_addresses.return_value = ['fake_mac']
+        self.addCleanup(patcher.stop)
+
+    @mock.patch('eventlet.spawn_n')
+    def test_get_ip_address_cached(self, mock_spawn_n):
+        self._ip_discovery._ip_addresses['fake_path'] = '10.0.0.2'
+
+        response = self._ip_discovery.get_ip_address('fake_path')
+
+        self.assertEqual(response.wait(), '10.0.0.2')
+        self.assertFalse(mock_spawn_n.called)
+
+    @mock.patch('eventlet.spawn_n')
+    def test_get_ip_address(self, mock_spawn_n):
+        response = self._ip_discovery.get_ip_address('fake_path', 10)
+
+        mock_spawn_n.assert_called_once_with(self._ip_discovery._run)
+        request = self._ip_discovery._requests['fake_path']
+        self.assertEqual(response, request.event)
+
+        # Requests for the same instance share the same event
+        response = self._ip_discovery.get_ip_address('fake_path', 10)
+        self.assertEqual(response, request.event)
+        self.assertEqual(mock_spawn_n.call_count, 1)
+
+    @mock.patch('eventlet.spawn_n')
+    def test_get_ip_address_running(self, mock_spawn_n):
+        self._ip_discovery._running = True
+        self._ip_discovery._wakeup = mock.MagicMock()
+
+        self._ip_discovery.get_ip_address('fake_path', 10)
+
+        self.assertFalse(mock_spawn_n.called)
+        self._ip_discovery._wakeup.put.assert_called_once_with('fake_path')
+
+    def test_invalidate(self):
+        self._ip_discovery._ip_addresses['fake_path'] = '10.0.0.2'
+        self._ip_discovery.invalidate('fake_path')
+        self.assertNotIn('fake_path', self._ip_discovery._ip_addresses)
+
+    def _get_fake_request(self, deadline=1000):
+        request = ipdiscovery._IPAddressRequest('fake_path', deadline)
+        self._ip_discovery._requests['fake_path'] = request
+        return request
+
+    def _test_get_leased_ip_address(self, ip_address):
+        request = self._get_fake_request()
+        get_ip_address = self._ip_discovery._dhcp_leases.get_ip_address
+        get_ip_address.return_value = ip_address
+
+        response = self._ip_discovery._get_leased_ip_address(request)
+
+        self._mock_get_vmx_mac_addresses.assert_called_once_with('fake_path')
+        get_ip_address.assert_called_once_with('fake_mac')
+        if ip_address and not ip_address.startswith('169.254.'):
+            self.assertEqual(response, ip_address)
+        else:
+            self.assertIsNone(response)
+
+    def test_get_leased_ip_address(self):
+        self._test_get_leased_ip_address('192.168.1.10')
+
+    def test_get_leased_ip_address_not_found(self):
+        self._test_get_leased_ip_address(None)
+
+    def test_get_leased_ip_address_link_local(self):
+        self._test_get_leased_ip_address('169.254.1.1')
+
+    def test_poll_leased_ip_address(self):
+        request = self._get_fake_request()
+        self._ip_discovery._dhcp_leases.get_ip_address.return_value = (
+            '192.168.1.10')
+
+        response = self._ip_discovery._poll(request)
+
+        self.assertEqual(response, '192.168.1.10')
+        fake_vm = self._conn.open_vm.return_value
+        self.assertFalse(fake_vm.get_power_state.called)
+
+    def test_poll_tools_not_running(self):
+        request = self._get_fake_request()
+        fake_vm = self._conn.open_vm.return_value
+        fake_vm.get_power_state.return_value = (
+            vixlib.VIX_POWERSTATE_POWERED_ON)
+
+        response = self._ip_discovery._poll(request)
+
+        self.assertIsNone(response)
+        self._conn.open_vm.assert_called_once_with('fake_path')
+        self.assertFalse(fake_vm.read_variable_async.called)
+
+    def test_poll_tools_running(self):
+        request = self._get_fake_request()
+        request.interval = 1
+        fake_vm = self._conn.open_vm.return_value
+        fake_vm.get_power_state.return_value = (
+            vixlib.VIX_POWERSTATE_POWERED_ON |
+            vixlib.VIX_POWERSTATE_TOOLS_RUNNING)
+
+        response = self._ip_discovery._poll(request)
+
+        self.assertIsNone(response)
+        fake_vm.read_variable_async.assert_called_once_with("ip")
+        self.assertEqual(request.job, fake_vm.read_variable_async.return_value)
+        self.assertTrue(request.tools_running)
+        self.assertEqual(request.interval,
+                         ipdiscovery._INITIAL_POLL_INTERVAL)
+
+    def _test_poll_job(self, completed, ip_address='10.0.0.2'):
+        request = self._get_fake_request()
+        request.vm = mock.MagicMock()
+        fake_job = mock.MagicMock()
+        request.job = fake_job
+        fake_job.is_completed.return_value = completed
+        fake_job.get_string_result.return_value = ip_address
+
+        response = self._ip_discovery._poll(request)
+
+        if not completed:
+            self.assertIsNone(response)
+            self.assertEqual(request.job, fake_job)
+            return
+
+        fake_job.get_string_result.assert_called_once_with(
+            vixlib.VIX_PROPERTY_JOB_RESULT_VM_VARIABLE_STRING)
+        fake_job.close.assert_called_once_with()
+        self.assertIsNone(request.job)
+        if ip_address and not ip_address.startswith('169.254.'):
+            self.assertEqual(response, ip_address)
+        else:
+            self.assertIsNone(response)
+
+    def test_poll_job_not_completed(self):
+        self._test_poll_job(completed=False)
+
+    def test_poll_job_completed(self):
+        self._test_poll_job(completed=True)
+
+    def test_poll_job_link_local_address(self):
+        self._test_poll_job(completed=True, ip_address='169.254.1.1')
+
+    def test_poll_job_no_address(self):
+        self._test_poll_job(completed=True, ip_address=None)
+
+    @mock.patch('time.time')
+    def test_poll_requests_found(self, mock_time):
+        mock_time.return_value = 100
+        request = self._get_fake_request()
+        self._ip_discovery._poll = mock.MagicMock(return_value='10.0.0.2')
+
+        self._ip_discovery._poll_requests()
+
+        self.assertEqual(request.event.wait(), '10.0.0.2')
+        self.assertEqual(self._ip_discovery._ip_addresses['fake_path'],
+                         '10.0.0.2')
+        self.assertEqual(self._ip_discovery._requests, {})
+
+    @mock.patch('time.time')
+    def test_poll_requests_backoff(self, mock_time):
+        mock_time.return_value = 100
+        request = self._get_fake_request()
+        self._ip_discovery._poll = mock.MagicMock(return_value=None)
+
+        self._ip_discovery._poll_requests()
+        self._ip_discovery._poll_requests()
+
+        # The second poll is skipped until the next poll time
+        self.assertEqual(self._ip_discovery._poll.call_count, 1)
+        self.assertEqual(request.next_poll,
+                         100 + ipdiscovery._INITIAL_POLL_INTERVAL)
+        self.assertEqual(request.interval,
+                         ipdiscovery._INITIAL_POLL_INTERVAL * 2)
+
+    @mock.patch('time.time')
+    def test_poll_requests_timeout(self, mock_time):
+        mock_time.return_value = 100
+        request = self._get_fake_request(deadline=50)
+        self._ip_discovery._poll = mock.MagicMock(return_value=None)
+
+        self._ip_discovery._poll_requests()
+
+        self.assertRaises(utils.VixException, request.event.wait)
+        self.assertEqual(self._ip_discovery._requests, {})
+
+    @mock.patch('time.time')
+    def test_poll_requests_open_vm_failed(self, mock_time):
+        mock_time.return_value = 100
+        request = self._get_fake_request()
+        self._ip_discovery._poll = mock.MagicMock(
+            side_effect=utils.VixException)
+
+        self._ip_discovery._poll_requests()
+
+        self.assertRaises(utils.VixException, request.event.wait)
+
+    @mock.patch('time.time')
+    def test_poll_requests_transient_error(self, mock_time):
+        mock_time.return_value = 100
+        request = self._get_fake_request()
+        request.vm = mock.MagicMock()
+        self._ip_discovery._poll = mock.MagicMock(
+            side_effect=utils.VixException)
+
+        self._ip_discovery._poll_requests()
+
+        self.assertIn('fake_path', self._ip_discovery._requests)
+        self.assertEqual(request.next_poll,
+                         100 + ipdiscovery._INITIAL_POLL_INTERVAL)
+
+    def test_run(self):
+        self._ip_discovery._running = True
+        self._get_fake_request()
+
+        def fake_poll_requests():
+            self._ip_discovery._requests.clear()
+
+        self._ip_discovery._poll_requests = mock.MagicMock(
+            side_effect=fake_poll_requests)
+
+        self._ip_discovery._run()
+
+        self._ip_discovery._poll_requests.assert_called_once_with()
+        self.assertFalse(self._ip_discovery._running)
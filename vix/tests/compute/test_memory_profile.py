@@ -0,0 +1,56 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import unittest
+
+from vix.compute import memory_profile
+from vix import utils
+
+
+class MemoryProfileTestCase(unittest.TestCase):
+    """Unit tests for the instance memory profile"""
+
+    def _set_override(self, name, value):
+        memory_profile.CONF.set_override(name, value, 'vix')
+        self.addCleanup(memory_profile.CONF.clear_override, name, 'vix')
+
+    def test_get_memory_profile(self):
+        self._set_override('mem_use_named_file', True)
+        self._set_override('min_vm_mem_pct', 50)
+
+        response = memory_profile.get_memory_profile(
+            {"vix:mem_use_named_file": "false",
+             "vix:mem_trim_rate": "0",
+             "vix:mem_page_sharing": "yes"})
+
+        self.assertEqual(response, {"mem_use_named_file": False,
+                                    "mem_trim_rate": 0,
+                                    "mem_page_sharing": True,
+                                    "min_vm_mem_pct": 50})
+
+    def test_get_memory_profile_unset(self):
+        self.assertEqual(memory_profile.get_memory_profile({}), {})
+
+    def test_get_memory_profile_invalid_bool(self):
+        self.assertRaises(utils.VixException,
+                          memory_profile.get_memory_profile,
+                          {"vix:mem_page_sharing": "maybe"})
+
+    def test_get_memory_profile_invalid_pct(self):
+        self.assertRaises(utils.VixException,
+                          memory_profile.get_memory_profile,
+                          {"vix:min_vm_mem_pct": "101"})
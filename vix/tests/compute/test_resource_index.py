@@ -0,0 +1,147 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+import unittest
+
+from vix.compute import resource_index
+
+
+class VMXResourceIndexTestCase(unittest.TestCase):
+    """Unit tests for the VMX resource index"""
+
+    def setUp(self):
+        self._index = resource_index.VMXResourceIndex()
+        self._index._pathutils = mock.MagicMock()
+        self._index._pathutils.get_vmx_path.side_effect = (
+            lambda name: '/instances/%s/%s.vmx' % (name, name))
+
+    @mock.patch('vix.vmdkutils.get_disk_capacity')
+    @mock.patch('vix.vixutils.load_config_file_values')
+    def test_get_vmx_resources(self, mock_load_config_file_values,
+                               mock_get_disk_capacity):
+        mock_load_config_file_values.return_value = {
+            "numvcpus": "2",
+            "memsize": "1024",
+            "scsi0:0.present": "TRUE",
+            "scsi0:0.fileName": "root.vmdk",
+            "scsi0:1.present": "TRUE",
+            "scsi0:1.fileName": "/other/ephemeral.vmdk",
+            "scsi0:2.present": "FALSE",
+            "scsi0:2.fileName": "removed.vmdk",
+            "ide1:0.present": "TRUE",
+            "ide1:0.fileName": "cdrom.iso",
+            "processor0.use": "FALSE"}
+        mock_get_disk_capacity.return_value = 1024
+
+        response = resource_index.get_vmx_resources('/instances/a/a.vmx', 1)
+
+        self.assertEqual(response.disk_paths, ['/instances/a/root.vmdk',
+                                               '/other/ephemeral.vmdk'])
+        self.assertEqual((response.mtime, response.vcpus, response.memory_mb,
+                          response.disk_bytes), (1, 2, 1024, 2048))
+        self.assertNotIn(0, response.cpu_affinity)
+
+    @mock.patch('vix.vmdkutils.get_disk_capacity')
+    @mock.patch('vix.vixutils.load_config_file_values')
+    def test_get_vmx_resources_missing_disk(self,
+                                            mock_load_config_file_values,
+                                            mock_get_disk_capacity):
+        mock_load_config_file_values.return_value = {
+            "scsi0:0.present": "TRUE",
+            "scsi0:0.fileName": "root.vmdk"}
+        mock_get_disk_capacity.side_effect = IOError()
+
+        response = resource_index.get_vmx_resources('/instances/a/a.vmx')
+
+        self.assertEqual((response.vcpus, response.memory_mb,
+                          response.disk_bytes), (1, 0, 0))
+        self.assertIsNone(response.cpu_affinity)
+
+    def _get_fake_resources(self, vmx_path, mtime):
+        vcpus = {'/instances/a/a.vmx': 1, '/instances/b/b.vmx': 2}[vmx_path]
+        return resource_index.VMXResources(mtime=mtime, vcpus=vcpus,
+                                           memory_mb=vcpus * 512,
+                                           disk_bytes=vcpus * 1024)
+
+    @mock.patch('os.stat')
+    @mock.patch('vix.compute.resource_index.get_vmx_resources')
+    @mock.patch('os.path.isfile')
+    @mock.patch('os.listdir')
+    @mock.patch('os.path.isdir')
+    def test_refresh(self, mock_isdir, mock_listdir, mock_isfile,
+                     mock_get_vmx_resources, mock_stat):
+        mock_isdir.return_value = True
+        mock_listdir.return_value = ['a', 'b', '_base']
+        mock_isfile.side_effect = lambda path: not path.endswith('_base.vmx')
+        mock_get_vmx_resources.side_effect = self._get_fake_resources
+        mock_stat.return_value.st_mtime = 1
+
+        self.assertEqual(self._index.get_totals(), (3, 1536, 3072))
+        self._index.refresh()
+        self.assertEqual(mock_get_vmx_resources.call_count, 2)
+
+        mock_listdir.return_value = ['b']
+        self._index.refresh()
+        self.assertEqual(self._index.get_totals(), (2, 1024, 2048))
+        self.assertEqual(mock_get_vmx_resources.call_count, 2)
+
+    @mock.patch('os.stat')
+    @mock.patch('vix.compute.resource_index.get_vmx_resources')
+    def test_update(self, mock_get_vmx_resources, mock_stat):
+        self._index._scanned = True
+        mock_get_vmx_resources.side_effect = self._get_fake_resources
+        mock_stat.return_value.st_mtime = 1
+
+        self._index.update('/instances/a/a.vmx')
+        self._index.update('/instances/b/b.vmx')
+        self.assertEqual(self._index.get_totals(), (3, 1536, 3072))
+
+        mock_stat.return_value.st_mtime = 2
+        mock_get_vmx_resources.side_effect = (
+            lambda vmx_path, mtime: resource_index.VMXResources(
+                mtime=mtime, vcpus=4, memory_mb=4096, disk_bytes=1))
+        self._index.update('/instances/a/a.vmx')
+        self.assertEqual(self._index.get_totals(), (6, 5120, 2049))
+
+        self._index.remove('/instances/a/a.vmx')
+        self.assertEqual(self._index.get_totals(), (2, 1024, 2048))
+
+    @mock.patch('os.stat')
+    def test_update_missing(self, mock_stat):
+        self._index._scanned = True
+        self._index._resources['/instances/a/a.vmx'] = (
+            resource_index.VMXResources(vcpus=1))
+        self._index._vcpus = 1
+        mock_stat.side_effect = OSError()
+
+        self._index.update('/instances/a/a.vmx')
+
+        self.assertEqual(self._index.get_totals(), (0, 0, 0))
+
+    def test_get_cpu_affinities(self):
+        self._index._scanned = True
+        self._index._resources = {
+            '/instances/a/a.vmx': resource_index.VMXResources(
+                cpu_affinity=[0, 1]),
+            '/instances/b/b.vmx': resource_index.VMXResources()}
+
+        self.assertEqual(self._index.get_cpu_affinities(), [[0, 1]])
+        self.assertEqual(self._index.get_cpu_affinity('/instances/a/a.vmx'),
+                         [0, 1])
+        self.assertIsNone(
+            self._index.get_cpu_affinity('/instances/c/c.vmx'))
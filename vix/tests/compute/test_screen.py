@@ -0,0 +1,84 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+import unittest
+
+from vix.compute import screen
+from vix import utils
+
+
+class ScreenCaptureTestCase(unittest.TestCase):
+    """Unit tests for the instance screen captures"""
+
+    def setUp(self):
+        self._set_override('guest_username', 'fake_user')
+        self._set_override('screen_capture_interval', 10)
+        self._vm = mock.MagicMock()
+        self._screen_capture = screen.ScreenCapture(mock.MagicMock())
+        self._session_pool = mock.MagicMock()
+        self._session_pool.execute.side_effect = (
+            lambda vmx_path, operation: operation(self._vm))
+        self._screen_capture._session_pool = self._session_pool
+
+    def _set_override(self, name, value):
+        screen.CONF.set_override(name, value, 'vix')
+        self.addCleanup(screen.CONF.clear_override, name, 'vix')
+
+    @mock.patch('time.time')
+    def test_get_screen_image(self, mock_time):
+        mock_time.side_effect = [100, 105, 110]
+        self._vm.capture_screen.side_effect = ['fake_image1', 'fake_image2']
+
+        responses = [self._screen_capture.get_screen_image('fake/vmx/path')
+                     for i in range(3)]
+
+        self.assertEqual(responses,
+                         ['fake_image1', 'fake_image1', 'fake_image2'])
+        self.assertEqual(self._vm.capture_screen.call_count, 2)
+
+    @mock.patch('time.time')
+    def test_get_screen_image_failed(self, mock_time):
+        mock_time.side_effect = [100, 105]
+        self._vm.capture_screen.side_effect = utils.VixException("fake")
+
+        for i in range(2):
+            self.assertRaises(utils.VixException,
+                              self._screen_capture.get_screen_image,
+                              'fake/vmx/path')
+        self._vm.capture_screen.assert_called_once_with()
+
+    def test_get_screen_image_no_credentials(self):
+        self._set_override('guest_username', None)
+
+        self.assertRaises(utils.VixException,
+                          self._screen_capture.get_screen_image,
+                          'fake/vmx/path')
+        self.assertFalse(self._session_pool.execute.called)
+
+    @mock.patch('time.time')
+    def test_invalidate(self, mock_time):
+        mock_time.side_effect = [100, 101]
+        self._vm.capture_screen.side_effect = ['fake_image1', 'fake_image2']
+
+        self._screen_capture.get_screen_image('fake/vmx/path')
+        self._screen_capture.invalidate('fake/vmx/path')
+        response = self._screen_capture.get_screen_image('fake/vmx/path')
+
+        self.assertEqual(response, 'fake_image2')
+        self._session_pool.invalidate.assert_called_once_with(
+            'fake/vmx/path')
@@ -0,0 +1,150 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+import unittest
+
+from vix.compute import shared_folders
+from vix import utils
+from vix import vixlib
+
+
+class SharedFoldersTestCase(unittest.TestCase):
+    """Unit tests for the instance shared folders"""
+
+    def setUp(self):
+        self._manager = shared_folders.SharedFolderManager()
+        self._set_override('shared_folders_allowed_paths', ['/data'])
+
+        wait_for_tools_patcher = mock.patch(
+            'vix.compute.guesttools.wait_for_tools', return_value=True)
+        self._mock_wait_for_tools = wait_for_tools_patcher.start()
+        self.addCleanup(wait_for_tools_patcher.stop)
+
+    def _set_override(self, name, value):
+        shared_folders.CONF.set_override(name, value, 'vix')
+        self.addCleanup(shared_folders.CONF.clear_override, name, 'vix')
+
+    def test_parse_shared_folders(self):
+        response = shared_folders.parse_shared_folders(
+            "cache=/data/cache, fixtures=/data/fixtures:rw,"
+            "win=C:\\data:ro,")
+
+        self.assertEqual([(f.share_name, f.host_path, f.writable)
+                          for f in response],
+                         [('cache', '/data/cache', False),
+                          ('fixtures', '/data/fixtures', True),
+                          ('win', 'C:\\data', False)])
+
+    def test_parse_shared_folders_invalid(self):
+        for value in ["/data/cache", "ca che=/data/cache"]:
+            self.assertRaises(utils.VixException,
+                              shared_folders.parse_shared_folders, value)
+
+    @mock.patch('os.path.isdir')
+    @mock.patch('os.path.realpath')
+    def _test_get_shared_folders(self, mock_realpath, mock_isdir,
+                                 properties, extra_specs={},
+                                 allow_write=False):
+        mock_realpath.side_effect = lambda path: path
+        mock_isdir.return_value = True
+        self._set_override('shared_folders_allow_write', allow_write)
+
+        return self._manager.get_shared_folders(properties, extra_specs)
+
+    def test_get_shared_folders(self):
+        response = self._test_get_shared_folders(
+            properties={shared_folders.IMAGE_PROPERTY:
+                        "b=/data/b,a=/data/a"},
+            extra_specs={shared_folders.EXTRA_SPEC: "b=/data/c"})
+
+        self.assertEqual([(f.share_name, f.host_path) for f in response],
+                         [('a', '/data/a'), ('b', '/data/c')])
+
+    def test_get_shared_folders_none(self):
+        response = self._test_get_shared_folders(properties={})
+        self.assertEqual(response, [])
+
+    def test_get_shared_folders_not_allowed(self):
+        for host_path in ["/data2", "/etc", "/"]:
+            self.assertRaises(
+                utils.VixException, self._test_get_shared_folders,
+                properties={shared_folders.IMAGE_PROPERTY:
+                            "a=%s" % host_path})
+
+    def test_get_shared_folders_writable(self):
+        properties = {shared_folders.IMAGE_PROPERTY: "a=/data:rw"}
+
+        self.assertRaises(utils.VixException, self._test_get_shared_folders,
+                          properties=properties)
+        response = self._test_get_shared_folders(properties=properties,
+                                                 allow_write=True)
+        self.assertTrue(response[0].writable)
+
+    def test_add_shared_folders(self):
+        fake_vm = mock.MagicMock()
+        fake_shared_folders = [
+            shared_folders.SharedFolder('a', '/data/a'),
+            shared_folders.SharedFolder('b', '/data/b', writable=True)]
+
+        self._manager.add_shared_folders(fake_vm, fake_shared_folders)
+
+        self._mock_wait_for_tools.assert_called_once_with(
+            fake_vm, shared_folders.CONF.vix.guest_tools_timeout)
+        fake_vm.enable_shared_folders.assert_called_once_with(True)
+        self.assertEqual(fake_vm.add_shared_folder.call_args_list,
+                         [mock.call('a', '/data/a', False),
+                          mock.call('b', '/data/b', True)])
+
+    def test_add_shared_folders_tools_timeout(self):
+        fake_vm = mock.MagicMock()
+        self._mock_wait_for_tools.return_value = False
+
+        self._manager.add_shared_folders(
+            fake_vm, [shared_folders.SharedFolder('a', '/data/a')])
+
+        self.assertFalse(fake_vm.enable_shared_folders.called)
+        self.assertFalse(fake_vm.add_shared_folder.called)
+
+    def test_add_shared_folders_existing(self):
+        fake_vm = mock.MagicMock()
+        fake_vm.add_shared_folder.side_effect = utils.VixException(
+            "fake", error_code=vixlib.VIX_E_ALREADY_EXISTS)
+        fake_shared_folders = [shared_folders.SharedFolder('a', '/data/a')]
+
+        self._manager.add_shared_folders(fake_vm, fake_shared_folders)
+
+        fake_vm.set_shared_folder_state.assert_called_once_with(
+            'a', '/data/a', False)
+
+    def test_add_shared_folders_failure(self):
+        fake_vm = mock.MagicMock()
+        fake_vm.add_shared_folder.side_effect = utils.VixException(
+            "fake", error_code=vixlib.VIX_E_FAIL)
+        fake_shared_folders = [shared_folders.SharedFolder('a', '/data/a')]
+
+        self.assertRaises(utils.VixException,
+                          self._manager.add_shared_folders, fake_vm,
+                          fake_shared_folders)
+        self.assertFalse(fake_vm.set_shared_folder_state.called)
+
+    def test_add_shared_folders_none(self):
+        fake_vm = mock.MagicMock()
+
+        self._manager.add_shared_folders(fake_vm, [])
+
+        self.assertFalse(self._mock_wait_for_tools.called)
@@ -0,0 +1,117 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+import unittest
+
+from vix import cpuutils
+
+_FAKE_PROC_CPUINFO = """processor\t: 0
+vendor_id\t: GenuineIntel
+model name\t: Fake CPU @ 2.00GHz
+physical id\t: 0
+core id\t\t: 0
+flags\t\t: fpu vmx ept sse2
+
+processor\t: 1
+vendor_id\t: GenuineIntel
+model name\t: Fake CPU @ 2.00GHz
+physical id\t: 0
+core id\t\t: 0
+flags\t\t: fpu vmx ept sse2
+
+processor\t: 2
+vendor_id\t: GenuineIntel
+model name\t: Fake CPU @ 2.00GHz
+physical id\t: 0
+core id\t\t: 1
+flags\t\t: fpu vmx ept sse2
+
+processor\t: 3
+vendor_id\t: GenuineIntel
+model name\t: Fake CPU @ 2.00GHz
+physical id\t: 0
+core id\t\t: 1
+flags\t\t: fpu vmx ept sse2
+"""
+
+
+class CPUUtilsTestCase(unittest.TestCase):
+    """Unit tests for the host CPU probe"""
+
+    def setUp(self):
+        cpuutils._cpu_info = None
+        self.addCleanup(setattr, cpuutils, '_cpu_info', None)
+
+    def test_parse_proc_cpuinfo(self):
+        response = cpuutils.parse_proc_cpuinfo(_FAKE_PROC_CPUINFO)
+
+        self.assertEqual(len(response), 4)
+        self.assertEqual(response[2]["core id"], "1")
+        self.assertEqual(response[3]["flags"], "fpu vmx ept sse2")
+
+    def test_get_topology(self):
+        core_ids = [(p, c) for p in ("0", "1") for c in ("0", "1", "2")] * 2
+
+        response = cpuutils.get_topology(core_ids)
+
+        self.assertEqual(response, {"sockets": 2, "cores": 3, "threads": 2})
+
+    @mock.patch('platform.machine')
+    @mock.patch('vix.cpuutils._get_sysfs_core_ids')
+    @mock.patch('vix.cpuutils._read_file')
+    @mock.patch('os.path.exists')
+    def test_get_cpu_info_linux(self, mock_exists, mock_read_file,
+                                mock_get_sysfs_core_ids, mock_machine):
+        mock_exists.return_value = True
+        mock_read_file.return_value = _FAKE_PROC_CPUINFO
+        mock_get_sysfs_core_ids.side_effect = IOError()
+        mock_machine.return_value = 'x86_64'
+
+        response = cpuutils.get_cpu_info()
+        cpuutils.get_cpu_info()
+
+        mock_read_file.assert_called_once_with(cpuutils._PROC_CPUINFO_PATH)
+        self.assertEqual(response,
+                         {"vendor": "Intel",
+                          "model": "Fake CPU @ 2.00GHz",
+                          "arch": "x86_64",
+                          "topology": {"sockets": 1, "cores": 2,
+                                       "threads": 2},
+                          "features": ["ept", "fpu", "sse2", "vmx"]})
+
+    @mock.patch('vix.utils.get_cpu_count')
+    @mock.patch('os.path.exists')
+    def test_get_cpu_info_generic(self, mock_exists, mock_get_cpu_count):
+        mock_exists.return_value = False
+        mock_get_cpu_count.return_value = 4
+
+        response = cpuutils.get_cpu_info()
+
+        self.assertEqual(response["topology"],
+                         {"sockets": 1, "cores": 4, "threads": 1})
+        self.assertIsNone(response["features"])
+
+    def test_has_hw_virtualization(self):
+        self.assertTrue(cpuutils.has_hw_virtualization(["svm"]))
+        self.assertFalse(cpuutils.has_hw_virtualization(["npt"]))
+
+    def test_has_second_level_address_translation(self):
+        self.assertTrue(
+            cpuutils.has_second_level_address_translation(["npt"]))
+        self.assertFalse(
+            cpuutils.has_second_level_address_translation(["vmx"]))
@@ -268,3 +268,89 @@ class DiskManagerTestCase(unittest.TestCase):
 
     def test_resize_disku(self):
         self._test_resize_disk()
+
+    @mock.patch('os.path.exists')
+    def _test_get_low_priority_args(self, mock_exists, platform,
+                                    ionice_exists=True):
+        fake_args = ['fake', 'args']
+        mock_exists.return_value = ionice_exists
+
+        with mock.patch('sys.platform', platform):
+            response = self._disk_manager._get_low_priority_args(fake_args)
+
+        if platform == 'win32':
+            self.assertEqual(response, fake_args)
+        elif ionice_exists:
+            self.assertEqual(response, ["nice", "-n", "19",
+                                        "/usr/bin/ionice", "-c", "3",
+                                        'fake', 'args'])
+        else:
+            self.assertEqual(response, ["nice", "-n", "19", 'fake', 'args'])
+
+    def test_get_low_priority_args(self):
+        self._test_get_low_priority_args(platform='linux2')
+
+    def test_get_low_priority_args_no_ionice(self):
+        self._test_get_low_priority_args(platform='darwin',
+                                         ionice_exists=False)
+
+    def test_get_low_priority_args_win32(self):
+        self._test_get_low_priority_args(platform='win32')
+
+    def _test_compact_disk(self, vdisk_man_exists=True):
+        fake_disk_path = "disk_path"
+        fake_vdisk_man = "vdisk_man_path"
+        self._disk_manager._check_vdisk_man_exists = mock.MagicMock(
+            return_value=vdisk_man_exists)
+        self._disk_manager._get_vdisk_man_path = mock.MagicMock(
+            return_value=fake_vdisk_man)
+        self._disk_manager._get_low_priority_args = mock.MagicMock(
+            side_effect=lambda args: args)
+        self._disk_manager._exec_cmd = mock.MagicMock()
+
+        if not vdisk_man_exists:
+            self.assertRaises(utils.VixException,
+                              self._disk_manager.compact_disk,
+                              fake_disk_path)
+        else:
+            self._disk_manager.compact_disk(fake_disk_path)
+            self.assertEqual(
+                self._disk_manager._exec_cmd.mock_calls,
+                [mock.call([fake_vdisk_man, "-d", fake_disk_path]),
+                 mock.call([fake_vdisk_man, "-k", fake_disk_path])])
+            self.assertEqual(
+                self._disk_manager._get_low_priority_args.call_count, 2)
+
+    def test_compact_disk(self):
+        self._test_compact_disk()
+
+    def test_compact_disk_no_vdisk_man(self):
+        self._test_compact_disk(vdisk_man_exists=False)
+
+    def _test_convert_disk(self, vdisk_man_exists=True):
+        fake_src_path = "src_path"
+        fake_dest_path = "dest_path"
+        fake_vdisk_man = "vdisk_man_path"
+        self._disk_manager._check_vdisk_man_exists = mock.MagicMock(
+            return_value=vdisk_man_exists)
+        self._disk_manager._get_vdisk_man_path = mock.MagicMock(
+            return_value=fake_vdisk_man)
+        self._disk_manager._exec_cmd = mock.MagicMock()
+
+        self._disk_manager.convert_disk(fake_src_path, fake_dest_path,
+                                        disk_manager.DISK_TYPE_VMDK)
+
+        if vdisk_man_exists:
+            fake_args = [fake_vdisk_man, "-r", fake_src_path, "-t", "0",
+                         fake_dest_path]
+        else:
+            fake_args = ["qemu-img", "convert", "-O",
+                         disk_manager.DISK_TYPE_VMDK, fake_src_path,
+                         fake_dest_path]
+        self._disk_manager._exec_cmd.assert_called_once_with(fake_args)
+
+    def test_convert_disk_vdisk_man(self):
+        self._test_convert_disk()
+
+    def test_convert_disk_qemu(self):
+        self._test_convert_disk(vdisk_man_exists=False)
@@ -0,0 +1,285 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import io
+import mock
+import unittest
+
+from vix import guestutils
+from vix import utils
+from vix import vixlib
+
+
+class GuestProcessTestCase(unittest.TestCase):
+    """Unit tests for the guest processes"""
+
+    @mock.patch('os.close')
+    @mock.patch('tempfile.mkstemp')
+    def setUp(self, mock_mkstemp, mock_close):
+        mock_mkstemp.return_value = (3, 'fake/host/path')
+        self._vm = mock.MagicMock()
+        self._session_pool = mock.MagicMock()
+        self._session_pool.execute.side_effect = (
+            lambda vmx_path, operation: operation(self._vm))
+        self._job = mock.MagicMock()
+        self._process = guestutils.GuestProcess(
+            self._session_pool, 'fake/vmx/path', self._job, 'fake/guest/path')
+
+    def _mock_open(self, mock_open, outputs):
+        self._vm.get_file_info_in_guest.side_effect = [
+            {"size": len(output)} for output in outputs]
+        mock_open.side_effect = [io.BytesIO(output) for output in outputs
+                                 if output]
+
+    def test_read_output(self):
+        with mock.patch('vix.guestutils.open', create=True) as mock_open:
+            self._mock_open(mock_open, ["abc", "abcdef"])
+            self.assertEqual(self._process.read_output(), "abc")
+            self.assertEqual(self._process.read_output(), "def")
+
+        self._session_pool.execute.assert_called_with('fake/vmx/path',
+                                                      mock.ANY)
+        self._vm.get_file_info_in_guest.assert_called_with('fake/guest/path')
+        self._vm.copy_file_from_guest_to_host.assert_called_with(
+            'fake/guest/path', 'fake/host/path')
+        mock_open.assert_called_with('fake/host/path', 'rb')
+
+    def test_read_output_unchanged(self):
+        with mock.patch('vix.guestutils.open', create=True) as mock_open:
+            self._mock_open(mock_open, ["abc", "abc"])
+            self.assertEqual(self._process.read_output(), "abc")
+            self.assertEqual(self._process.read_output(), "")
+
+        self._vm.copy_file_from_guest_to_host.assert_called_once_with(
+            'fake/guest/path', 'fake/host/path')
+
+    def test_poll(self):
+        self._job.is_completed.side_effect = [False, True]
+        self._job.get_int_result.return_value = 1
+
+        self.assertIsNone(self._process.poll())
+        self.assertEqual(self._process.poll(), 1)
+        self.assertEqual(self._process.poll(), 1)
+
+        self._job.get_int_result.assert_called_once_with(
+            vixlib.VIX_PROPERTY_JOB_RESULT_GUEST_PROGRAM_EXIT_CODE)
+
+    @mock.patch('os.remove')
+    @mock.patch('time.sleep')
+    def _test_wait(self, mock_sleep, mock_remove, output_callback=None):
+        self._job.is_completed.side_effect = [False, True]
+        self._job.get_int_result.return_value = 0
+
+        with mock.patch('vix.guestutils.open', create=True) as mock_open:
+            self._mock_open(mock_open, ["abc", "abcdef"])
+            response = self._process.wait(output_callback, poll_interval=5)
+
+        mock_sleep.assert_called_once_with(5)
+        self._job.close.assert_called_once_with()
+        self._vm.delete_file_in_guest.assert_called_once_with(
+            'fake/guest/path')
+        mock_remove.assert_called_once_with('fake/host/path')
+        return response
+
+    @mock.patch('os.remove')
+    @mock.patch('time.sleep')
+    def test_wait_backoff(self, mock_sleep, mock_remove):
+        self._job.is_completed.side_effect = [False] * 6 + [True]
+        self._job.get_int_result.return_value = 0
+
+        with mock.patch('vix.guestutils.open', create=True) as mock_open:
+            self._mock_open(mock_open, ["", "", "", "a", "a", "a", "a"])
+            response = self._process.wait(poll_interval=3)
+
+        self.assertEqual(mock_sleep.call_args_list,
+                         [mock.call(3), mock.call(6), mock.call(10),
+                          mock.call(10), mock.call(3), mock.call(6)])
+        self.assertEqual(response, (0, "a"))
+
+    @mock.patch('os.remove')
+    def test_close_delete_guest_file_failure(self, mock_remove):
+        self._vm.delete_file_in_guest.side_effect = utils.VixException()
+
+        self.assertRaises(utils.VixException, self._process.close)
+
+        mock_remove.assert_called_once_with('fake/host/path')
+
+    def test_wait(self):
+        response = self._test_wait()
+        self.assertEqual(response, (0, "abcdef"))
+
+    def test_wait_output_callback(self):
+        output_callback = mock.MagicMock()
+
+        response = self._test_wait(output_callback=output_callback)
+
+        self.assertEqual(output_callback.call_args_list,
+                         [mock.call("abc"), mock.call("def")])
+        self.assertEqual(response, (0, ""))
+
+
+class GuestExecutorTestCase(unittest.TestCase):
+    """Unit tests for the guest command executor"""
+
+    def setUp(self):
+        self._vm = mock.MagicMock()
+        self._session_pool = mock.MagicMock()
+        self._session_pool.execute.side_effect = (
+            lambda vmx_path, operation: operation(self._vm))
+        self._executor = guestutils.GuestExecutor(self._session_pool)
+
+    def test_get_shell_command(self):
+        response = guestutils.get_shell_command("echo 'a'", "/tmp/out")
+        self.assertEqual(response,
+                         ("/bin/sh",
+                          "-c '(echo '\"'\"'a'\"'\"') > /tmp/out 2>&1'"))
+
+    def test_get_shell_command_windows(self):
+        response = guestutils.get_shell_command("dir", "C:\\out",
+                                                windows=True)
+        self.assertEqual(response, ("cmd.exe", '/c "dir > "C:\\out" 2>&1"'))
+
+    @mock.patch('vix.guestutils.GuestProcess')
+    def test_execute(self, mock_guest_process):
+        self._vm.create_temp_file_in_guest.return_value = '/tmp/out'
+
+        response = self._executor.execute('fake/vmx/path', 'fake_command')
+
+        self._vm.run_program_in_guest_async.assert_called_once_with(
+            *guestutils.get_shell_command('fake_command', '/tmp/out'))
+        mock_guest_process.assert_called_once_with(
+            self._session_pool, 'fake/vmx/path',
+            self._vm.run_program_in_guest_async.return_value, '/tmp/out')
+        self.assertEqual(response, mock_guest_process.return_value)
+
+    @mock.patch('vix.guestutils.GuestProcess')
+    def test_execute_failure(self, mock_guest_process):
+        self._vm.create_temp_file_in_guest.return_value = '/tmp/out'
+        self._vm.run_program_in_guest_async.side_effect = (
+            utils.VixException())
+
+        self.assertRaises(utils.VixException, self._executor.execute,
+                          'fake/vmx/path', 'fake_command')
+
+        self._vm.delete_file_in_guest.assert_called_once_with('/tmp/out')
+        self.assertFalse(mock_guest_process.called)
+
+    def test_close(self):
+        self._executor.close()
+        self._session_pool.close.assert_called_once_with()
+
+
+class GuestDirectorySyncTestCase(unittest.TestCase):
+    """Unit tests for the guest directory sync"""
+
+    def setUp(self):
+        self._vm = mock.MagicMock()
+        self._session_pool = mock.MagicMock()
+        self._session_pool.execute.side_effect = (
+            lambda vmx_path, operation: operation(self._vm))
+
+    def test_join_guest_path(self):
+        self.assertEqual(guestutils.join_guest_path('/tmp/', 'a'), '/tmp/a')
+        self.assertEqual(guestutils.join_guest_path('C:\\tmp', 'a',
+                                                    windows=True),
+                         'C:\\tmp\\a')
+
+    @mock.patch('os.stat')
+    @mock.patch('os.walk')
+    def test_get_changed_files(self, mock_walk, mock_stat):
+        mock_walk.return_value = [('/host', ['sub'], ['same', 'changed']),
+                                  ('/host/sub', [], ['new'])]
+        mock_stat.return_value = mock.MagicMock(st_size=10, st_mtime=100.5)
+        guest_files = {
+            '/guest': [{'name': 'same', 'size': 10, 'flags': 0,
+                        'mod_time': 100},
+                       {'name': 'changed', 'size': 10, 'flags': 0,
+                        'mod_time': 99}]}
+
+        def list_directory_in_guest(guest_path):
+            if guest_path not in guest_files:
+                raise utils.VixException(
+                    "fake", error_code=vixlib.VIX_E_FILE_NOT_FOUND)
+            return guest_files[guest_path]
+
+        self._vm.list_directory_in_guest.side_effect = list_directory_in_guest
+
+        response = guestutils._get_changed_files(
+            self._session_pool, 'fake/vmx/path', '/host', '/guest', False)
+
+        self._vm.create_directory_in_guest.assert_called_once_with(
+            '/guest/sub')
+        self.assertEqual(response, [('/host/changed', '/guest/changed'),
+                                    ('/host/sub/new', '/guest/sub/new')])
+
+    def test_list_guest_dir_error(self):
+        self._vm.list_directory_in_guest.side_effect = utils.VixException(
+            "fake", error_code=vixlib.VIX_E_FAIL)
+
+        self.assertRaises(utils.VixException, guestutils._list_guest_dir,
+                          self._session_pool, 'fake/vmx/path', '/guest')
+        self.assertFalse(self._vm.create_directory_in_guest.called)
+
+    @mock.patch('time.sleep')
+    @mock.patch('vix.guestutils._get_changed_files')
+    def test_sync_directory_to_guest(self, mock_get_changed_files,
+                                     mock_sleep):
+        mock_get_changed_files.return_value = [
+            ('/host/%d' % i, '/guest/%d' % i) for i in range(3)]
+        fake_jobs = [mock.MagicMock() for i in range(3)]
+        fake_jobs[0].is_completed.side_effect = [False, True]
+        fake_jobs[1].is_completed.side_effect = [False, False, True]
+        fake_jobs[2].is_completed.return_value = True
+        self._vm.copy_file_from_host_to_guest_async.side_effect = fake_jobs
+
+        response = guestutils.sync_directory_to_guest(
+            self._session_pool, 'fake/vmx/path', '/host', '/guest',
+            max_transfers=2)
+
+        self.assertEqual(response, 3)
+        mock_get_changed_files.assert_called_once_with(
+            self._session_pool, 'fake/vmx/path', '/host', '/guest', False)
+        self.assertEqual(
+            self._vm.copy_file_from_host_to_guest_async.call_args_list,
+            [mock.call('/host/0', '/guest/0'),
+             mock.call('/host/1', '/guest/1'),
+             mock.call('/host/2', '/guest/2')])
+        # The third copy starts only when one of the first two completes
+        self.assertEqual(mock_sleep.call_count, 1)
+        for fake_job in fake_jobs:
+            fake_job.wait.assert_called_once_with()
+            fake_job.close.assert_called_once_with()
+
+    @mock.patch('time.sleep')
+    @mock.patch('vix.guestutils._get_changed_files')
+    def test_sync_directory_to_guest_failed(self, mock_get_changed_files,
+                                            mock_sleep):
+        mock_get_changed_files.return_value = [
+            ('/host/%d' % i, '/guest/%d' % i) for i in range(2)]
+        fake_jobs = [mock.MagicMock() for i in range(2)]
+        fake_jobs[0].is_completed.return_value = True
+        fake_jobs[0].wait.side_effect = utils.VixException("fake")
+        fake_jobs[1].is_completed.return_value = False
+        self._vm.copy_file_from_host_to_guest_async.side_effect = fake_jobs
+
+        self.assertRaises(utils.VixException,
+                          guestutils.sync_directory_to_guest,
+                          self._session_pool, 'fake/vmx/path', '/host',
+                          '/guest')
+
+        for fake_job in fake_jobs:
+            fake_job.close.assert_called_once_with()
@@ -0,0 +1,153 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import io
+import mock
+import struct
+import unittest
+
+from vix import isoutils
+from vix import utils
+
+_SECTOR_SIZE = isoutils.SECTOR_SIZE
+
+
+class ISOUtilsTestCase(unittest.TestCase):
+    """Unit tests for the ISO image writer"""
+
+    def _write_iso(self, files):
+        data = io.BytesIO()
+        data.close = mock.MagicMock()
+        with mock.patch('vix.isoutils.open', create=True) as mock_open:
+            mock_open.return_value = data
+            isoutils.write_iso('fake.iso', files, 'config-2')
+        return data.getvalue()
+
+    def _get_volume_descriptor(self, data, index):
+        offset = (16 + index) * _SECTOR_SIZE
+        return data[offset:offset + _SECTOR_SIZE]
+
+    def _read_dir(self, data, extent, size, joliet):
+        entries = {}
+        dir_data = data[extent * _SECTOR_SIZE:extent * _SECTOR_SIZE + size]
+        offset = 0
+        while offset < len(dir_data):
+            record_len = ord(dir_data[offset])
+            if not record_len:
+                # Records do not span sectors
+                offset = (offset // _SECTOR_SIZE + 1) * _SECTOR_SIZE
+                continue
+            (child_extent, child_size) = struct.unpack_from(
+                "<I4xI", dir_data, offset + 2)
+            flags = ord(dir_data[offset + 25])
+            name_len = ord(dir_data[offset + 32])
+            name = dir_data[offset + 33:offset + 33 + name_len]
+            offset += record_len
+
+            if name in ["\0", "\1"]:
+                continue
+            if joliet:
+                name = name.decode("utf-16-be")
+            if flags & 2:
+                entries[name] = self._read_dir(data, child_extent,
+                                               child_size, joliet)
+            else:
+                entries[name] = (child_extent, data[
+                    child_extent * _SECTOR_SIZE:
+                    child_extent * _SECTOR_SIZE + child_size])
+        return entries
+
+    def _read_tree(self, data, index):
+        vd = self._get_volume_descriptor(data, index)
+        (extent, size) = struct.unpack_from("<I4xI", vd, 156 + 2)
+        return self._read_dir(data, extent, size, index == 1)
+
+    def test_write_iso(self):
+        files = [("openstack/latest/meta_data.json", "{}"),
+                 ("openstack/latest/user_data", "u" * 3000),
+                 ("openstack/2012-08-10/user_data", "u" * 3000),
+                 ("ec2/latest/meta-data.json", "m"),
+                 ("openstack/content/0000", "")]
+
+        data = self._write_iso(files)
+        self.assertEqual(len(data) % _SECTOR_SIZE, 0)
+
+        pvd = self._get_volume_descriptor(data, 0)
+        self.assertEqual(pvd[:6], "\1CD001")
+        self.assertEqual(pvd[40:72].rstrip(), "config-2")
+        self.assertEqual(struct.unpack_from("<I", pvd, 80)[0],
+                         len(data) // _SECTOR_SIZE)
+
+        svd = self._get_volume_descriptor(data, 1)
+        self.assertEqual(svd[:6], "\2CD001")
+        self.assertEqual(svd[88:91], "%/E")
+        self.assertEqual(svd[40:72].decode("utf-16-be").rstrip(),
+                         "config-2")
+
+        terminator = self._get_volume_descriptor(data, 2)
+        self.assertEqual(terminator[:6], "\xffCD001")
+
+        joliet_tree = self._read_tree(data, 1)
+        openstack_dir = joliet_tree["openstack"]
+        self.assertEqual(openstack_dir["latest"]["meta_data.json"][1], "{}")
+        self.assertEqual(openstack_dir["content"]["0000"][1], "")
+        self.assertEqual(joliet_tree["ec2"]["latest"]["meta-data.json"][1],
+                         "m")
+        # Identical contents share the same extent
+        user_data = openstack_dir["latest"]["user_data"]
+        self.assertEqual(user_data[1], "u" * 3000)
+        self.assertEqual(openstack_dir["2012-08-10"]["user_data"], user_data)
+
+        primary_tree = self._read_tree(data, 0)
+        self.assertEqual(primary_tree["OPENSTAC"]["LATEST"]["USER_DAT;1"],
+                         user_data)
+        self.assertEqual(
+            primary_tree["OPENSTAC"]["LATEST"]["META_DAT.JSO;1"][1], "{}")
+
+    def test_write_iso_many_files(self):
+        # Directory records spanning more than one sector
+        files = [("dir/file_with_a_long_name_%03d" % i, str(i))
+                 for i in range(100)]
+
+        data = self._write_iso(files)
+
+        joliet_tree = self._read_tree(data, 1)
+        self.assertEqual(len(joliet_tree["dir"]), 100)
+        self.assertEqual(joliet_tree["dir"]["file_with_a_long_name_042"][1],
+                         "42")
+        primary_tree = self._read_tree(data, 0)
+        self.assertEqual(len(primary_tree["DIR"]), 100)
+
+    def test_write_iso_path_conflict(self):
+        self.assertRaises(utils.VixException, self._write_iso,
+                          [("a", "1"), ("a/b", "2")])
+
+    def test_write_iso_duplicate_path(self):
+        self.assertRaises(utils.VixException, self._write_iso,
+                          [("a/b", "1"), ("/a/b", "2")])
+
+    def test_get_primary_identifier(self):
+        used_identifiers = set()
+        for (name, is_dir, expected) in [
+                ("meta_data.json", False, "META_DAT.JSO;1"),
+                ("meta_data.jsonx", False, "META_DA1.JSO;1"),
+                ("2013-10-17", True, "2013_10_"),
+                ("no_extension", False, "NO_EXTEN;1")]:
+            identifier = isoutils._get_primary_identifier(name, is_dir,
+                                                          used_identifiers)
+            used_identifiers.add(identifier)
+            self.assertEqual(identifier, expected)
@@ -0,0 +1,110 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+import unittest
+
+from vix import utils
+
+
+class UtilsTestCase(unittest.TestCase):
+    """Unit tests for the utility functions"""
+
+    def _get_fake_process(self, pid, name):
+        process = mock.MagicMock(pid=pid)
+        process.name.return_value = name
+        process.cmdline.return_value = [name, 'fake.vmx']
+        process.cpu_times.return_value = mock.MagicMock(user=1.0, system=0.5)
+        process.memory_info.return_value = mock.MagicMock(rss=1024)
+        process.io_counters.return_value = mock.MagicMock(read_bytes=10,
+                                                          write_bytes=20)
+        return process
+
+    @mock.patch('psutil.process_iter')
+    def test_get_processes_info(self, mock_process_iter):
+        fake_processes = [self._get_fake_process(1, 'vmware-vmx'),
+                          self._get_fake_process(2, 'other'),
+                          self._get_fake_process(3, 'vmware-vmx')]
+        fake_processes[2].io_counters.side_effect = NotImplementedError()
+        mock_process_iter.return_value = fake_processes
+
+        response = utils.get_processes_info(['vmware-vmx'])
+
+        self.assertEqual(response,
+                         [{'pid': 1, 'cmdline': ['vmware-vmx', 'fake.vmx'],
+                           'cpu_time': 1.5, 'rss': 1024, 'read_bytes': 10,
+                           'write_bytes': 20},
+                          {'pid': 3, 'cmdline': ['vmware-vmx', 'fake.vmx'],
+                           'cpu_time': 1.5, 'rss': 1024, 'read_bytes': None,
+                           'write_bytes': None}])
+
+
+class HostMetricsSamplerTestCase(unittest.TestCase):
+    """Unit tests for the host metrics sampler"""
+
+    @mock.patch('psutil.cpu_percent')
+    def setUp(self, mock_cpu_percent):
+        self._sampler = utils.HostMetricsSampler('fake/path', ttl=10)
+        mock_cpu_percent.assert_called_once_with(interval=None)
+
+    @mock.patch('vix.utils.get_load_average')
+    @mock.patch('vix.utils.get_cpu_count')
+    @mock.patch('psutil.cpu_percent')
+    @mock.patch('vix.utils.get_disk_info')
+    @mock.patch('vix.utils.get_host_memory_info')
+    @mock.patch('time.time')
+    def test_sample(self, mock_time, mock_get_host_memory_info,
+                    mock_get_disk_info, mock_cpu_percent, mock_get_cpu_count,
+                    mock_get_load_average):
+        mock_time.return_value = 100
+        mock_get_host_memory_info.return_value = (2048, 1024)
+        mock_get_disk_info.return_value = (4096, 512)
+        mock_cpu_percent.return_value = 25.0
+        mock_get_cpu_count.return_value = 4
+        mock_get_load_average.return_value = (1.0, 0.5, 0.25)
+
+        response = self._sampler.sample()
+
+        mock_get_disk_info.assert_called_once_with('fake/path')
+        self.assertEqual((response.timestamp, response.total_mem,
+                          response.free_mem, response.total_disk,
+                          response.free_disk, response.cpu_count,
+                          response.cpu_percent, response.load_average),
+                         (100, 2048, 1024, 4096, 512, 4, 25.0,
+                          (1.0, 0.5, 0.25)))
+
+    @mock.patch('vix.utils.get_load_average')
+    @mock.patch('vix.utils.get_cpu_count')
+    @mock.patch('psutil.cpu_percent')
+    @mock.patch('vix.utils.get_disk_info')
+    @mock.patch('vix.utils.get_host_memory_info')
+    @mock.patch('time.time')
+    def test_get_metrics(self, mock_time, mock_get_host_memory_info,
+                         mock_get_disk_info, mock_cpu_percent,
+                         mock_get_cpu_count, mock_get_load_average):
+        mock_get_host_memory_info.return_value = (2048, 1024)
+        mock_get_disk_info.return_value = (4096, 512)
+
+        responses = []
+        for now in [100, 109, 110]:
+            mock_time.return_value = now
+            responses.append(self._sampler.get_metrics())
+
+        self.assertIs(responses[0], responses[1])
+        self.assertEqual(responses[2].timestamp, 110)
+        self.assertEqual(mock_get_host_memory_info.call_count, 2)
+        self.assertEqual(mock_get_disk_info.call_count, 2)
@@ -34,11 +34,43 @@ class VixUtilsTestCase(unittest.TestCase):
     """Unit tests for utility class"""
 
     def test_check_job_err_code(self):
-        fake_err = 1
+        fake_err = 0x10000 | vixlib.VIX_E_CANNOT_AUTHENTICATE_WITH_GUEST
         vixlib.Vix_GetErrorText = mock.MagicMock()
 
-        self.assertRaises(utils.VixException, vixutils._check_job_err_code,
-                          fake_err)
+        with self.assertRaises(utils.VixException) as cm:
+            vixutils._check_job_err_code(fake_err)
+
+        self.assertEqual(vixutils.get_exception_error_code(cm.exception),
+                         vixlib.VIX_E_CANNOT_AUTHENTICATE_WITH_GUEST)
+
+    def test_is_device_supported(self):
+        self.assertTrue(vixutils.is_device_supported(
+            "rhel6-64", vixutils.DISK_CONTROLLER_PVSCSI))
+        self.assertTrue(vixutils.is_device_supported(
+            "winXPPro", vixutils.NIC_MODEL_VMXNET3))
+        self.assertTrue(vixutils.is_device_supported(
+            "other", vixutils.NIC_MODEL_E1000E))
+        self.assertFalse(vixutils.is_device_supported(
+            "winXPPro", vixutils.DISK_CONTROLLER_PVSCSI))
+        self.assertFalse(vixutils.is_device_supported(
+            "other-64", vixutils.NIC_MODEL_VMXNET3))
+
+    def test_check_device_compatibility(self):
+        vixutils.check_device_compatibility(
+            "windows8srv-64", vixutils.DISK_CONTROLLER_PVSCSI,
+            vixutils.NIC_MODEL_VMXNET3)
+
+    def test_check_device_compatibility_unsupported_guest_os(self):
+        self.assertRaises(utils.VixException,
+                          vixutils.check_device_compatibility,
+                          "win2000Pro", vixutils.DISK_CONTROLLER_LSILOGIC,
+                          vixutils.NIC_MODEL_VMXNET3)
+
+    def test_check_device_compatibility_unknown_device(self):
+        self.assertRaises(utils.VixException,
+                          vixutils.check_device_compatibility,
+                          "rhel6-64", "fake_controller",
+                          vixutils.NIC_MODEL_E1000E)
 
     def test_load_config_file_values(self):
         fake_path = 'fake/path'
@@ -182,6 +214,22 @@ class VixUtilsTestCase(unittest.TestCase):
                                           pattern)
         self.assertEqual(response, fake_value[0])
 
+    @mock.patch('vix.vixutils.load_config_file_values')
+    def test_get_vmx_mac_addresses(self, mock_load_config_file_values):
+        mock_load_config_file_values.return_value = {
+            "ethernet0.present": "TRUE",
+            "ethernet0.address": "00:50:56:AA:BB:01",
+            "ethernet1.present": "true",
+            "ethernet1.generatedAddress": "00:0c:29:aa:bb:02",
+            "ethernet2.present": "FALSE",
+            "ethernet2.address": "00:50:56:aa:bb:03"}
+
+        response = vixutils.get_vmx_mac_addresses('fake/path')
+
+        mock_load_config_file_values.assert_called_once_with('fake/path')
+        self.assertEqual(response, ["00:50:56:aa:bb:01",
+                                    "00:0c:29:aa:bb:02"])
+
     @mock.patch('vix.vixutils.get_vmx_value')
     def _test_get_vix_host_type(self, mock_get_vmx_value,
                                 platform,
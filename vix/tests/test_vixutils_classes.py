@@ -28,6 +28,7 @@ if sys.platform == 'win32':
     import _winreg
     import win32api
 
+from vix import utils
 from vix import vixutils
 from vix import vixlib
 
@@ -239,6 +240,318 @@ class VixUtilsTestCase(unittest.TestCase):
         vixlib.Vix_ReleaseHandle.assert_called_with(fake_job_handle)
         mock_check_job_err_code.assert_called_once_with(None)
 
+    def _mock_job_functions(self, function_name):
+        fake_job_handle = mock.MagicMock()
+        setattr(vixlib, function_name,
+                mock.MagicMock(return_value=fake_job_handle))
+        vixlib.VixJob_Wait = mock.MagicMock(return_value=None)
+        vixlib.Vix_ReleaseHandle = mock.MagicMock()
+        return fake_job_handle
+
+    @mock.patch('vix.vixutils._check_job_err_code')
+    def test_login_in_guest(self, mock_check_job_err_code):
+        fake_job_handle = self._mock_job_functions('VixVM_LoginInGuest')
+
+        self._VixVM.login_in_guest('fake_user', 'fake_password')
+
+        vixlib.VixVM_LoginInGuest.assert_called_once_with(
+            self._VixVM._vm_handle, 'fake_user', 'fake_password', 0, None,
+            None)
+        vixlib.VixJob_Wait.assert_called_once_with(fake_job_handle,
+                                                   vixlib.VIX_PROPERTY_NONE)
+        vixlib.Vix_ReleaseHandle.assert_called_once_with(fake_job_handle)
+        mock_check_job_err_code.assert_called_once_with(None)
+
+    @mock.patch('vix.vixutils._check_job_err_code')
+    def test_logout_from_guest(self, mock_check_job_err_code):
+        fake_job_handle = self._mock_job_functions('VixVM_LogoutFromGuest')
+
+        self._VixVM.logout_from_guest()
+
+        vixlib.VixVM_LogoutFromGuest.assert_called_once_with(
+            self._VixVM._vm_handle, None, None)
+        vixlib.Vix_ReleaseHandle.assert_called_once_with(fake_job_handle)
+        mock_check_job_err_code.assert_called_once_with(None)
+
+    @mock.patch('vix.vixutils._check_job_err_code')
+    def test_copy_file_from_host_to_guest(self, mock_check_job_err_code):
+        fake_job_handle = self._mock_job_functions(
+            'VixVM_CopyFileFromHostToGuest')
+
+        self._VixVM.copy_file_from_host_to_guest('fake/host', '/fake/guest')
+
+        vixlib.VixVM_CopyFileFromHostToGuest.assert_called_once_with(
+            self._VixVM._vm_handle, 'fake/host', '/fake/guest', 0,
+            vixlib.VIX_INVALID_HANDLE, None, None)
+        vixlib.Vix_ReleaseHandle.assert_called_once_with(fake_job_handle)
+        mock_check_job_err_code.assert_called_once_with(None)
+
+    @mock.patch('vix.vixutils.VixJob.get_string_result')
+    def test_create_temp_file_in_guest(self, mock_get_string_result):
+        fake_job_handle = self._mock_job_functions(
+            'VixVM_CreateTempFileInGuest')
+
+        response = self._VixVM.create_temp_file_in_guest()
+
+        vixlib.VixVM_CreateTempFileInGuest.assert_called_once_with(
+            self._VixVM._vm_handle, 0, vixlib.VIX_INVALID_HANDLE, None, None)
+        mock_get_string_result.assert_called_once_with(
+            vixlib.VIX_PROPERTY_JOB_RESULT_ITEM_NAME)
+        vixlib.Vix_ReleaseHandle.assert_called_once_with(fake_job_handle)
+        self.assertEqual(response, mock_get_string_result.return_value)
+
+    @mock.patch('vix.vixutils._check_job_err_code')
+    def test_delete_file_in_guest(self, mock_check_job_err_code):
+        fake_job_handle = self._mock_job_functions('VixVM_DeleteFileInGuest')
+
+        self._VixVM.delete_file_in_guest('/fake/guest')
+
+        vixlib.VixVM_DeleteFileInGuest.assert_called_once_with(
+            self._VixVM._vm_handle, '/fake/guest', None, None)
+        vixlib.Vix_ReleaseHandle.assert_called_once_with(fake_job_handle)
+        mock_check_job_err_code.assert_called_once_with(None)
+
+    @mock.patch('vix.vixutils._check_job_err_code')
+    def test_run_program_in_guest(self, mock_check_job_err_code):
+        fake_job_handle = self._mock_job_functions('VixVM_RunProgramInGuest')
+        fake_exit_code = mock.MagicMock()
+        ctypes.c_int = mock.MagicMock(return_value=fake_exit_code)
+        ctypes.byref = mock.MagicMock()
+
+        response = self._VixVM.run_program_in_guest('/bin/sh', '-c true')
+
+        vixlib.VixVM_RunProgramInGuest.assert_called_once_with(
+            self._VixVM._vm_handle, '/bin/sh', '-c true', 0,
+            vixlib.VIX_INVALID_HANDLE, None, None)
+        vixlib.VixJob_Wait.assert_called_once_with(
+            fake_job_handle,
+            vixlib.VIX_PROPERTY_JOB_RESULT_GUEST_PROGRAM_EXIT_CODE,
+            ctypes.byref.return_value, vixlib.VIX_PROPERTY_NONE)
+        vixlib.Vix_ReleaseHandle.assert_called_once_with(fake_job_handle)
+        mock_check_job_err_code.assert_called_once_with(None)
+        self.assertEqual(response, fake_exit_code.value)
+
+    def test_run_program_in_guest_async(self):
+        vixlib.VixVM_RunProgramInGuest = mock.MagicMock()
+
+        response = self._VixVM.run_program_in_guest_async('/bin/sh',
+                                                          '-c true')
+
+        vixlib.VixVM_RunProgramInGuest.assert_called_once_with(
+            self._VixVM._vm_handle, '/bin/sh', '-c true', 0,
+            vixlib.VIX_INVALID_HANDLE, None, None)
+        self.assertEqual(response._job_handle,
+                         vixlib.VixVM_RunProgramInGuest.return_value)
+
+    def test_run_script_in_guest_async(self):
+        vixlib.VixVM_RunScriptInGuest = mock.MagicMock()
+
+        response = self._VixVM.run_script_in_guest_async('/bin/sh', 'true')
+
+        vixlib.VixVM_RunScriptInGuest.assert_called_once_with(
+            self._VixVM._vm_handle, '/bin/sh', 'true', 0,
+            vixlib.VIX_INVALID_HANDLE, None, None)
+        self.assertEqual(response._job_handle,
+                         vixlib.VixVM_RunScriptInGuest.return_value)
+
+    @mock.patch('vix.vixutils._check_job_err_code')
+    def test_list_processes_in_guest(self, mock_check_job_err_code):
+        fake_job_handle = self._mock_job_functions(
+            'VixVM_ListProcessesInGuest')
+        vixlib.VixJob_GetNumProperties = mock.MagicMock(return_value=1)
+        vixlib.VixJob_GetNthProperties = mock.MagicMock(return_value=None)
+        vixlib.Vix_FreeBuffer = mock.MagicMock()
+        ctypes.byref = mock.MagicMock()
+
+        response = self._VixVM.list_processes_in_guest()
+
+        vixlib.VixVM_ListProcessesInGuest.assert_called_once_with(
+            self._VixVM._vm_handle, 0, None, None)
+        vixlib.VixJob_GetNumProperties.assert_called_once_with(
+            fake_job_handle, vixlib.VIX_PROPERTY_JOB_RESULT_ITEM_NAME)
+        self.assertEqual(vixlib.VixJob_GetNthProperties.call_count, 1)
+        self.assertEqual(vixlib.Vix_FreeBuffer.call_count, 3)
+        vixlib.Vix_ReleaseHandle.assert_called_once_with(fake_job_handle)
+        self.assertEqual(len(response), 1)
+        self.assertEqual(sorted(response[0].keys()),
+                         ['command', 'name', 'owner', 'pid'])
+
+    @mock.patch('vix.vixutils.VixJob.get_nth_results')
+    @mock.patch('vix.vixutils.VixJob.wait')
+    def test_get_file_info_in_guest(self, mock_wait, mock_get_nth_results):
+        fake_job_handle = self._mock_job_functions(
+            'VixVM_GetFileInfoInGuest')
+        mock_get_nth_results.return_value = [10, 0, 100]
+
+        response = self._VixVM.get_file_info_in_guest('/fake/guest')
+
+        vixlib.VixVM_GetFileInfoInGuest.assert_called_once_with(
+            self._VixVM._vm_handle, '/fake/guest', None, None)
+        mock_wait.assert_called_once_with()
+        self.assertEqual(mock_get_nth_results.call_args[0][0], 0)
+        vixlib.Vix_ReleaseHandle.assert_called_once_with(fake_job_handle)
+        self.assertEqual(response, {'size': 10, 'flags': 0,
+                                    'mod_time': 100})
+
+    @mock.patch('vix.vixutils.VixJob.get_nth_results')
+    @mock.patch('vix.vixutils.VixJob.get_num_results')
+    @mock.patch('vix.vixutils.VixJob.wait')
+    def test_list_directory_in_guest(self, mock_wait, mock_get_num_results,
+                                     mock_get_nth_results):
+        fake_job_handle = self._mock_job_functions(
+            'VixVM_ListDirectoryInGuest')
+        mock_get_num_results.return_value = 2
+        mock_get_nth_results.side_effect = [['a', 10, 0, 100],
+                                            ['b', 0, 1, 200]]
+
+        response = self._VixVM.list_directory_in_guest('/fake/guest')
+
+        vixlib.VixVM_ListDirectoryInGuest.assert_called_once_with(
+            self._VixVM._vm_handle, '/fake/guest', 0, None, None)
+        mock_get_num_results.assert_called_once_with(
+            vixlib.VIX_PROPERTY_JOB_RESULT_ITEM_NAME)
+        vixlib.Vix_ReleaseHandle.assert_called_once_with(fake_job_handle)
+        self.assertEqual(response, [
+            {'name': 'a', 'size': 10, 'flags': 0, 'mod_time': 100},
+            {'name': 'b', 'size': 0, 'flags': 1, 'mod_time': 200}])
+
+    @mock.patch('vix.vixutils._check_job_err_code')
+    def test_create_directory_in_guest(self, mock_check_job_err_code):
+        fake_job_handle = self._mock_job_functions(
+            'VixVM_CreateDirectoryInGuest')
+
+        self._VixVM.create_directory_in_guest('/fake/guest')
+
+        vixlib.VixVM_CreateDirectoryInGuest.assert_called_once_with(
+            self._VixVM._vm_handle, '/fake/guest', vixlib.VIX_INVALID_HANDLE,
+            None, None)
+        vixlib.Vix_ReleaseHandle.assert_called_once_with(fake_job_handle)
+        mock_check_job_err_code.assert_called_once_with(None)
+
+    def test_copy_file_from_host_to_guest_async(self):
+        vixlib.VixVM_CopyFileFromHostToGuest = mock.MagicMock()
+
+        response = self._VixVM.copy_file_from_host_to_guest_async(
+            'fake/host', '/fake/guest')
+
+        vixlib.VixVM_CopyFileFromHostToGuest.assert_called_once_with(
+            self._VixVM._vm_handle, 'fake/host', '/fake/guest', 0,
+            vixlib.VIX_INVALID_HANDLE, None, None)
+        self.assertEqual(response._job_handle,
+                         vixlib.VixVM_CopyFileFromHostToGuest.return_value)
+
+    @mock.patch('vix.vixutils._check_job_err_code')
+    def test_copy_file_from_guest_to_host(self, mock_check_job_err_code):
+        fake_job_handle = self._mock_job_functions(
+            'VixVM_CopyFileFromGuestToHost')
+
+        self._VixVM.copy_file_from_guest_to_host('/fake/guest', 'fake/host')
+
+        vixlib.VixVM_CopyFileFromGuestToHost.assert_called_once_with(
+            self._VixVM._vm_handle, '/fake/guest', 'fake/host', 0,
+            vixlib.VIX_INVALID_HANDLE, None, None)
+        vixlib.Vix_ReleaseHandle.assert_called_once_with(fake_job_handle)
+        mock_check_job_err_code.assert_called_once_with(None)
+
+    @mock.patch('vix.vixutils._check_job_err_code')
+    def test_enable_shared_folders(self, mock_check_job_err_code):
+        fake_job_handle = self._mock_job_functions(
+            'VixVM_EnableSharedFolders')
+
+        self._VixVM.enable_shared_folders()
+
+        vixlib.VixVM_EnableSharedFolders.assert_called_once_with(
+            self._VixVM._vm_handle, True, 0, None, None)
+        vixlib.Vix_ReleaseHandle.assert_called_once_with(fake_job_handle)
+        mock_check_job_err_code.assert_called_once_with(None)
+
+    @mock.patch('vix.vixutils._check_job_err_code')
+    def _test_add_shared_folder(self, mock_check_job_err_code, writable):
+        fake_job_handle = self._mock_job_functions('VixVM_AddSharedFolder')
+
+        self._VixVM.add_shared_folder('fake_name', 'fake/host', writable)
+
+        if writable:
+            expected_flags = vixlib.VIX_SHAREDFOLDER_WRITE_ACCESS
+        else:
+            expected_flags = 0
+        vixlib.VixVM_AddSharedFolder.assert_called_once_with(
+            self._VixVM._vm_handle, 'fake_name', 'fake/host', expected_flags,
+            None, None)
+        vixlib.Vix_ReleaseHandle.assert_called_once_with(fake_job_handle)
+        mock_check_job_err_code.assert_called_once_with(None)
+
+    def test_add_shared_folder(self):
+        self._test_add_shared_folder(writable=False)
+
+    def test_add_shared_folder_writable(self):
+        self._test_add_shared_folder(writable=True)
+
+    @mock.patch('vix.vixutils._check_job_err_code')
+    def test_set_shared_folder_state(self, mock_check_job_err_code):
+        fake_job_handle = self._mock_job_functions(
+            'VixVM_SetSharedFolderState')
+
+        self._VixVM.set_shared_folder_state('fake_name', 'fake/host')
+
+        vixlib.VixVM_SetSharedFolderState.assert_called_once_with(
+            self._VixVM._vm_handle, 'fake_name', 'fake/host', 0, None, None)
+        vixlib.Vix_ReleaseHandle.assert_called_once_with(fake_job_handle)
+        mock_check_job_err_code.assert_called_once_with(None)
+
+    @mock.patch('vix.vixutils._check_job_err_code')
+    def test_remove_shared_folder(self, mock_check_job_err_code):
+        fake_job_handle = self._mock_job_functions(
+            'VixVM_RemoveSharedFolder')
+
+        self._VixVM.remove_shared_folder('fake_name')
+
+        vixlib.VixVM_RemoveSharedFolder.assert_called_once_with(
+            self._VixVM._vm_handle, 'fake_name', 0, None, None)
+        vixlib.Vix_ReleaseHandle.assert_called_once_with(fake_job_handle)
+        mock_check_job_err_code.assert_called_once_with(None)
+
+    @mock.patch('ctypes.string_at')
+    @mock.patch('ctypes.byref')
+    @mock.patch('ctypes.c_void_p')
+    @mock.patch('ctypes.c_int')
+    @mock.patch('vix.vixutils._check_job_err_code')
+    def _test_capture_screen(self, mock_check_job_err_code, mock_c_int,
+                             mock_c_void_p, mock_byref, mock_string_at,
+                             err=None):
+        fake_job_handle = self._mock_job_functions('VixVM_CaptureScreenImage')
+        vixlib.VixJob_Wait.return_value = err
+        vixlib.Vix_FreeBuffer = mock.MagicMock()
+        if err:
+            mock_check_job_err_code.side_effect = utils.VixException("fake")
+
+        try:
+            response = self._VixVM.capture_screen()
+            self.assertEqual(response, mock_string_at.return_value)
+        finally:
+            vixlib.VixVM_CaptureScreenImage.assert_called_once_with(
+                self._VixVM._vm_handle, vixlib.VIX_CAPTURESCREENFORMAT_PNG,
+                vixlib.VIX_INVALID_HANDLE, None, None)
+            vixlib.VixJob_Wait.assert_called_once_with(
+                fake_job_handle,
+                vixlib.VIX_PROPERTY_JOB_RESULT_SCREEN_IMAGE_DATA,
+                mock_byref.return_value, mock_byref.return_value,
+                vixlib.VIX_PROPERTY_NONE)
+            vixlib.Vix_ReleaseHandle.assert_called_once_with(fake_job_handle)
+            vixlib.Vix_FreeBuffer.assert_called_once_with(
+                mock_c_void_p.return_value)
+            if not err:
+                mock_string_at.assert_called_once_with(
+                    mock_c_void_p.return_value,
+                    mock_c_int.return_value.value)
+
+    def test_capture_screen(self):
+        self._test_capture_screen()
+
+    def test_capture_screen_failed(self):
+        self.assertRaises(utils.VixException, self._test_capture_screen,
+                          err=1)
+
     @mock.patch('vix.vixutils._check_job_err_code')
     def _test_get_guest_ip_address(self, mock_check_job_err_code):
         #1)ALWAYS time.sleep(3)
@@ -313,8 +626,10 @@ class VixUtilsTestCase(unittest.TestCase):
     def test_delete_disk_files_False(self):
         self._test_delete(delete_disk_files=False)
 
+    @mock.patch('vix.vixutils.VixVM._invalidate_snapshot_tree')
     @mock.patch('vix.vixutils._check_job_err_code')
-    def _test_create_snapshot(self, mock_check_job_err_code, include_memory):
+    def _test_create_snapshot(self, mock_check_job_err_code,
+                              mock_invalidate_snapshot_tree, include_memory):
         fake_job_handle = mock.MagicMock()
         fake_name = 'fake name'
         fake_description = 'fake description'
@@ -349,6 +664,7 @@ class VixUtilsTestCase(unittest.TestCase):
             ctypes_byref_mock, vixlib.VIX_PROPERTY_NONE)
         vixlib.Vix_ReleaseHandle.assert_called_with(fake_job_handle)
         mock_check_job_err_code.assert_called_with(None)
+        mock_invalidate_snapshot_tree.assert_called_once_with()
 
     def test_create_snapshot_include_memory_true(self):
         self._test_create_snapshot(include_memory=True)
@@ -356,8 +672,10 @@ class VixUtilsTestCase(unittest.TestCase):
     def test_create_snapshot_include_memory_false(self):
         self._test_create_snapshot(include_memory=True)
 
+    @mock.patch('vix.vixutils.VixVM._invalidate_snapshot_tree')
     @mock.patch('vix.vixutils._check_job_err_code')
-    def test_remove_snapshot(self, mock_check_job_err_code):
+    def test_remove_snapshot(self, mock_check_job_err_code,
+                             mock_invalidate_snapshot_tree):
         fake_snapshot = mock.MagicMock()
         fake_job_handle = mock.MagicMock()
 
@@ -365,6 +683,7 @@ class VixUtilsTestCase(unittest.TestCase):
         vixlib.VixVM_RemoveSnapshot.return_value = fake_job_handle
         vixlib.VixJob_Wait = mock.MagicMock()
         vixlib.VixJob_Wait.return_value = None
+        vixlib.Vix_ReleaseHandle = mock.MagicMock()
 
         self._VixVM.remove_snapshot(fake_snapshot)
 
@@ -374,8 +693,134 @@ class VixUtilsTestCase(unittest.TestCase):
         vixlib.VixJob_Wait.assert_called_with(fake_job_handle,
                                               vixlib.VIX_PROPERTY_NONE)
         mock_check_job_err_code.assert_called_once_with(None)
+        vixlib.Vix_ReleaseHandle.assert_called_once_with(fake_job_handle)
+        mock_invalidate_snapshot_tree.assert_called_once_with()
         fake_snapshot.close.assert_called_once()
 
+    @mock.patch('vix.vixutils.VixVM._invalidate_snapshot_tree')
+    @mock.patch('vix.vixutils._check_job_err_code')
+    def _test_revert_to_snapshot(self, mock_check_job_err_code,
+                                 mock_invalidate_snapshot_tree, show_gui,
+                                 suppress_power_on):
+        fake_snapshot = mock.MagicMock()
+        fake_job_handle = mock.MagicMock()
+
+        vixlib.VixVM_RevertToSnapshot = mock.MagicMock(
+            return_value=fake_job_handle)
+        vixlib.VixJob_Wait = mock.MagicMock(return_value=None)
+        vixlib.Vix_ReleaseHandle = mock.MagicMock()
+
+        self._VixVM.revert_to_snapshot(fake_snapshot, show_gui,
+                                       suppress_power_on)
+
+        if show_gui:
+            options = vixlib.VIX_VMPOWEROP_LAUNCH_GUI
+        else:
+            options = vixlib.VIX_VMPOWEROP_NORMAL
+        if suppress_power_on:
+            options |= vixlib.VIX_VMPOWEROP_SUPPRESS_SNAPSHOT_POWERON
+        vixlib.VixVM_RevertToSnapshot.assert_called_with(
+            self._VixVM._vm_handle, fake_snapshot._snapshot_handle, options,
+            vixlib.VIX_INVALID_HANDLE, None, None)
+        vixlib.VixJob_Wait.assert_called_with(fake_job_handle,
+                                              vixlib.VIX_PROPERTY_NONE)
+        vixlib.Vix_ReleaseHandle.assert_called_once_with(fake_job_handle)
+        mock_invalidate_snapshot_tree.assert_called_once_with()
+        mock_check_job_err_code.assert_called_once_with(None)
+
+    def test_revert_to_snapshot(self):
+        self._test_revert_to_snapshot(show_gui=False, suppress_power_on=False)
+
+    def test_revert_to_snapshot_show_gui_suppress_power_on(self):
+        self._test_revert_to_snapshot(show_gui=True, suppress_power_on=True)
+
+    @mock.patch('vix.vixutils.VixVM._load_snapshot_tree')
+    @mock.patch('vix.vixutils.VixVM._get_vmsd_mtime')
+    @mock.patch('vix.vixutils.VixVM.get_vmx_path')
+    def _test_snapshot_tree(self, mock_get_vmx_path, mock_get_vmsd_mtime,
+                            mock_load_snapshot_tree, cached_mtime):
+        fake_vmx_path = 'fake/path.vmx'
+        fake_cached_tree = mock.MagicMock()
+        mock_get_vmx_path.return_value = fake_vmx_path
+        mock_get_vmsd_mtime.return_value = 1
+        vixutils._snapshot_trees[fake_vmx_path] = (cached_mtime,
+                                                   fake_cached_tree)
+        self.addCleanup(vixutils._snapshot_trees.clear)
+
+        response = self._VixVM.snapshot_tree()
+
+        if cached_mtime == 1:
+            self.assertEqual(response, fake_cached_tree)
+            self.assertFalse(mock_load_snapshot_tree.called)
+        else:
+            self.assertEqual(response, mock_load_snapshot_tree.return_value)
+            self.assertEqual(vixutils._snapshot_trees[fake_vmx_path],
+                             (1, mock_load_snapshot_tree.return_value))
+
+    def test_snapshot_tree_cached(self):
+        self._test_snapshot_tree(cached_mtime=1)
+
+    def test_snapshot_tree_changed(self):
+        self._test_snapshot_tree(cached_mtime=0)
+
+    @mock.patch('vix.vixutils.VixVM.get_vmx_path')
+    def test_invalidate_snapshot_tree(self, mock_get_vmx_path):
+        mock_get_vmx_path.return_value = 'fake/path.vmx'
+        vixutils._snapshot_trees['fake/path.vmx'] = (1, mock.MagicMock())
+
+        self._VixVM._invalidate_snapshot_tree()
+
+        self.assertNotIn('fake/path.vmx', vixutils._snapshot_trees)
+
+    @mock.patch('vix.vixutils.VixSnapshot.get_tree_node')
+    @mock.patch('vix.vixutils._check_job_err_code')
+    def test_load_snapshot_tree(self, mock_check_job_err_code,
+                                mock_get_tree_node):
+        fake_num_root_snapshots = mock.MagicMock()
+        fake_num_root_snapshots.value = 2
+        ctypes.c_int = mock.MagicMock(return_value=fake_num_root_snapshots)
+        ctypes.byref = mock.MagicMock()
+        vixlib.VixHandle = mock.MagicMock()
+        vixlib.VixVM_GetNumRootSnapshots = mock.MagicMock(return_value=None)
+        vixlib.VixVM_GetRootSnapshot = mock.MagicMock(return_value=None)
+        vixlib.Vix_ReleaseHandle = mock.MagicMock()
+
+        response = self._VixVM._load_snapshot_tree()
+
+        self.assertEqual(vixlib.VixVM_GetRootSnapshot.call_count, 2)
+        self.assertEqual(response.roots,
+                         [mock_get_tree_node.return_value] * 2)
+        self.assertEqual(vixlib.Vix_ReleaseHandle.call_count, 2)
+
+    @mock.patch('vix.vixutils._check_job_err_code')
+    @mock.patch('vix.vixutils.VixVM.snapshot_tree')
+    def _test_get_named_snapshot(self, mock_snapshot_tree,
+                                 mock_check_job_err_code, found):
+        fake_name = 'fake name'
+        fake_snapshot_handle = mock.MagicMock()
+        mock_snapshot_tree.return_value.find.return_value = found
+        vixlib.VixHandle = mock.MagicMock(return_value=fake_snapshot_handle)
+        vixlib.VixVM_GetNamedSnapshot = mock.MagicMock(return_value=None)
+        ctypes.byref = mock.MagicMock()
+
+        response = self._VixVM.get_named_snapshot(fake_name)
+
+        mock_snapshot_tree.return_value.find.assert_called_once_with(
+            fake_name)
+        if found:
+            vixlib.VixVM_GetNamedSnapshot.assert_called_once_with(
+                self._VixVM._vm_handle, fake_name, ctypes.byref.return_value)
+            self.assertEqual(response._snapshot_handle, fake_snapshot_handle)
+        else:
+            self.assertFalse(vixlib.VixVM_GetNamedSnapshot.called)
+            self.assertIsNone(response)
+
+    def test_get_named_snapshot(self):
+        self._test_get_named_snapshot(found=True)
+
+    def test_get_named_snapshot_not_found(self):
+        self._test_get_named_snapshot(found=False)
+
     @mock.patch('vix.vixutils._check_job_err_code')
     def test_get_vmx_path(self, mock_check_job_err_code):
         fake_vmx_path = mock.MagicMock()
@@ -411,6 +856,263 @@ class VixUtilsTestCase(unittest.TestCase):
         mock_get_vmx_path.assert_called_once()
         self.assertEqual(response, (True, 9999))
 
+    def test_read_variable_async(self):
+        vixlib.VixVM_ReadVariable = mock.MagicMock()
+
+        response = self._VixVM.read_variable_async("ip")
+
+        vixlib.VixVM_ReadVariable.assert_called_once_with(
+            self._VixVM._vm_handle, vixlib.VIX_VM_GUEST_VARIABLE, "ip", 0,
+            None, None)
+        self.assertEqual(response._job_handle,
+                         vixlib.VixVM_ReadVariable.return_value)
+
+    def test_write_variable_async(self):
+        vixlib.VixVM_WriteVariable = mock.MagicMock()
+
+        response = self._VixVM.write_variable_async("metadata", "fake")
+
+        vixlib.VixVM_WriteVariable.assert_called_once_with(
+            self._VixVM._vm_handle, vixlib.VIX_VM_GUEST_VARIABLE, "metadata",
+            "fake", 0, None, None)
+        self.assertEqual(response._job_handle,
+                         vixlib.VixVM_WriteVariable.return_value)
+
+    @mock.patch('vix.vixutils.VixVM.write_variable_async')
+    def test_write_variables(self, mock_write_variable_async):
+        fake_jobs = [mock.MagicMock(), mock.MagicMock()]
+        mock_write_variable_async.side_effect = fake_jobs
+        fake_jobs[1].wait.side_effect = utils.VixException("fake")
+
+        self.assertRaises(utils.VixException, self._VixVM.write_variables,
+                          {"a": "1", "b": "2"})
+
+        self.assertEqual(mock_write_variable_async.call_count, 2)
+        for fake_job in fake_jobs:
+            fake_job.wait.assert_called_once_with()
+            fake_job.close.assert_called_once_with()
+
+    ########### TESTING VixJob CLASS ###########
+    def test_close_VixJob(self):
+        vixlib.Vix_ReleaseHandle = mock.MagicMock()
+        job = vixutils.VixJob(self.ctypes_handle)
+
+        job.close()
+
+        vixlib.Vix_ReleaseHandle.assert_called_once_with(self.ctypes_handle)
+        self.assertIsNone(job._job_handle)
+
+    @mock.patch('vix.vixutils._check_job_err_code')
+    def test_job_wait(self, mock_check_job_err_code):
+        vixlib.VixJob_Wait = mock.MagicMock(return_value=None)
+        job = vixutils.VixJob(self.ctypes_handle)
+
+        job.wait()
+
+        vixlib.VixJob_Wait.assert_called_once_with(self.ctypes_handle,
+                                                   vixlib.VIX_PROPERTY_NONE)
+        mock_check_job_err_code.assert_called_once_with(None)
+
+    @mock.patch('vix.vixutils._check_job_err_code')
+    def test_job_is_completed(self, mock_check_job_err_code):
+        fake_completed = mock.MagicMock()
+        fake_completed.value = 1
+        ctypes.c_byte = mock.MagicMock(return_value=fake_completed)
+        ctypes.byref = mock.MagicMock()
+        vixlib.VixJob_CheckCompletion = mock.MagicMock(return_value=None)
+        job = vixutils.VixJob(self.ctypes_handle)
+
+        response = job.is_completed()
+
+        vixlib.VixJob_CheckCompletion.assert_called_once_with(
+            self.ctypes_handle, ctypes.byref.return_value)
+        mock_check_job_err_code.assert_called_once_with(None)
+        self.assertTrue(response)
+
+    @mock.patch('vix.vixutils._check_job_err_code')
+    def test_job_get_int_result(self, mock_check_job_err_code):
+        fake_value = mock.MagicMock()
+        ctypes.c_int = mock.MagicMock(return_value=fake_value)
+        ctypes.byref = mock.MagicMock()
+        vixlib.VixJob_Wait = mock.MagicMock(return_value=None)
+        job = vixutils.VixJob(self.ctypes_handle)
+
+        response = job.get_int_result(
+            vixlib.VIX_PROPERTY_JOB_RESULT_GUEST_PROGRAM_EXIT_CODE)
+
+        vixlib.VixJob_Wait.assert_called_once_with(
+            self.ctypes_handle,
+            vixlib.VIX_PROPERTY_JOB_RESULT_GUEST_PROGRAM_EXIT_CODE,
+            ctypes.byref.return_value, vixlib.VIX_PROPERTY_NONE)
+        mock_check_job_err_code.assert_called_once_with(None)
+        self.assertEqual(response, fake_value.value)
+
+    @mock.patch('vix.vixutils._check_job_err_code')
+    def test_job_get_nth_results(self, mock_check_job_err_code):
+        fake_string = mock.MagicMock()
+        fake_int = mock.MagicMock()
+        ctypes.c_char_p = mock.MagicMock(return_value=fake_string)
+        ctypes.c_int = mock.MagicMock(return_value=fake_int)
+        ctypes.byref = mock.MagicMock(side_effect=lambda value: value)
+        vixlib.VixJob_GetNthProperties = mock.MagicMock(return_value=None)
+        vixlib.Vix_FreeBuffer = mock.MagicMock()
+        job = vixutils.VixJob(self.ctypes_handle)
+
+        response = job.get_nth_results(1, [
+            (vixlib.VIX_PROPERTY_JOB_RESULT_ITEM_NAME, ctypes.c_char_p),
+            (vixlib.VIX_PROPERTY_JOB_RESULT_FILE_FLAGS, ctypes.c_int)])
+
+        vixlib.VixJob_GetNthProperties.assert_called_once_with(
+            self.ctypes_handle, 1,
+            vixlib.VIX_PROPERTY_JOB_RESULT_ITEM_NAME, fake_string,
+            vixlib.VIX_PROPERTY_JOB_RESULT_FILE_FLAGS, fake_int,
+            vixlib.VIX_PROPERTY_NONE)
+        mock_check_job_err_code.assert_called_once_with(None)
+        vixlib.Vix_FreeBuffer.assert_called_once_with(fake_string)
+        self.assertEqual(response, [fake_string.value, fake_int.value])
+
+    def test_job_get_num_results(self):
+        vixlib.VixJob_GetNumProperties = mock.MagicMock(return_value=2)
+        job = vixutils.VixJob(self.ctypes_handle)
+
+        response = job.get_num_results(
+            vixlib.VIX_PROPERTY_JOB_RESULT_ITEM_NAME)
+
+        vixlib.VixJob_GetNumProperties.assert_called_once_with(
+            self.ctypes_handle, vixlib.VIX_PROPERTY_JOB_RESULT_ITEM_NAME)
+        self.assertEqual(response, 2)
+
+    @mock.patch('vix.vixutils._check_job_err_code')
+    def test_job_get_string_result(self, mock_check_job_err_code):
+        fake_value = mock.MagicMock()
+        ctypes.c_char_p = mock.MagicMock(return_value=fake_value)
+        ctypes.byref = mock.MagicMock()
+        vixlib.VixJob_Wait = mock.MagicMock(return_value=None)
+        vixlib.Vix_FreeBuffer = mock.MagicMock()
+        job = vixutils.VixJob(self.ctypes_handle)
+
+        response = job.get_string_result(
+            vixlib.VIX_PROPERTY_JOB_RESULT_VM_VARIABLE_STRING)
+
+        vixlib.VixJob_Wait.assert_called_once_with(
+            self.ctypes_handle,
+            vixlib.VIX_PROPERTY_JOB_RESULT_VM_VARIABLE_STRING,
+            ctypes.byref.return_value, vixlib.VIX_PROPERTY_NONE)
+        mock_check_job_err_code.assert_called_once_with(None)
+        vixlib.Vix_FreeBuffer.assert_called_once_with(fake_value)
+        self.assertEqual(response, fake_value.value)
+
+    ########### TESTING GuestSessionPool CLASS ###########
+    def _get_session_pool(self):
+        self._conn = mock.MagicMock()
+        self._fake_vm = self._conn.open_vm.return_value
+        return vixutils.GuestSessionPool(self._conn, 'fake_user',
+                                         'fake_password', idle_timeout=60)
+
+    @mock.patch('time.time')
+    def test_session_pool_get_session(self, mock_time):
+        mock_time.return_value = 0
+        session_pool = self._get_session_pool()
+
+        session_pool.get_session('fake/vmx/path')
+        response = session_pool.get_session('fake/vmx/path')
+
+        self._conn.open_vm.assert_called_once_with('fake/vmx/path')
+        self._fake_vm.login_in_guest.assert_called_once_with(
+            'fake_user', 'fake_password')
+        self.assertEqual(response, self._fake_vm)
+
+    @mock.patch('time.time')
+    def test_session_pool_get_session_idle(self, mock_time):
+        mock_time.return_value = 0
+        session_pool = self._get_session_pool()
+        session_pool.get_session('fake/vmx/path')
+
+        mock_time.return_value = 61
+        session_pool.get_session('fake/vmx/path')
+
+        self._fake_vm.logout_from_guest.assert_called_once_with()
+        self._fake_vm.close.assert_called_once_with()
+        self.assertEqual(self._fake_vm.login_in_guest.call_count, 2)
+
+    def test_session_pool_get_session_credentials(self):
+        session_pool = self._get_session_pool()
+        session_pool.get_session('fake/vmx/path')
+
+        session_pool.get_session('fake/vmx/path', 'other_user',
+                                 'other_password')
+
+        self._fake_vm.logout_from_guest.assert_called_once_with()
+        self._fake_vm.login_in_guest.assert_called_with('other_user',
+                                                        'other_password')
+
+    def test_session_pool_get_session_login_failed(self):
+        session_pool = self._get_session_pool()
+        self._fake_vm.login_in_guest.side_effect = utils.VixException(
+            "fake")
+
+        self.assertRaises(utils.VixException, session_pool.get_session,
+                          'fake/vmx/path')
+
+        self._fake_vm.close.assert_called_once_with()
+        self.assertEqual(session_pool._sessions, {})
+
+    def _test_session_pool_execute(self, error_code, tools_running=True):
+        session_pool = self._get_session_pool()
+        operation = mock.MagicMock()
+        operation.side_effect = [
+            utils.VixException("fake", error_code=error_code),
+            mock.sentinel.result]
+        self._fake_vm.get_power_state.return_value = (
+            vixlib.VIX_POWERSTATE_POWERED_ON)
+        if tools_running:
+            self._fake_vm.get_power_state.return_value |= (
+                vixlib.VIX_POWERSTATE_TOOLS_RUNNING)
+
+        if error_code == vixlib.VIX_E_FAIL:
+            self.assertRaises(utils.VixException, session_pool.execute,
+                              'fake/vmx/path', operation)
+            self.assertEqual(operation.call_count, 1)
+        elif tools_running:
+            response = session_pool.execute('fake/vmx/path', operation)
+
+            self.assertEqual(response, mock.sentinel.result)
+            self.assertEqual(self._fake_vm.login_in_guest.call_count, 2)
+            self.assertFalse(self._fake_vm.wait_for_tools_in_guest.called)
+            self.assertFalse(self._fake_vm.logout_from_guest.called)
+        else:
+            with self.assertRaises(utils.VixException) as cm:
+                session_pool.execute('fake/vmx/path', operation)
+
+            self.assertEqual(vixutils.get_exception_error_code(cm.exception),
+                             vixlib.VIX_E_TOOLS_NOT_RUNNING)
+            self.assertEqual(operation.call_count, 1)
+            self.assertEqual(self._fake_vm.login_in_guest.call_count, 1)
+            self.assertFalse(self._fake_vm.wait_for_tools_in_guest.called)
+            self.assertEqual(session_pool._sessions, {})
+
+    def test_session_pool_execute_relogin(self):
+        self._test_session_pool_execute(
+            vixlib.VIX_E_CANNOT_AUTHENTICATE_WITH_GUEST)
+
+    def test_session_pool_execute_tools_not_running(self):
+        self._test_session_pool_execute(vixlib.VIX_E_TOOLS_NOT_RUNNING,
+                                        tools_running=False)
+
+    def test_session_pool_execute_error(self):
+        self._test_session_pool_execute(vixlib.VIX_E_FAIL)
+
+    def test_session_pool_close(self):
+        session_pool = self._get_session_pool()
+        session_pool.get_session('fake/vmx/path')
+        self._fake_vm.logout_from_guest.side_effect = utils.VixException(
+            "fake")
+
+        session_pool.close()
+
+        self._fake_vm.close.assert_called_once_with()
+        self.assertEqual(session_pool._sessions, {})
+
     ########### TESTING VixSnapshot CLASS ###########
     def test_close_VixSnapshot(self):
         vixlib.Vix_ReleaseHandle = mock.MagicMock()
@@ -418,6 +1120,68 @@ class VixUtilsTestCase(unittest.TestCase):
         vixlib.Vix_ReleaseHandle.assert_called_once()
         self.assertTrue(self._VixSnapshot._snapshot_handle is None)
 
+    @mock.patch('vix.vixutils.VixSnapshot.get_child')
+    @mock.patch('vix.vixutils.VixSnapshot.get_num_children')
+    @mock.patch('vix.vixutils.VixSnapshot.get_description')
+    @mock.patch('vix.vixutils.VixSnapshot.get_display_name')
+    def test_get_tree_node(self, mock_get_display_name, mock_get_description,
+                           mock_get_num_children, mock_get_child):
+        fake_child = mock_get_child.return_value.__enter__.return_value
+        mock_get_num_children.return_value = 1
+
+        response = self._VixSnapshot.get_tree_node()
+
+        self.assertEqual(response.name, mock_get_display_name.return_value)
+        self.assertEqual(response.description,
+                         mock_get_description.return_value)
+        self.assertIsNone(response.parent)
+        mock_get_child.assert_called_once_with(0)
+        fake_child.get_tree_node.assert_called_once_with(response)
+        self.assertEqual(response.children,
+                         [fake_child.get_tree_node.return_value])
+
+    @mock.patch('vix.vixutils._check_job_err_code')
+    def _test_get_parent(self, mock_check_job_err_code, is_root):
+        fake_parent_handle = mock.MagicMock()
+        if is_root:
+            fake_parent_handle.value = vixlib.VIX_INVALID_HANDLE
+        vixlib.VixHandle = mock.MagicMock(return_value=fake_parent_handle)
+        vixlib.VixSnapshot_GetParent = mock.MagicMock(return_value=None)
+        ctypes.byref = mock.MagicMock()
+
+        response = self._VixSnapshot.get_parent()
+
+        vixlib.VixSnapshot_GetParent.assert_called_once_with(
+            self._VixSnapshot._snapshot_handle, ctypes.byref.return_value)
+        if is_root:
+            self.assertIsNone(response)
+        else:
+            self.assertEqual(response._snapshot_handle, fake_parent_handle)
+
+    def test_get_parent(self):
+        self._test_get_parent(is_root=False)
+
+    def test_get_parent_root(self):
+        self._test_get_parent(is_root=True)
+
+    ########### TESTING SnapshotTree CLASS ###########
+    def test_snapshot_tree(self):
+        root = vixutils.SnapshotTreeNode('root', None)
+        child1 = vixutils.SnapshotTreeNode('child1', None, root)
+        child2 = vixutils.SnapshotTreeNode('child2', None, root)
+        grandchild = vixutils.SnapshotTreeNode('grandchild', None, child1)
+        root.children = [child1, child2]
+        child1.children = [grandchild]
+        snapshot_tree = vixutils.SnapshotTree([root])
+
+        self.assertEqual(list(snapshot_tree),
+                         [root, child1, grandchild, child2])
+        self.assertEqual(snapshot_tree.find('grandchild'), grandchild)
+        self.assertIsNone(snapshot_tree.find('missing'))
+        self.assertEqual(grandchild.get_chain(), [root, child1, grandchild])
+        self.assertEqual(snapshot_tree.get_max_depth(), 3)
+        self.assertEqual(vixutils.SnapshotTree([]).get_max_depth(), 0)
+
     ########### TESTING VixConnection CLASS ###########
     @mock.patch('vix.vixutils.VixConnection.delete_vm_files')
     @mock.patch('vix.vixutils.VixConnection.unregister_vm')
@@ -511,11 +1275,15 @@ class VixUtilsTestCase(unittest.TestCase):
         nested_hypervisor = True
         vnc_enabled = True
         vnc_port = 9999
+        serial_port_path = 'fake/console/path'
+        memory_profile = {'mem_use_named_file': False}
 
         self._VixConnection._get_scsi_config = mock.MagicMock()
         self._VixConnection._get_ide_config = mock.MagicMock()
+        self._VixConnection._get_serial_port_config = mock.MagicMock()
         self._VixConnection._get_networks_config = mock.MagicMock()
         self._VixConnection._get_nested_hypervisor_config = mock.MagicMock()
+        self._VixConnection._get_memory_config = mock.MagicMock()
         self._VixConnection._get_vnc_config = mock.MagicMock()
         os.path.dirname = mock.MagicMock()
         os.path.dirname.return_value = 'fake_dir'
@@ -535,15 +1303,26 @@ class VixUtilsTestCase(unittest.TestCase):
                                           networks=networks,
                                           nested_hypervisor=nested_hypervisor,
                                           vnc_enabled=vnc_enabled,
-                                          vnc_port=vnc_port)
+                                          vnc_port=vnc_port,
+                                          serial_port_path=serial_port_path,
+                                          memory_profile=memory_profile,
+                                          disk_controller=(
+                                              vixutils.DISK_CONTROLLER_PVSCSI),
+                                          nic_model=vixutils.NIC_MODEL_VMXNET3)
             m.assert_called_with('fake/path', 'wb')
 
-        self._VixConnection._get_scsi_config.assert_called_with(disk_paths)
+        self._VixConnection._get_scsi_config.assert_called_with(
+            disk_paths, vixutils.DISK_CONTROLLER_PVSCSI)
         self._VixConnection._get_ide_config.assert_called_with(iso_paths)
-        self._VixConnection._get_networks_config.assert_called_with(networks)
+        self._VixConnection._get_networks_config.assert_called_with(
+            networks, vixutils.NIC_MODEL_VMXNET3)
         self._VixConnection._get_nested_hypervisor_config.assert_called_once()
+        self._VixConnection._get_memory_config.assert_called_once_with(
+            **memory_profile)
         self._VixConnection._get_vnc_config.assert_called_with(vnc_enabled,
                                                                vnc_port)
+        self._VixConnection._get_serial_port_config.assert_called_with(
+            serial_port_path)
         os.path.dirname.assert_called_with(fake_path)
         os.path.exists.assert_called_with('fake_dir')
         os.makedirs.assert_called_with('fake_dir')
@@ -566,6 +1345,7 @@ class VixUtilsTestCase(unittest.TestCase):
         nested_hypervisor = True
         vnc_enabled = True
         vnc_port = mock.MagicMock()
+        serial_port_path = 'fake/console/path'
         additional_config = {"fake_config": "fake_value"}
 
         self._VixConnection._get_scsi_config = mock.MagicMock()
@@ -587,6 +1367,9 @@ class VixUtilsTestCase(unittest.TestCase):
         self._VixConnection._get_vnc_config.return_value = {"enabled": True,
                                                             "port": 9999,
                                                             }
+        self._VixConnection._get_serial_port_config = mock.MagicMock()
+        self._VixConnection._get_serial_port_config.return_value = {
+            "fake serial": "fake path"}
 
         self._VixConnection.update_vm(
             vmx_path=fake_path, display_name=display_name,
@@ -596,19 +1379,25 @@ class VixUtilsTestCase(unittest.TestCase):
             iso_paths=iso_paths, floppy_path=floppy_path, networks=networks,
             boot_order=boot_order, nested_hypervisor=nested_hypervisor,
             vnc_enabled=vnc_enabled, vnc_port=vnc_port,
+            serial_port_path=serial_port_path,
             additional_config=additional_config)
 
-        self._VixConnection._get_scsi_config.assert_called_with(disk_paths)
+        self._VixConnection._get_scsi_config.assert_called_with(disk_paths,
+                                                                None)
         self._VixConnection._get_floppy_config.assert_called_with(floppy_path)
         self._VixConnection._get_ide_config.assert_called_with(iso_paths)
-        self._VixConnection._get_networks_config.assert_called_with(networks)
+        self._VixConnection._get_networks_config.assert_called_with(networks,
+                                                                    None)
         self._VixConnection._get_nested_hypervisor_config.assert_called_once()
         self._VixConnection._get_vnc_config.assert_called_with(vnc_enabled,
                                                                vnc_port)
 
+        self._VixConnection._get_serial_port_config.assert_called_with(
+            serial_port_path)
+
         remove_vmx_value.assert_called_with(
             fake_path, r"ethernet[\d]+\.[a-zA-Z]+")
-        self.assertEqual(set_vmx_value.call_count, 15)
+        self.assertEqual(set_vmx_value.call_count, 16)
 
     def test_get_vnc_config(self):
         vnc_enabled = True
@@ -631,6 +1420,11 @@ class VixUtilsTestCase(unittest.TestCase):
                                     'scsi0:0.deviceType': 'scsi-hardDisk',
                                     'scsi0.virtualDev': 'lsisas1068'})
 
+    def test_get_scsi_config_pvscsi(self):
+        response = self._VixConnection._get_scsi_config(
+            ['fake/disk/path'], vixutils.DISK_CONTROLLER_PVSCSI)
+        self.assertEqual(response['scsi0.virtualDev'], 'pvscsi')
+
     def test_get_scsi_disk_config(self):
         ctrl_idx = 9999
         disk_idx = 9999
@@ -655,6 +1449,22 @@ class VixUtilsTestCase(unittest.TestCase):
                                     'ide1:0.startConnected': True,
                                     'ide1:0.fileName': 'fake/iso/path'})
 
+    def test_get_ide_config_slots(self):
+        iso_paths = ['fake/iso/path', 'fake/tools.iso', 'fake/configdrive']
+
+        response = self._VixConnection._get_ide_config(iso_paths)
+
+        self.assertEqual(response['ide1:0.fileName'], 'fake/iso/path')
+        self.assertEqual(response['ide1:1.fileName'], 'fake/tools.iso')
+        # An IDE channel has only two devices
+        self.assertEqual(response['ide0:0.fileName'], 'fake/configdrive')
+        self.assertNotIn('ide1:2.present', response)
+
+    def test_get_ide_config_too_many(self):
+        self.assertRaises(utils.VixException,
+                          self._VixConnection._get_ide_config,
+                          ['fake/iso/path'] * 5)
+
     def test_get_ide_iso_config(self):
         ctrl_idx = 9999
         disk_idx = 9999
@@ -680,12 +1490,34 @@ class VixUtilsTestCase(unittest.TestCase):
                                     'floppy0.present': 'TRUE',
                                     'floppy0.fileName': 'fake/floppy/path'})
 
+    def test_get_serial_port_config(self):
+        response = self._VixConnection._get_serial_port_config(
+            'fake/console/path')
+
+        self.assertEqual(response, {'serial0.present': 'TRUE',
+                                    'serial0.fileType': 'file',
+                                    'serial0.fileName': 'fake/console/path',
+                                    'serial0.tryNoRxLoss': 'FALSE'})
+
     def test_get_nested_hypervisor_config(self):
         response = self._VixConnection._get_nested_hypervisor_config()
         self.assertEqual(response, {'vhv.enable': 'TRUE',
                                     'vcpu.hotadd': 'FALSE',
                                     'featMask.vm.hv.capable': 'Min:1'})
 
+    def test_get_memory_config(self):
+        response = self._VixConnection._get_memory_config(
+            mem_use_named_file=False, mem_trim_rate=0,
+            mem_page_sharing=True, min_vm_mem_pct=100)
+        self.assertEqual(response, {'mainMem.useNamedFile': 'FALSE',
+                                    'MemTrimRate': '0',
+                                    'sched.mem.pshare.enable': 'TRUE',
+                                    'prefvmx.minVmMemPct': '100'})
+
+    def test_get_memory_config_unset(self):
+        response = self._VixConnection._get_memory_config()
+        self.assertEqual(response, {})
+
     def test_get_networks_config(self):
         networks = [('eth', 'mac')]
 
@@ -693,6 +1525,12 @@ class VixUtilsTestCase(unittest.TestCase):
 
         self.assertEqual(response['ethernet0.networkName'], 'eth')
         self.assertEqual(response['ethernet0.address'], 'mac')
+        self.assertEqual(response['ethernet0.virtualDev'], 'e1000e')
+
+    def test_get_networks_config_vmxnet3(self):
+        response = self._VixConnection._get_networks_config(
+            [('eth', 'mac')], vixutils.NIC_MODEL_VMXNET3)
+        self.assertEqual(response['ethernet0.virtualDev'], 'vmxnet3')
 
     @mock.patch('vix.vixutils._check_job_err_code')
     def test_register_vm(self, mock_check_job_err_code):
@@ -891,6 +1729,29 @@ class VixUtilsTestCase(unittest.TestCase):
     def test_get_tools_iso_path_linux(self):
         self._test_get_tools_iso_path(platform="linux")
 
+    @mock.patch('vix.cpuutils.get_cpu_info')
+    def _test_nested_virt_support(self, mock_get_cpu_info, features):
+        mock_get_cpu_info.return_value = {"features": features}
+        return self._VixConnection.nested_virt_support()
+
+    def test_nested_virt_support(self):
+        response = self._test_nested_virt_support(features=["vmx", "ept"])
+        self.assertEqual(response, vixutils.SUPPORTS_NESTED_VIRT_VMX |
+                         vixutils.SUPPORTS_NESTED_VIRT_EPT)
+
+    def test_nested_virt_support_no_slat(self):
+        response = self._test_nested_virt_support(features=["svm"])
+        self.assertEqual(response, vixutils.SUPPORTS_NESTED_VIRT_VMX)
+
+    def test_nested_virt_support_none(self):
+        response = self._test_nested_virt_support(features=["ept"])
+        self.assertEqual(response, 0)
+
+    def test_nested_virt_support_unknown_features(self):
+        response = self._test_nested_virt_support(features=None)
+        self.assertEqual(response, vixutils.SUPPORTS_NESTED_VIRT_VMX |
+                         vixutils.SUPPORTS_NESTED_VIRT_EPT)
+
     @mock.patch('vix.vixutils._check_job_err_code')
     def _test_clone_vm(self, mock_check_job_err_code, linked_clone):
         fake_src_vmx_path = 'fake_src_path'
@@ -0,0 +1,226 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import io
+import mock
+import unittest
+
+from vix import utils
+from vix import vmdkutils
+
+_GRAIN_BYTES = vmdkutils.DEFAULT_GRAIN_SIZE * vmdkutils.SECTOR_SIZE
+
+
+class VMDKUtilsTestCase(unittest.TestCase):
+    """Unit tests for the VMDK utility functions"""
+
+    def _get_fake_disk(self, blocks_data, capacity):
+        fake_disk = mock.MagicMock()
+        fake_disk.capacity = capacity
+        fake_disk.descriptor = {"ddb.adapterType": "buslogic"}
+        fake_disk.iter_allocated_blocks.side_effect = (
+            lambda block_size: iter(sorted(blocks_data.keys())))
+        fake_disk.read_block.side_effect = (
+            lambda block, block_size: blocks_data[block])
+        return fake_disk
+
+    def _get_stream_optimized_data(self, fake_disk, **kwargs):
+        return "".join(vmdkutils.get_stream_optimized_chunks(fake_disk,
+                                                             **kwargs))
+
+    def _open_disk(self, data, parent=None):
+        with mock.patch('vix.vmdkutils.open', create=True) as mock_open:
+            mock_open.side_effect = lambda *args: io.BytesIO(data)
+            return vmdkutils.VMDKDisk("fake.vmdk", parent)
+
+    def test_sparse_extent_header(self):
+        header = vmdkutils.SparseExtentHeader(version=3, capacity=1024,
+                                              gd_offset=10)
+        data = header.to_bytes()
+        self.assertEqual(len(data), vmdkutils.SECTOR_SIZE)
+
+        response = vmdkutils.SparseExtentHeader.from_bytes(data)
+        self.assertEqual(response.version, 3)
+        self.assertEqual(response.capacity, 1024)
+        self.assertEqual(response.gd_offset, 10)
+        self.assertEqual(response.get_num_gts(), 1)
+
+    def test_sparse_extent_header_no_magic(self):
+        response = vmdkutils.SparseExtentHeader.from_bytes(
+            "\0" * vmdkutils.SECTOR_SIZE)
+        self.assertIsNone(response)
+
+    def test_get_stream_optimized_chunks(self):
+        capacity = vmdkutils.DEFAULT_GRAIN_SIZE * 600 + 5
+        blocks_data = {0: "a" * _GRAIN_BYTES,
+                       3: "\0" * _GRAIN_BYTES,
+                       520: "b" * _GRAIN_BYTES,
+                       600: "c" * 5 * vmdkutils.SECTOR_SIZE}
+        fake_disk = self._get_fake_disk(blocks_data, capacity)
+
+        data = self._get_stream_optimized_data(fake_disk)
+        self.assertEqual(len(data) % vmdkutils.SECTOR_SIZE, 0)
+
+        disk = self._open_disk(data)
+        self.assertEqual(disk.capacity, capacity)
+        self.assertEqual(disk.descriptor["createType"], "streamOptimized")
+        self.assertEqual(disk.descriptor["ddb.adapterType"], "buslogic")
+        # Zero blocks are skipped
+        self.assertEqual(disk.get_allocated_blocks(), [0, 520, 600])
+        self.assertIsNone(disk.read_block(3))
+        for block in [0, 520, 600]:
+            self.assertEqual(disk.read_block(block), blocks_data[block])
+
+    def test_get_stream_optimized_chunks_zero_blocks(self):
+        blocks_data = {1: "\0" * _GRAIN_BYTES}
+        fake_disk = self._get_fake_disk(blocks_data,
+                                        vmdkutils.DEFAULT_GRAIN_SIZE * 2)
+
+        data = self._get_stream_optimized_data(fake_disk,
+                                               skip_zero_blocks=False)
+
+        disk = self._open_disk(data)
+        self.assertEqual(disk.get_allocated_blocks(), [1])
+        self.assertEqual(disk.read_block(1), blocks_data[1])
+
+    def test_get_stream_optimized_chunks_blocks(self):
+        blocks_data = {0: "a" * _GRAIN_BYTES, 1: "b" * _GRAIN_BYTES}
+        fake_disk = self._get_fake_disk(blocks_data,
+                                        vmdkutils.DEFAULT_GRAIN_SIZE * 2)
+
+        data = self._get_stream_optimized_data(fake_disk, blocks=[1])
+
+        disk = self._open_disk(data)
+        self.assertEqual(disk.get_allocated_blocks(), [1])
+        self.assertFalse(fake_disk.iter_allocated_blocks.called)
+
+    def test_read_block_from_parent(self):
+        blocks_data = {1: "a" * _GRAIN_BYTES}
+        fake_disk = self._get_fake_disk(blocks_data,
+                                        vmdkutils.DEFAULT_GRAIN_SIZE * 3)
+        data = self._get_stream_optimized_data(fake_disk)
+
+        fake_parent = mock.MagicMock()
+        fake_parent.parent = None
+        fake_parent._read.side_effect = lambda sector, count: [
+            (sector, count, "p" * count * vmdkutils.SECTOR_SIZE)]
+        fake_parent._iter_layer_allocated_blocks.return_value = iter([0, 2])
+
+        disk = self._open_disk(data, fake_parent)
+
+        self.assertEqual(disk.read_block(0), "p" * _GRAIN_BYTES)
+        self.assertEqual(disk.read_block(1), blocks_data[1])
+        self.assertEqual(disk.get_allocated_blocks(), [0, 1, 2])
+
+    @mock.patch('vix.vmdkutils._is_same_disk')
+    def test_iter_delta_blocks(self, mock_is_same_disk):
+        mock_is_same_disk.side_effect = lambda disk, other_disk: (
+            disk.path == other_disk.path)
+        fake_base_disk = mock.MagicMock()
+        fake_base_disk.path = "fake_base.vmdk"
+        fake_base_disk.iter_allocated_blocks.side_effect = (
+            lambda block_size: iter([0, 1]))
+        fake_layer = mock.MagicMock()
+        fake_layer.path = "fake.vmdk"
+        fake_layer._iter_layer_allocated_blocks.side_effect = (
+            lambda block_size: iter([1, 3, 9]))
+        fake_disk = mock.MagicMock()
+        fake_disk.capacity = vmdkutils.DEFAULT_GRAIN_SIZE * 5
+
+        fake_disk.get_chain.return_value = [fake_layer, fake_base_disk]
+        response = vmdkutils.iter_delta_blocks(fake_disk, fake_base_disk)
+        self.assertEqual(list(response), [1, 3])
+
+        # Base disk not in the chain, e.g. for full copies
+        fake_disk.get_chain.return_value = [fake_layer]
+        response = vmdkutils.iter_delta_blocks(fake_disk, fake_base_disk)
+        self.assertEqual(list(response), [0, 1, 3])
+
+    def test_merge_blocks(self):
+        response = vmdkutils._merge_blocks(
+            [iter([0, 2, 5, 7]), iter([1, 2, 6]), iter([])], 7)
+        self.assertEqual(list(response), [0, 1, 2, 5, 6])
+
+    def test_iter_allocated_grains(self):
+        blocks_data = {1: "a" * _GRAIN_BYTES, 513: "b" * _GRAIN_BYTES}
+        fake_disk = self._get_fake_disk(blocks_data,
+                                        vmdkutils.DEFAULT_GRAIN_SIZE * 1024)
+        data = self._get_stream_optimized_data(fake_disk)
+        disk = self._open_disk(data)
+        extent = disk._extents[0][2]
+
+        grains = extent.iter_allocated_grains()
+        self.assertEqual(next(grains), 1)
+        # Reading from another grain table does not affect the iteration
+        self.assertEqual(disk.read_block(513), blocks_data[513])
+        self.assertEqual(list(grains), [513])
+
+    def test_get_stream_optimized_chunks_base_disk(self):
+        capacity = vmdkutils.DEFAULT_GRAIN_SIZE * 4
+        blocks_data = {0: "a" * _GRAIN_BYTES,
+                       1: "b" * _GRAIN_BYTES,
+                       2: "\0" * _GRAIN_BYTES,
+                       3: None}
+        base_blocks_data = {0: "a" * _GRAIN_BYTES,
+                            1: "x" * _GRAIN_BYTES,
+                            2: "y" * _GRAIN_BYTES,
+                            3: "z" * _GRAIN_BYTES}
+        fake_disk = self._get_fake_disk(blocks_data, capacity)
+        fake_base_disk = self._get_fake_disk(base_blocks_data, capacity)
+
+        data = self._get_stream_optimized_data(fake_disk, blocks=range(4),
+                                               base_disk=fake_base_disk)
+
+        disk = self._open_disk(data)
+        # Unchanged blocks are skipped, zeroed blocks are included
+        self.assertEqual(disk.get_allocated_blocks(), [1, 2, 3])
+        self.assertEqual(disk.read_block(1), blocks_data[1])
+        self.assertEqual(disk.read_block(3), "\0" * _GRAIN_BYTES)
+
+    def test_open_disk_no_extents(self):
+        self.assertRaises(utils.VixException, self._open_disk,
+                          "# Disk DescriptorFile\nversion=1\n")
+
+    def _get_disk_capacity(self, data):
+        with mock.patch('vix.vmdkutils.open', create=True) as mock_open:
+            mock_open.return_value = io.BytesIO(data)
+            return vmdkutils.get_disk_capacity("fake.vmdk")
+
+    def test_get_disk_capacity_sparse(self):
+        header = vmdkutils.SparseExtentHeader(capacity=2048)
+
+        response = self._get_disk_capacity(header.to_bytes())
+
+        self.assertEqual(response, 2048 * vmdkutils.SECTOR_SIZE)
+
+    def test_get_disk_capacity_descriptor(self):
+        descriptor = ("# Disk DescriptorFile\n"
+                      "version=1\n"
+                      "RW 1024 FLAT \"fake-f001.vmdk\" 0\n"
+                      "RW 512 SPARSE \"fake-s002.vmdk\"\n")
+
+        response = self._get_disk_capacity(descriptor)
+
+        self.assertEqual(response, 1536 * vmdkutils.SECTOR_SIZE)
+
+    def test_chunked_reader(self):
+        reader = vmdkutils.ChunkedReader(iter(["abc", "de", "", "fghi"]))
+
+        self.assertEqual(reader.read(4), "abcd")
+        self.assertEqual(reader.read(1), "e")
+        self.assertEqual(reader.read(), "fghi")
+        self.assertEqual(reader.read(10), "")
@@ -16,9 +16,11 @@
 #    under the License.
 
 import multiprocessing
+import os
 import psutil
 import re
 import socket
+import time
 
 from nova import exception
 
@@ -37,10 +39,107 @@ def get_disk_info(path):
     return (disk_info.total, disk_info.free)
 
 
+def get_disk_io_bytes():
+    io_counters = psutil.disk_io_counters()
+    return io_counters.read_bytes + io_counters.write_bytes
+
+
 def get_cpu_count():
     return multiprocessing.cpu_count()
 
 
+def _get_process_value(process, name):
+    # psutil < 2.0 exposes get_* methods and properties instead of methods
+    value = getattr(process, name, None)
+    if value is None:
+        value = getattr(process, "get_%s" % name)
+    return value() if callable(value) else value
+
+
+def get_processes_info(process_names):
+    """Returns the command line, CPU time, RSS and I/O counters of all the
+    processes with the given names, sampled in a single pass.
+    """
+    processes_info = []
+    for process in psutil.process_iter():
+        try:
+            if _get_process_value(process, "name") not in process_names:
+                continue
+
+            cpu_times = _get_process_value(process, "cpu_times")
+            try:
+                io_counters = _get_process_value(process, "io_counters")
+            except (AttributeError, NotImplementedError):
+                # Not available on OS X
+                io_counters = None
+
+            processes_info.append({
+                "pid": process.pid,
+                "cmdline": _get_process_value(process, "cmdline"),
+                "cpu_time": cpu_times.user + cpu_times.system,
+                "rss": _get_process_value(process, "memory_info").rss,
+                "read_bytes": io_counters and io_counters.read_bytes,
+                "write_bytes": io_counters and io_counters.write_bytes})
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            # The process might have exited in the meantime
+            pass
+    return processes_info
+
+
+def get_load_average():
+    # Not available on Windows
+    if hasattr(os, "getloadavg"):
+        return os.getloadavg()
+
+
+class HostMetrics(object):
+    def __init__(self, timestamp, total_mem, free_mem, total_disk, free_disk,
+                 cpu_count, cpu_percent, load_average):
+        self.timestamp = timestamp
+        self.total_mem = total_mem
+        self.free_mem = free_mem
+        self.total_disk = total_disk
+        self.free_disk = free_disk
+        self.cpu_count = cpu_count
+        self.cpu_percent = cpu_percent
+        self.load_average = load_average
+
+
+class HostMetricsSampler(object):
+    """Samples the host memory, disk, CPU and load metrics together,
+    returning the same snapshot to all the callers until it is older than
+    ttl seconds.
+    """
+
+    def __init__(self, disk_path, ttl=10):
+        self._disk_path = disk_path
+        self._ttl = ttl
+        self._metrics = None
+        # The first call returns the usage since boot, following calls the
+        # usage since the previous call
+        psutil.cpu_percent(interval=None)
+
+    def sample(self):
+        (total_mem, free_mem) = get_host_memory_info()
+        (total_disk, free_disk) = get_disk_info(self._disk_path)
+        self._metrics = HostMetrics(timestamp=time.time(),
+                                    total_mem=total_mem,
+                                    free_mem=free_mem,
+                                    total_disk=total_disk,
+                                    free_disk=free_disk,
+                                    cpu_count=get_cpu_count(),
+                                    cpu_percent=psutil.cpu_percent(
+                                        interval=None),
+                                    load_average=get_load_average())
+        return self._metrics
+
+    def get_metrics(self):
+        if (not self._metrics or
+                time.time() - self._metrics.timestamp >= self._ttl):
+            return self.sample()
+        return self._metrics
+
+
 def get_free_port():
     sock = socket.socket()
     try:
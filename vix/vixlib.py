@@ -591,10 +591,12 @@ vix.VixVM_LoginInGuest.argtypes = [VixHandle, ctypes.c_char_p,
                                    ctypes.c_char_p, ctypes.c_int,
                                    ctypes.POINTER(VixEventProc),
                                    ctypes.c_void_p]
+VixVM_LoginInGuest = vix.VixVM_LoginInGuest
 
 vix.VixVM_LogoutFromGuest.restype = VixHandle
 vix.VixVM_LogoutFromGuest.argtypes = [VixHandle, ctypes.POINTER(VixEventProc),
                                       ctypes.c_void_p]
+VixVM_LogoutFromGuest = vix.VixVM_LogoutFromGuest
 
 vix.VixVM_RunProgramInGuest.restype = VixHandle
 vix.VixVM_RunProgramInGuest.argtypes = [VixHandle, ctypes.c_char_p,
@@ -602,11 +604,13 @@ vix.VixVM_RunProgramInGuest.argtypes = [VixHandle, ctypes.c_char_p,
                                         VixHandle,
                                         ctypes.POINTER(VixEventProc),
                                         ctypes.c_void_p]
+VixVM_RunProgramInGuest = vix.VixVM_RunProgramInGuest
 
 vix.VixVM_ListProcessesInGuest.restype = VixHandle
 vix.VixVM_ListProcessesInGuest.argtypes = [VixHandle, ctypes.c_int,
                                            ctypes.POINTER(VixEventProc),
                                            ctypes.c_void_p]
+VixVM_ListProcessesInGuest = vix.VixVM_ListProcessesInGuest
 
 vix.VixVM_KillProcessInGuest.restype = VixHandle
 vix.VixVM_KillProcessInGuest.argtypes = [VixHandle, ctypes.c_uint64,
@@ -619,6 +623,7 @@ vix.VixVM_RunScriptInGuest.argtypes = [VixHandle, ctypes.c_char_p,
                                        ctypes.c_char_p, VixRunProgramOptions,
                                        VixHandle, ctypes.POINTER(VixEventProc),
                                        ctypes.c_void_p]
+VixVM_RunScriptInGuest = vix.VixVM_RunScriptInGuest
 
 vix.VixVM_CopyFileFromHostToGuest.restype = VixHandle
 vix.VixVM_CopyFileFromHostToGuest.argtypes = [VixHandle, ctypes.c_char_p,
@@ -626,6 +631,7 @@ vix.VixVM_CopyFileFromHostToGuest.argtypes = [VixHandle, ctypes.c_char_p,
                                               VixHandle,
                                               ctypes.POINTER(VixEventProc),
                                               ctypes.c_void_p]
+VixVM_CopyFileFromHostToGuest = vix.VixVM_CopyFileFromHostToGuest
 
 vix.VixVM_CopyFileFromGuestToHost.restype = VixHandle
 vix.VixVM_CopyFileFromGuestToHost.argtypes = [VixHandle, ctypes.c_char_p,
@@ -633,11 +639,13 @@ vix.VixVM_CopyFileFromGuestToHost.argtypes = [VixHandle, ctypes.c_char_p,
                                               VixHandle,
                                               ctypes.POINTER(VixEventProc),
                                               ctypes.c_void_p]
+VixVM_CopyFileFromGuestToHost = vix.VixVM_CopyFileFromGuestToHost
 
 vix.VixVM_DeleteFileInGuest.restype = VixHandle
 vix.VixVM_DeleteFileInGuest.argtypes = [VixHandle, ctypes.c_char_p,
                                         ctypes.POINTER(VixEventProc),
                                         ctypes.c_void_p]
+VixVM_DeleteFileInGuest = vix.VixVM_DeleteFileInGuest
 
 vix.VixVM_FileExistsInGuest.restype = VixHandle
 vix.VixVM_FileExistsInGuest.argtypes = [VixHandle, ctypes.c_char_p,
@@ -656,23 +664,27 @@ vix.VixVM_CreateTempFileInGuest.argtypes = [VixHandle,
                                             ctypes.c_int, VixHandle,
                                             ctypes.POINTER(VixEventProc),
                                             ctypes.c_void_p]
+VixVM_CreateTempFileInGuest = vix.VixVM_CreateTempFileInGuest
 
 vix.VixVM_GetFileInfoInGuest.restype = VixHandle
 vix.VixVM_GetFileInfoInGuest.argtypes = [VixHandle, ctypes.c_char_p,
                                          ctypes.POINTER(VixEventProc),
                                          ctypes.c_void_p]
+VixVM_GetFileInfoInGuest = vix.VixVM_GetFileInfoInGuest
 
 vix.VixVM_ListDirectoryInGuest.restype = VixHandle
 vix.VixVM_ListDirectoryInGuest.argtypes = [VixHandle, ctypes.c_char_p,
                                            ctypes.c_int,
                                            ctypes.POINTER(VixEventProc),
                                            ctypes.c_void_p]
+VixVM_ListDirectoryInGuest = vix.VixVM_ListDirectoryInGuest
 
 vix.VixVM_CreateDirectoryInGuest.restype = VixHandle
 vix.VixVM_CreateDirectoryInGuest.argtypes = [VixHandle, ctypes.c_char_p,
                                              VixHandle,
                                              ctypes.POINTER(VixEventProc),
                                              ctypes.c_void_p]
+VixVM_CreateDirectoryInGuest = vix.VixVM_CreateDirectoryInGuest
 
 vix.VixVM_DeleteDirectoryInGuest.restype = VixHandle
 vix.VixVM_DeleteDirectoryInGuest.argtypes = [VixHandle, ctypes.c_char_p,
@@ -696,14 +708,17 @@ vix.VixVM_WriteVariable.argtypes = [VixHandle, ctypes.c_int, ctypes.c_char_p,
                                     ctypes.c_char_p, ctypes.c_int,
                                     ctypes.POINTER(VixEventProc),
                                     ctypes.c_void_p]
+VixVM_WriteVariable = vix.VixVM_WriteVariable
 
 vix.VixVM_GetNumRootSnapshots.restype = VixError
 vix.VixVM_GetNumRootSnapshots.argtypes = [VixHandle,
                                           ctypes.POINTER(ctypes.c_int)]
+VixVM_GetNumRootSnapshots = vix.VixVM_GetNumRootSnapshots
 
 vix.VixVM_GetRootSnapshot.restype = VixError
 vix.VixVM_GetRootSnapshot.argtypes = [VixHandle, ctypes.c_int,
                                       ctypes.POINTER(VixHandle)]
+VixVM_GetRootSnapshot = vix.VixVM_GetRootSnapshot
 
 vix.VixVM_GetCurrentSnapshot.restype = VixError
 vix.VixVM_GetCurrentSnapshot.argtypes = [VixHandle, ctypes.POINTER(VixHandle)]
@@ -711,6 +726,7 @@ vix.VixVM_GetCurrentSnapshot.argtypes = [VixHandle, ctypes.POINTER(VixHandle)]
 vix.VixVM_GetNamedSnapshot.restype = VixError
 vix.VixVM_GetNamedSnapshot.argtypes = [VixHandle, ctypes.c_char_p,
                                        ctypes.POINTER(VixHandle)]
+VixVM_GetNamedSnapshot = vix.VixVM_GetNamedSnapshot
 
 vix.VixVM_RemoveSnapshot.restype = VixHandle
 vix.VixVM_RemoveSnapshot.argtypes = [VixHandle, VixHandle,
@@ -724,6 +740,7 @@ vix.VixVM_RevertToSnapshot.argtypes = [VixHandle, VixHandle,
                                        VixVMPowerOpOptions, VixHandle,
                                        ctypes.POINTER(VixEventProc),
                                        ctypes.c_void_p]
+VixVM_RevertToSnapshot = vix.VixVM_RevertToSnapshot
 
 vix.VixVM_CreateSnapshot.restype = VixHandle
 vix.VixVM_CreateSnapshot.argtypes = [VixHandle, ctypes.c_char_p,
@@ -737,6 +754,7 @@ vix.VixVM_EnableSharedFolders.argtypes = [VixHandle, ctypes.c_byte,
                                           ctypes.c_int,
                                           ctypes.POINTER(VixEventProc),
                                           ctypes.c_void_p]
+VixVM_EnableSharedFolders = vix.VixVM_EnableSharedFolders
 
 vix.VixVM_GetNumSharedFolders.restype = VixHandle
 vix.VixVM_GetNumSharedFolders.argtypes = [VixHandle,
@@ -754,6 +772,7 @@ vix.VixVM_SetSharedFolderState.argtypes = [VixHandle, ctypes.c_char_p,
                                            VixMsgSharedFolderOptions,
                                            ctypes.POINTER(VixEventProc),
                                            ctypes.c_void_p]
+VixVM_SetSharedFolderState = vix.VixVM_SetSharedFolderState
 
 vix.VixVM_AddSharedFolder.restype = VixHandle
 vix.VixVM_AddSharedFolder.argtypes = [VixHandle, ctypes.c_char_p,
@@ -761,18 +780,21 @@ vix.VixVM_AddSharedFolder.argtypes = [VixHandle, ctypes.c_char_p,
                                       VixMsgSharedFolderOptions,
                                       ctypes.POINTER(VixEventProc),
                                       ctypes.c_void_p]
+VixVM_AddSharedFolder = vix.VixVM_AddSharedFolder
 
 vix.VixVM_RemoveSharedFolder.restype = VixHandle
 vix.VixVM_RemoveSharedFolder.argtypes = [VixHandle, ctypes.c_char_p,
                                          ctypes.c_int,
                                          ctypes.POINTER(VixEventProc),
                                          ctypes.c_void_p]
+VixVM_RemoveSharedFolder = vix.VixVM_RemoveSharedFolder
 
 vix.VixVM_CaptureScreenImage.restype = VixHandle
 vix.VixVM_CaptureScreenImage.argtypes = [VixHandle, ctypes.c_int,
                                          VixHandle,
                                          ctypes.POINTER(VixEventProc),
                                          ctypes.c_void_p]
+VixVM_CaptureScreenImage = vix.VixVM_CaptureScreenImage
 
 vix.VixVM_Clone.restype = VixHandle
 vix.VixVM_Clone.argtypes = [VixHandle, VixHandle, VixCloneType,
@@ -798,23 +820,29 @@ VixJob_Wait = vix.VixJob_Wait
 vix.VixJob_CheckCompletion.restype = VixError
 vix.VixJob_CheckCompletion.argtypes = [VixHandle,
                                        ctypes.POINTER(ctypes.c_byte)]
+VixJob_CheckCompletion = vix.VixJob_CheckCompletion
 
 vix.VixJob_GetError.restype = VixError
 vix.VixJob_GetError.argtypes = [VixHandle]
 
 vix.VixJob_GetNumProperties.restype = ctypes.c_int
 vix.VixJob_GetNumProperties.argtypes = [VixHandle, ctypes.c_int]
+VixJob_GetNumProperties = vix.VixJob_GetNumProperties
 
 vix.VixJob_GetNthProperties.restype = VixError
 vix.VixJob_GetNthProperties.argtypes = [VixHandle, ctypes.c_int, ctypes.c_int]
+VixJob_GetNthProperties = vix.VixJob_GetNthProperties
 
 vix.VixSnapshot_GetNumChildren.restype = VixError
 vix.VixSnapshot_GetNumChildren.argtypes = [VixHandle,
                                            ctypes.POINTER(ctypes.c_int)]
+VixSnapshot_GetNumChildren = vix.VixSnapshot_GetNumChildren
 
 vix.VixSnapshot_GetChild.restype = VixError
 vix.VixSnapshot_GetChild.argtypes = [VixHandle, ctypes.c_int,
                                      ctypes.POINTER(VixHandle)]
+VixSnapshot_GetChild = vix.VixSnapshot_GetChild
 
 vix.VixSnapshot_GetParent.restype = VixError
 vix.VixSnapshot_GetParent.argtypes = [VixHandle, ctypes.POINTER(VixHandle)]
+VixSnapshot_GetParent = vix.VixSnapshot_GetParent
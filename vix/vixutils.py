@@ -27,6 +27,7 @@ if sys.platform == 'win32':
     import win32api
 
 from nova.openstack.common.gettextutils import _
+from vix import cpuutils
 from vix import vixlib
 from vix import utils
 
@@ -39,11 +40,70 @@ SUPPORTS_NESTED_VIRT_EPT = 2
 NETWORK_NAT = "__nat__"
 NETWORK_HOST_ONLY = "__host_only__"
 
+DISK_CONTROLLER_BUSLOGIC = "buslogic"
+DISK_CONTROLLER_LSILOGIC = "lsilogic"
+DISK_CONTROLLER_LSISAS1068 = "lsisas1068"
+DISK_CONTROLLER_PVSCSI = "pvscsi"
+
+DISK_CONTROLLERS = [DISK_CONTROLLER_BUSLOGIC, DISK_CONTROLLER_LSILOGIC,
+                    DISK_CONTROLLER_LSISAS1068, DISK_CONTROLLER_PVSCSI]
+
+NIC_MODEL_E1000 = "e1000"
+NIC_MODEL_E1000E = "e1000e"
+NIC_MODEL_VMXNET3 = "vmxnet3"
+
+NIC_MODELS = [NIC_MODEL_E1000, NIC_MODEL_E1000E, NIC_MODEL_VMXNET3]
+
+# Each IDE channel has two devices, the secondary channel is used first
+_IDE_CDROM_SLOTS = [(1, 0), (1, 1), (0, 0), (0, 1)]
+
+# Guest OS types without drivers for the paravirtual devices
+_PARAVIRTUAL_UNSUPPORTED_GUEST_OS = {
+    DISK_CONTROLLER_PVSCSI: re.compile(
+        r"^(dos|win31|win95|win98|winme|winnt|win2000|winxp|freebsd|"
+        r"netware|other(-64)?$)", re.IGNORECASE),
+    NIC_MODEL_VMXNET3: re.compile(
+        r"^(dos|win31|win95|win98|winme|winnt|win2000|netware|"
+        r"other(-64)?$)", re.IGNORECASE),
+}
+
+# Snapshot trees, cached by vmx path along with the snapshot metadata file
+# modification time
+_snapshot_trees = {}
+
 
 def _check_job_err_code(err):
     if err:
         msg = vixlib.Vix_GetErrorText(err, None)
-        raise utils.VixException(msg)
+        raise utils.VixException(msg, error_code=get_error_code(err))
+
+
+def get_error_code(err):
+    # The higher bits of VixError values contain additional information
+    return err & 0xFFFF
+
+
+def get_exception_error_code(ex):
+    return ex.kwargs.get('error_code')
+
+
+def is_device_supported(guest_os, device):
+    unsupported_re = _PARAVIRTUAL_UNSUPPORTED_GUEST_OS.get(device)
+    return not (unsupported_re and unsupported_re.match(guest_os or ""))
+
+
+def check_device_compatibility(guest_os, disk_controller, nic_model):
+    if disk_controller not in DISK_CONTROLLERS:
+        raise utils.VixException(_("Unsupported disk controller: %s") %
+                                 disk_controller)
+    if nic_model not in NIC_MODELS:
+        raise utils.VixException(_("Unsupported NIC model: %s") % nic_model)
+
+    for device in [disk_controller, nic_model]:
+        if not is_device_supported(guest_os, device):
+            raise utils.VixException(
+                _("Device %(device)s not supported by guest OS "
+                  "%(guest_os)s") % {'device': device, 'guest_os': guest_os})
 
 
 def load_config_file_values(path):
@@ -149,6 +209,19 @@ def get_vmx_value(vmx_path, name):
         return value[0]
 
 
+def get_vmx_mac_addresses(vmx_path):
+    config = load_config_file_values(vmx_path)
+    mac_addresses = []
+    i = 0
+    while config.get("ethernet%d.present" % i, "").upper() == "TRUE":
+        mac_address = (config.get("ethernet%d.address" % i) or
+                       config.get("ethernet%d.generatedAddress" % i))
+        if mac_address:
+            mac_addresses.append(mac_address.lower())
+        i += 1
+    return mac_addresses
+
+
 class VixVM(object):
     def __init__(self, vm_handle):
         self._vm_handle = vm_handle
@@ -243,6 +316,64 @@ class VixVM(object):
         vixlib.Vix_ReleaseHandle(job_handle)
         _check_job_err_code(err)
 
+    def enable_shared_folders(self, enabled=True):
+        job_handle = vixlib.VixVM_EnableSharedFolders(self._vm_handle,
+                                                      enabled, 0, None, None)
+        err = vixlib.VixJob_Wait(job_handle, vixlib.VIX_PROPERTY_NONE)
+        vixlib.Vix_ReleaseHandle(job_handle)
+        _check_job_err_code(err)
+
+    def _get_shared_folder_flags(self, writable):
+        if writable:
+            return vixlib.VIX_SHAREDFOLDER_WRITE_ACCESS
+        return 0
+
+    def add_shared_folder(self, share_name, host_path, writable=False):
+        job_handle = vixlib.VixVM_AddSharedFolder(
+            self._vm_handle, share_name, host_path,
+            self._get_shared_folder_flags(writable), None, None)
+        err = vixlib.VixJob_Wait(job_handle, vixlib.VIX_PROPERTY_NONE)
+        vixlib.Vix_ReleaseHandle(job_handle)
+        _check_job_err_code(err)
+
+    def set_shared_folder_state(self, share_name, host_path, writable=False):
+        job_handle = vixlib.VixVM_SetSharedFolderState(
+            self._vm_handle, share_name, host_path,
+            self._get_shared_folder_flags(writable), None, None)
+        err = vixlib.VixJob_Wait(job_handle, vixlib.VIX_PROPERTY_NONE)
+        vixlib.Vix_ReleaseHandle(job_handle)
+        _check_job_err_code(err)
+
+    def remove_shared_folder(self, share_name):
+        job_handle = vixlib.VixVM_RemoveSharedFolder(self._vm_handle,
+                                                     share_name, 0, None,
+                                                     None)
+        err = vixlib.VixJob_Wait(job_handle, vixlib.VIX_PROPERTY_NONE)
+        vixlib.Vix_ReleaseHandle(job_handle)
+        _check_job_err_code(err)
+
+    def capture_screen(self):
+        """Returns the guest screen as PNG image data. Requires a guest
+        login.
+        """
+        job_handle = vixlib.VixVM_CaptureScreenImage(
+            self._vm_handle, vixlib.VIX_CAPTURESCREENFORMAT_PNG,
+            vixlib.VIX_INVALID_HANDLE, None, None)
+
+        byte_count = ctypes.c_int()
+        screen_bits = ctypes.c_void_p()
+        err = vixlib.VixJob_Wait(
+            job_handle, vixlib.VIX_PROPERTY_JOB_RESULT_SCREEN_IMAGE_DATA,
+            ctypes.byref(byte_count), ctypes.byref(screen_bits),
+            vixlib.VIX_PROPERTY_NONE)
+        vixlib.Vix_ReleaseHandle(job_handle)
+        try:
+            _check_job_err_code(err)
+            return ctypes.string_at(screen_bits, byte_count.value)
+        finally:
+            if screen_bits:
+                vixlib.Vix_FreeBuffer(screen_bits)
+
     def get_guest_ip_address(self, timeout_seconds=600):
         start = time.time()
 
@@ -275,6 +406,178 @@ class VixVM(object):
 
         return ip_address
 
+    def read_variable_async(self, name,
+                            variable_type=vixlib.VIX_VM_GUEST_VARIABLE):
+        job_handle = vixlib.VixVM_ReadVariable(self._vm_handle,
+                                               variable_type, name, 0,
+                                               None, None)
+        return VixJob(job_handle)
+
+    def write_variable_async(self, name, value,
+                             variable_type=vixlib.VIX_VM_GUEST_VARIABLE):
+        job_handle = vixlib.VixVM_WriteVariable(self._vm_handle,
+                                                variable_type, name, value,
+                                                0, None, None)
+        return VixJob(job_handle)
+
+    def write_variables(self, variables,
+                        variable_type=vixlib.VIX_VM_GUEST_VARIABLE):
+        # All the jobs are started before waiting for any of them
+        jobs = []
+        try:
+            for (name, value) in variables.items():
+                jobs.append(self.write_variable_async(name, value,
+                                                      variable_type))
+            for job in jobs:
+                job.wait()
+        finally:
+            for job in jobs:
+                job.close()
+
+    def login_in_guest(self, username, password, options=0):
+        job_handle = vixlib.VixVM_LoginInGuest(self._vm_handle, username,
+                                               password, options, None, None)
+        err = vixlib.VixJob_Wait(job_handle, vixlib.VIX_PROPERTY_NONE)
+        vixlib.Vix_ReleaseHandle(job_handle)
+        _check_job_err_code(err)
+
+    def logout_from_guest(self):
+        job_handle = vixlib.VixVM_LogoutFromGuest(self._vm_handle, None, None)
+        err = vixlib.VixJob_Wait(job_handle, vixlib.VIX_PROPERTY_NONE)
+        vixlib.Vix_ReleaseHandle(job_handle)
+        _check_job_err_code(err)
+
+    def copy_file_from_host_to_guest(self, host_path, guest_path):
+        job_handle = vixlib.VixVM_CopyFileFromHostToGuest(
+            self._vm_handle, host_path, guest_path, 0,
+            vixlib.VIX_INVALID_HANDLE, None, None)
+        err = vixlib.VixJob_Wait(job_handle, vixlib.VIX_PROPERTY_NONE)
+        vixlib.Vix_ReleaseHandle(job_handle)
+        _check_job_err_code(err)
+
+    def copy_file_from_host_to_guest_async(self, host_path, guest_path):
+        job_handle = vixlib.VixVM_CopyFileFromHostToGuest(
+            self._vm_handle, host_path, guest_path, 0,
+            vixlib.VIX_INVALID_HANDLE, None, None)
+        return VixJob(job_handle)
+
+    def create_temp_file_in_guest(self):
+        job_handle = vixlib.VixVM_CreateTempFileInGuest(
+            self._vm_handle, 0, vixlib.VIX_INVALID_HANDLE, None, None)
+        with VixJob(job_handle) as job:
+            return job.get_string_result(
+                vixlib.VIX_PROPERTY_JOB_RESULT_ITEM_NAME)
+
+    def delete_file_in_guest(self, guest_path):
+        job_handle = vixlib.VixVM_DeleteFileInGuest(self._vm_handle,
+                                                    guest_path, None, None)
+        err = vixlib.VixJob_Wait(job_handle, vixlib.VIX_PROPERTY_NONE)
+        vixlib.Vix_ReleaseHandle(job_handle)
+        _check_job_err_code(err)
+
+    def run_program_in_guest(self, program_path, command_line=None,
+                             options=0):
+        job_handle = vixlib.VixVM_RunProgramInGuest(
+            self._vm_handle, program_path, command_line, options,
+            vixlib.VIX_INVALID_HANDLE, None, None)
+
+        exit_code = ctypes.c_int()
+        err = vixlib.VixJob_Wait(
+            job_handle, vixlib.VIX_PROPERTY_JOB_RESULT_GUEST_PROGRAM_EXIT_CODE,
+            ctypes.byref(exit_code), vixlib.VIX_PROPERTY_NONE)
+        vixlib.Vix_ReleaseHandle(job_handle)
+        _check_job_err_code(err)
+        return exit_code.value
+
+    def run_program_in_guest_async(self, program_path, command_line=None,
+                                   options=0):
+        job_handle = vixlib.VixVM_RunProgramInGuest(
+            self._vm_handle, program_path, command_line, options,
+            vixlib.VIX_INVALID_HANDLE, None, None)
+        return VixJob(job_handle)
+
+    def run_script_in_guest_async(self, interpreter, script_text, options=0):
+        job_handle = vixlib.VixVM_RunScriptInGuest(
+            self._vm_handle, interpreter, script_text, options,
+            vixlib.VIX_INVALID_HANDLE, None, None)
+        return VixJob(job_handle)
+
+    def list_processes_in_guest(self):
+        job_handle = vixlib.VixVM_ListProcessesInGuest(self._vm_handle, 0,
+                                                       None, None)
+        with VixJob(job_handle) as job:
+            job.wait()
+
+            processes = []
+            for i in range(job.get_num_results(
+                    vixlib.VIX_PROPERTY_JOB_RESULT_ITEM_NAME)):
+                (name, pid, owner, command) = job.get_nth_results(i, [
+                    (vixlib.VIX_PROPERTY_JOB_RESULT_ITEM_NAME,
+                     ctypes.c_char_p),
+                    (vixlib.VIX_PROPERTY_JOB_RESULT_PROCESS_ID,
+                     ctypes.c_uint64),
+                    (vixlib.VIX_PROPERTY_JOB_RESULT_PROCESS_OWNER,
+                     ctypes.c_char_p),
+                    (vixlib.VIX_PROPERTY_JOB_RESULT_PROCESS_COMMAND,
+                     ctypes.c_char_p)])
+                processes.append({"name": name,
+                                  "pid": pid,
+                                  "owner": owner,
+                                  "command": command})
+            return processes
+
+    def get_file_info_in_guest(self, guest_path):
+        job_handle = vixlib.VixVM_GetFileInfoInGuest(self._vm_handle,
+                                                     guest_path, None, None)
+        with VixJob(job_handle) as job:
+            job.wait()
+            (size, flags, mod_time) = job.get_nth_results(0, [
+                (vixlib.VIX_PROPERTY_JOB_RESULT_FILE_SIZE, ctypes.c_int64),
+                (vixlib.VIX_PROPERTY_JOB_RESULT_FILE_FLAGS, ctypes.c_int),
+                (vixlib.VIX_PROPERTY_JOB_RESULT_FILE_MOD_TIME,
+                 ctypes.c_int64)])
+            return {"size": size, "flags": flags, "mod_time": mod_time}
+
+    def list_directory_in_guest(self, guest_path):
+        job_handle = vixlib.VixVM_ListDirectoryInGuest(self._vm_handle,
+                                                       guest_path, 0, None,
+                                                       None)
+        with VixJob(job_handle) as job:
+            job.wait()
+
+            files = []
+            for i in range(job.get_num_results(
+                    vixlib.VIX_PROPERTY_JOB_RESULT_ITEM_NAME)):
+                (name, size, flags, mod_time) = job.get_nth_results(i, [
+                    (vixlib.VIX_PROPERTY_JOB_RESULT_ITEM_NAME,
+                     ctypes.c_char_p),
+                    (vixlib.VIX_PROPERTY_JOB_RESULT_FILE_SIZE,
+                     ctypes.c_int64),
+                    (vixlib.VIX_PROPERTY_JOB_RESULT_FILE_FLAGS, ctypes.c_int),
+                    (vixlib.VIX_PROPERTY_JOB_RESULT_FILE_MOD_TIME,
+                     ctypes.c_int64)])
+                files.append({"name": name,
+                              "size": size,
+                              "flags": flags,
+                              "mod_time": mod_time})
+            return files
+
+    def create_directory_in_guest(self, guest_path):
+        job_handle = vixlib.VixVM_CreateDirectoryInGuest(
+            self._vm_handle, guest_path, vixlib.VIX_INVALID_HANDLE, None,
+            None)
+        err = vixlib.VixJob_Wait(job_handle, vixlib.VIX_PROPERTY_NONE)
+        vixlib.Vix_ReleaseHandle(job_handle)
+        _check_job_err_code(err)
+
+    def copy_file_from_guest_to_host(self, guest_path, host_path):
+        job_handle = vixlib.VixVM_CopyFileFromGuestToHost(
+            self._vm_handle, guest_path, host_path, 0,
+            vixlib.VIX_INVALID_HANDLE, None, None)
+        err = vixlib.VixJob_Wait(job_handle, vixlib.VIX_PROPERTY_NONE)
+        vixlib.Vix_ReleaseHandle(job_handle)
+        _check_job_err_code(err)
+
     def delete(self, delete_disk_files=True):
         if delete_disk_files:
             delete_options = vixlib.VIX_VMDELETE_DISK_FILES
@@ -306,6 +609,7 @@ class VixVM(object):
                                  ctypes.byref(snapshot_handle),
                                  vixlib.VIX_PROPERTY_NONE)
         vixlib.Vix_ReleaseHandle(job_handle)
+        self._invalidate_snapshot_tree()
         _check_job_err_code(err)
 
         return VixSnapshot(snapshot_handle)
@@ -315,10 +619,80 @@ class VixVM(object):
                                                  snapshot._snapshot_handle,
                                                  0, None, None)
         err = vixlib.VixJob_Wait(job_handle, vixlib.VIX_PROPERTY_NONE)
+        vixlib.Vix_ReleaseHandle(job_handle)
+        self._invalidate_snapshot_tree()
         _check_job_err_code(err)
 
         snapshot.close()
 
+    def revert_to_snapshot(self, snapshot, show_gui=False,
+                           suppress_power_on=False):
+        if show_gui:
+            options = vixlib.VIX_VMPOWEROP_LAUNCH_GUI
+        else:
+            options = vixlib.VIX_VMPOWEROP_NORMAL
+        if suppress_power_on:
+            options |= vixlib.VIX_VMPOWEROP_SUPPRESS_SNAPSHOT_POWERON
+
+        job_handle = vixlib.VixVM_RevertToSnapshot(self._vm_handle,
+                                                   snapshot._snapshot_handle,
+                                                   options,
+                                                   vixlib.VIX_INVALID_HANDLE,
+                                                   None, None)
+        err = vixlib.VixJob_Wait(job_handle, vixlib.VIX_PROPERTY_NONE)
+        vixlib.Vix_ReleaseHandle(job_handle)
+        self._invalidate_snapshot_tree()
+        _check_job_err_code(err)
+
+    def _get_vmsd_mtime(self):
+        vmsd_path = os.path.splitext(self.get_vmx_path())[0] + ".vmsd"
+        if os.path.exists(vmsd_path):
+            return os.path.getmtime(vmsd_path)
+
+    def _invalidate_snapshot_tree(self):
+        _snapshot_trees.pop(self.get_vmx_path(), None)
+
+    def _load_snapshot_tree(self):
+        num_root_snapshots = ctypes.c_int()
+        err = vixlib.VixVM_GetNumRootSnapshots(
+            self._vm_handle, ctypes.byref(num_root_snapshots))
+        _check_job_err_code(err)
+
+        roots = []
+        for i in range(num_root_snapshots.value):
+            snapshot_handle = vixlib.VixHandle()
+            err = vixlib.VixVM_GetRootSnapshot(self._vm_handle, i,
+                                               ctypes.byref(snapshot_handle))
+            _check_job_err_code(err)
+            with VixSnapshot(snapshot_handle) as snapshot:
+                roots.append(snapshot.get_tree_node())
+
+        return SnapshotTree(roots)
+
+    def snapshot_tree(self):
+        vmx_path = self.get_vmx_path()
+        # Snapshots can also be changed outside of Nova, e.g. in the
+        # Workstation GUI
+        vmsd_mtime = self._get_vmsd_mtime()
+
+        cached = _snapshot_trees.get(vmx_path)
+        if cached and cached[0] == vmsd_mtime:
+            return cached[1]
+
+        snapshot_tree = self._load_snapshot_tree()
+        _snapshot_trees[vmx_path] = (vmsd_mtime, snapshot_tree)
+        return snapshot_tree
+
+    def get_named_snapshot(self, name):
+        if not self.snapshot_tree().find(name):
+            return None
+
+        snapshot_handle = vixlib.VixHandle()
+        err = vixlib.VixVM_GetNamedSnapshot(self._vm_handle, name,
+                                            ctypes.byref(snapshot_handle))
+        _check_job_err_code(err)
+        return VixSnapshot(snapshot_handle)
+
     def get_vmx_path(self):
         if not self._vmx_path:
             vmx_path = ctypes.c_char_p()
@@ -350,6 +724,231 @@ class VixVM(object):
         return (vnc_enabled, vnc_port)
 
 
+class VixJob(object):
+    def __init__(self, job_handle):
+        self._job_handle = job_handle
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def close(self):
+        if self._job_handle:
+            vixlib.Vix_ReleaseHandle(self._job_handle)
+            self._job_handle = None
+
+    def wait(self):
+        err = vixlib.VixJob_Wait(self._job_handle, vixlib.VIX_PROPERTY_NONE)
+        _check_job_err_code(err)
+
+    def is_completed(self):
+        completed = ctypes.c_byte()
+        err = vixlib.VixJob_CheckCompletion(self._job_handle,
+                                            ctypes.byref(completed))
+        _check_job_err_code(err)
+        return bool(completed.value)
+
+    def get_int_result(self, property_id):
+        value = ctypes.c_int()
+        err = vixlib.VixJob_Wait(self._job_handle, property_id,
+                                 ctypes.byref(value),
+                                 vixlib.VIX_PROPERTY_NONE)
+        _check_job_err_code(err)
+        return value.value
+
+    def get_num_results(self, property_id):
+        return vixlib.VixJob_GetNumProperties(self._job_handle, property_id)
+
+    def get_nth_results(self, index, properties):
+        """Returns the values of the index-th result of a completed job,
+        given a list of (property id, ctypes type) tuples.
+        """
+        values = []
+        args = []
+        for (property_id, value_type) in properties:
+            value = value_type()
+            values.append((value, value_type))
+            args += [property_id, ctypes.byref(value)]
+        args.append(vixlib.VIX_PROPERTY_NONE)
+
+        err = vixlib.VixJob_GetNthProperties(self._job_handle, index, *args)
+        _check_job_err_code(err)
+
+        results = []
+        for (value, value_type) in values:
+            results.append(value.value)
+            if value_type == ctypes.c_char_p:
+                vixlib.Vix_FreeBuffer(value)
+        return results
+
+    def get_string_result(self, property_id):
+        value = ctypes.c_char_p()
+        err = vixlib.VixJob_Wait(self._job_handle, property_id,
+                                 ctypes.byref(value),
+                                 vixlib.VIX_PROPERTY_NONE)
+        _check_job_err_code(err)
+
+        str_value = value.value
+        vixlib.Vix_FreeBuffer(value)
+        return str_value
+
+
+class _GuestSession(object):
+    def __init__(self, vm, username, password):
+        self.vm = vm
+        self.username = username
+        self.password = password
+        self.last_used = time.time()
+
+
+class GuestSessionPool(object):
+    """Logged in guest sessions, one per virtual machine.
+
+    Guest logins are slow, so guest operations issued on the same virtual
+    machine share a session. Sessions idle for more than idle_timeout
+    seconds are logged out, while sessions invalidated in the guest, e.g.
+    by a guest tools restart, are logged in again once the guest tools are
+    running.
+    """
+
+    _RELOGIN_ERROR_CODES = [vixlib.VIX_E_CANNOT_AUTHENTICATE_WITH_GUEST,
+                            vixlib.VIX_E_TOOLS_NOT_RUNNING]
+
+    def __init__(self, conn, username=None, password=None, idle_timeout=300):
+        self._conn = conn
+        self._username = username
+        self._password = password
+        self._idle_timeout = idle_timeout
+        self._sessions = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def _close_session(self, session, logout=True):
+        try:
+            if logout:
+                session.vm.logout_from_guest()
+        except utils.VixException:
+            # The guest might have been powered off or rebooted
+            pass
+        finally:
+            session.vm.close()
+
+    def _expire_sessions(self):
+        now = time.time()
+        for (vmx_path, session) in self._sessions.items():
+            if now - session.last_used > self._idle_timeout:
+                del self._sessions[vmx_path]
+                self._close_session(session)
+
+    def get_session(self, vmx_path, username=None, password=None,
+                    check_tools=False):
+        """Returns a VixVM logged in the guest with the given credentials,
+        defaulting to the pool ones.
+        """
+        username = username or self._username
+        password = password or self._password
+
+        self._expire_sessions()
+
+        session = self._sessions.get(vmx_path)
+        credentials = (username, password)
+        if session and (session.username, session.password) != credentials:
+            self.invalidate(vmx_path)
+            session = None
+
+        if not session:
+            vm = self._conn.open_vm(vmx_path)
+            try:
+                # Fails fast instead of blocking in a VIX job until the
+                # guest tools are running
+                if check_tools and not (vm.get_power_state() &
+                                        vixlib.VIX_POWERSTATE_TOOLS_RUNNING):
+                    raise utils.VixException(
+                        _("The guest tools are not running: %s") % vmx_path,
+                        error_code=vixlib.VIX_E_TOOLS_NOT_RUNNING)
+                vm.login_in_guest(username, password)
+            except Exception:
+                vm.close()
+                raise
+            session = _GuestSession(vm, username, password)
+            self._sessions[vmx_path] = session
+
+        session.last_used = time.time()
+        return session.vm
+
+    def invalidate(self, vmx_path, logout=True):
+        session = self._sessions.pop(vmx_path, None)
+        if session:
+            self._close_session(session, logout)
+
+    def execute(self, vmx_path, operation, username=None, password=None):
+        """Calls operation with a logged in VixVM, logging in again once if
+        the session is not valid anymore.
+        """
+        vm = self.get_session(vmx_path, username, password)
+        try:
+            return operation(vm)
+        except utils.VixException as ex:
+            if (get_exception_error_code(ex) not in
+                    self._RELOGIN_ERROR_CODES):
+                raise
+            self.invalidate(vmx_path, logout=False)
+
+        vm = self.get_session(vmx_path, username, password,
+                              check_tools=True)
+        return operation(vm)
+
+    def close(self):
+        for session in self._sessions.values():
+            self._close_session(session)
+        self._sessions = {}
+
+
+class SnapshotTreeNode(object):
+    def __init__(self, name, description, parent=None):
+        self.name = name
+        self.description = description
+        self.parent = parent
+        self.children = []
+
+    def get_chain(self):
+        chain = []
+        node = self
+        while node:
+            chain.insert(0, node)
+            node = node.parent
+        return chain
+
+    def get_depth(self):
+        return len(self.get_chain())
+
+
+class SnapshotTree(object):
+    def __init__(self, roots):
+        self.roots = roots
+
+    def __iter__(self):
+        nodes = list(reversed(self.roots))
+        while nodes:
+            node = nodes.pop()
+            yield node
+            nodes += reversed(node.children)
+
+    def find(self, name):
+        for node in self:
+            if node.name == name:
+                return node
+
+    def get_max_depth(self):
+        return max([node.get_depth() for node in self] or [0])
+
+
 class VixSnapshot(object):
     def __init__(self, snapshot_handle):
         self._snapshot_handle = snapshot_handle
@@ -365,6 +964,57 @@ class VixSnapshot(object):
             vixlib.Vix_ReleaseHandle(self._snapshot_handle)
             self._snapshot_handle = None
 
+    def _get_string_property(self, property_id):
+        value = ctypes.c_char_p()
+        err = vixlib.Vix_GetProperties(self._snapshot_handle,
+                                       property_id,
+                                       ctypes.byref(value),
+                                       vixlib.VIX_PROPERTY_NONE)
+        _check_job_err_code(err)
+
+        str_value = value.value
+        vixlib.Vix_FreeBuffer(value)
+        return str_value
+
+    def get_display_name(self):
+        return self._get_string_property(
+            vixlib.VIX_PROPERTY_SNAPSHOT_DISPLAYNAME)
+
+    def get_description(self):
+        return self._get_string_property(
+            vixlib.VIX_PROPERTY_SNAPSHOT_DESCRIPTION)
+
+    def get_num_children(self):
+        num_children = ctypes.c_int()
+        err = vixlib.VixSnapshot_GetNumChildren(self._snapshot_handle,
+                                                ctypes.byref(num_children))
+        _check_job_err_code(err)
+        return num_children.value
+
+    def get_child(self, index):
+        child_handle = vixlib.VixHandle()
+        err = vixlib.VixSnapshot_GetChild(self._snapshot_handle, index,
+                                          ctypes.byref(child_handle))
+        _check_job_err_code(err)
+        return VixSnapshot(child_handle)
+
+    def get_parent(self):
+        parent_handle = vixlib.VixHandle()
+        err = vixlib.VixSnapshot_GetParent(self._snapshot_handle,
+                                           ctypes.byref(parent_handle))
+        _check_job_err_code(err)
+        if parent_handle.value == vixlib.VIX_INVALID_HANDLE:
+            return None
+        return VixSnapshot(parent_handle)
+
+    def get_tree_node(self, parent=None):
+        node = SnapshotTreeNode(self.get_display_name(),
+                                self.get_description(), parent)
+        for i in range(self.get_num_children()):
+            with self.get_child(i) as child:
+                node.children.append(child.get_tree_node(node))
+        return node
+
 
 class VixConnection(object):
     def __init__(self):
@@ -431,6 +1081,10 @@ class VixConnection(object):
                   nested_hypervisor=False,
                   vnc_enabled=False,
                   vnc_port=None,
+                  serial_port_path=None,
+                  memory_profile=None,
+                  disk_controller=None,
+                  nic_model=None,
                   additional_config=None):
 
         config = {
@@ -473,7 +1127,8 @@ class VixConnection(object):
         config["bios.bootOrder"] = boot_order
 
         if disk_paths:
-            config.update(self._get_scsi_config(disk_paths))
+            config.update(self._get_scsi_config(disk_paths,
+                                                disk_controller))
 
         if iso_paths:
             config.update(self._get_ide_config(iso_paths))
@@ -482,13 +1137,19 @@ class VixConnection(object):
             config.update(self._get_floppy_config(floppy_path))
 
         if networks:
-            config.update(self._get_networks_config(networks))
+            config.update(self._get_networks_config(networks, nic_model))
 
         if nested_hypervisor:
             config.update(self._get_nested_hypervisor_config())
 
+        if memory_profile:
+            config.update(self._get_memory_config(**memory_profile))
+
         config.update(self._get_vnc_config(vnc_enabled, vnc_port))
 
+        if serial_port_path:
+            config.update(self._get_serial_port_config(serial_port_path))
+
         if additional_config:
             config.update(additional_config)
 
@@ -516,6 +1177,10 @@ class VixConnection(object):
                   nested_hypervisor=None,
                   vnc_enabled=None,
                   vnc_port=None,
+                  serial_port_path=None,
+                  memory_profile=None,
+                  disk_controller=None,
+                  nic_model=None,
                   additional_config=None):
         config = {}
 
@@ -541,7 +1206,8 @@ class VixConnection(object):
             config["bios.bootOrder"] = boot_order
 
         if disk_paths:
-            config.update(self._get_scsi_config(disk_paths))
+            config.update(self._get_scsi_config(disk_paths,
+                                                disk_controller))
 
         if iso_paths:
             config.update(self._get_ide_config(iso_paths))
@@ -552,10 +1218,16 @@ class VixConnection(object):
         if nested_hypervisor:
             config.update(self._get_nested_hypervisor_config())
 
+        if memory_profile:
+            config.update(self._get_memory_config(**memory_profile))
+
         config.update(self._get_vnc_config(vnc_enabled, vnc_port))
 
+        if serial_port_path:
+            config.update(self._get_serial_port_config(serial_port_path))
+
         if networks is not None:
-            config.update(self._get_networks_config(networks))
+            config.update(self._get_networks_config(networks, nic_model))
 
         if additional_config:
             config.update(additional_config)
@@ -577,11 +1249,12 @@ class VixConnection(object):
             config["RemoteDisplay.vnc.enabled"] = bool(vnc_enabled)
         return config
 
-    def _get_scsi_config(self, disk_paths):
+    def _get_scsi_config(self, disk_paths, disk_controller=None):
         config = {}
         config["scsi0.present"] = "TRUE"
         config["scsi0.sharedBus"] = "none"
-        config["scsi0.virtualDev"] = "lsisas1068"
+        config["scsi0.virtualDev"] = (disk_controller or
+                                      DISK_CONTROLLER_LSISAS1068)
 
         i = 0
         for disk_path in disk_paths:
@@ -599,11 +1272,17 @@ class VixConnection(object):
         return config
 
     def _get_ide_config(self, iso_paths):
+        if len(iso_paths) > len(_IDE_CDROM_SLOTS):
+            raise utils.VixException(
+                _("At most %(max)d CD-ROM images can be attached, "
+                  "%(count)d requested") % {'max': len(_IDE_CDROM_SLOTS),
+                                            'count': len(iso_paths)})
+
         config = {}
-        i = 0
-        for iso_path in iso_paths:
-            config.update(self._get_ide_iso_config(1, i, iso_path))
-            i += 1
+        for ((ctrl_idx, disk_idx), iso_path) in zip(_IDE_CDROM_SLOTS,
+                                                    iso_paths):
+            config.update(self._get_ide_iso_config(ctrl_idx, disk_idx,
+                                                   iso_path))
         return config
 
     def _get_ide_iso_config(self, ctrl_idx, disk_idx, path):
@@ -628,6 +1307,14 @@ class VixConnection(object):
         config["floppy0.fileName"] = floppy_path
         return config
 
+    def _get_serial_port_config(self, serial_port_path):
+        config = {}
+        config["serial0.present"] = "TRUE"
+        config["serial0.fileType"] = "file"
+        config["serial0.fileName"] = serial_port_path
+        config["serial0.tryNoRxLoss"] = "FALSE"
+        return config
+
     def _get_nested_hypervisor_config(self):
         config = {}
         config["vcpu.hotadd"] = "FALSE"
@@ -635,12 +1322,25 @@ class VixConnection(object):
         config["vhv.enable"] = "TRUE"
         return config
 
-    def _get_networks_config(self, networks):
+    def _get_memory_config(self, mem_use_named_file=None, mem_trim_rate=None,
+                           mem_page_sharing=None, min_vm_mem_pct=None):
+        config = {}
+        if mem_use_named_file is not None:
+            config["mainMem.useNamedFile"] = str(mem_use_named_file).upper()
+        if mem_trim_rate is not None:
+            config["MemTrimRate"] = str(mem_trim_rate)
+        if mem_page_sharing is not None:
+            config["sched.mem.pshare.enable"] = str(mem_page_sharing).upper()
+        if min_vm_mem_pct is not None:
+            config["prefvmx.minVmMemPct"] = str(min_vm_mem_pct)
+        return config
+
+    def _get_networks_config(self, networks, nic_model=None):
         config = {}
         i = 0
         for network, mac_address in networks:
             config["ethernet%d.present" % i] = "TRUE"
-            config["ethernet%d.virtualDev" % i] = "e1000e"
+            config["ethernet%d.virtualDev" % i] = nic_model or NIC_MODEL_E1000E
             if not mac_address:
                 config["ethernet%d.addressType" % i] = "generated"
             else:
@@ -779,8 +1479,17 @@ class VixConnection(object):
             return "/usr/lib/vmware/isoimages"
 
     def nested_virt_support(self):
-        # TODO: match with HW capabilities as well
-        return SUPPORTS_NESTED_VIRT_VMX | SUPPORTS_NESTED_VIRT_EPT
+        features = cpuutils.get_cpu_info()["features"]
+        if features is None:
+            # The CPU features cannot be probed on this platform
+            return SUPPORTS_NESTED_VIRT_VMX | SUPPORTS_NESTED_VIRT_EPT
+
+        support = 0
+        if cpuutils.has_hw_virtualization(features):
+            support |= SUPPORTS_NESTED_VIRT_VMX
+            if cpuutils.has_second_level_address_translation(features):
+                support |= SUPPORTS_NESTED_VIRT_EPT
+        return support
 
     def clone_vm(self, src_vmx_path, dest_vmx_path, linked_clone=False):
         if linked_clone:
@@ -0,0 +1,664 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Cloudbase Solutions Srl
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Reads VMDK disk chains and exports them as streamOptimized VMDK images.
+
+Ref: "Virtual Disk Format 5.0", VMware Technical Note
+"""
+
+import array
+import heapq
+import os
+import random
+import re
+import struct
+import zlib
+
+from nova.openstack.common.gettextutils import _
+from vix import utils
+
+SECTOR_SIZE = 512
+
+SPARSE_MAGIC = 0x564d444b
+SPARSE_GD_AT_END = 0xffffffffffffffff
+
+SPARSE_FLAG_VALID_NEW_LINE_DETECTION = 0x00001
+SPARSE_FLAG_ZEROED_GRAIN_GTE = 0x00004
+SPARSE_FLAG_COMPRESSED = 0x10000
+SPARSE_FLAG_MARKERS = 0x20000
+
+SPARSE_COMPRESSION_DEFLATE = 1
+
+MARKER_EOS = 0
+MARKER_GRAIN_TABLE = 1
+MARKER_GRAIN_DIRECTORY = 2
+MARKER_FOOTER = 3
+
+GTE_UNALLOCATED = 0
+GTE_ZEROED = 1
+
+DEFAULT_GRAIN_SIZE = 128
+DEFAULT_NUM_GTES_PER_GT = 512
+
+_SPARSE_HEADER_FORMAT = "<IIIQQQQIQQQB4sH"
+_SPARSE_HEADER_SIZE = struct.calcsize(_SPARSE_HEADER_FORMAT)
+_GRAIN_MARKER_FORMAT = "<QI"
+_GRAIN_MARKER_SIZE = struct.calcsize(_GRAIN_MARKER_FORMAT)
+_METADATA_MARKER_FORMAT = "<QII"
+
+_EXTENT_RE = re.compile(r'^(RW|RDONLY|NOACCESS)\s+(\d+)\s+'
+                        r'(SPARSE|FLAT|ZERO|VMFS)'
+                        r'(?:\s+"([^"]*)"(?:\s+(\d+))?)?\s*$')
+_DESCRIPTOR_VALUE_RE = re.compile(r'^([\w\.]+)\s*=\s*"?([^"]*)"?\s*$')
+
+
+def _pad_to_sector(data):
+    remainder = len(data) % SECTOR_SIZE
+    if remainder:
+        data += "\0" * (SECTOR_SIZE - remainder)
+    return data
+
+
+def _get_sectors(size):
+    return (size + SECTOR_SIZE - 1) // SECTOR_SIZE
+
+
+class SparseExtentHeader(object):
+    def __init__(self, version=1, flags=0, capacity=0,
+                 grain_size=DEFAULT_GRAIN_SIZE, descriptor_offset=0,
+                 descriptor_size=0, num_gtes_per_gt=DEFAULT_NUM_GTES_PER_GT,
+                 rgd_offset=0, gd_offset=0, overhead=0,
+                 compress_algorithm=0):
+        self.version = version
+        self.flags = flags
+        self.capacity = capacity
+        self.grain_size = grain_size
+        self.descriptor_offset = descriptor_offset
+        self.descriptor_size = descriptor_size
+        self.num_gtes_per_gt = num_gtes_per_gt
+        self.rgd_offset = rgd_offset
+        self.gd_offset = gd_offset
+        self.overhead = overhead
+        self.compress_algorithm = compress_algorithm
+
+    @classmethod
+    def from_bytes(cls, data):
+        if len(data) < _SPARSE_HEADER_SIZE:
+            return None
+        values = struct.unpack(_SPARSE_HEADER_FORMAT,
+                               data[:_SPARSE_HEADER_SIZE])
+        if values[0] != SPARSE_MAGIC:
+            return None
+        return cls(version=values[1], flags=values[2], capacity=values[3],
+                   grain_size=values[4], descriptor_offset=values[5],
+                   descriptor_size=values[6], num_gtes_per_gt=values[7],
+                   rgd_offset=values[8], gd_offset=values[9],
+                   overhead=values[10], compress_algorithm=values[13])
+
+    def to_bytes(self):
+        data = struct.pack(_SPARSE_HEADER_FORMAT, SPARSE_MAGIC, self.version,
+                           self.flags, self.capacity, self.grain_size,
+                           self.descriptor_offset, self.descriptor_size,
+                           self.num_gtes_per_gt, self.rgd_offset,
+                           self.gd_offset, self.overhead, 0, "\n \r\n",
+                           self.compress_algorithm)
+        return _pad_to_sector(data)
+
+    def get_num_gts(self):
+        grains = (self.capacity + self.grain_size - 1) // self.grain_size
+        return (grains + self.num_gtes_per_gt - 1) // self.num_gtes_per_gt
+
+
+class _SparseExtent(object):
+    def __init__(self, path):
+        self._f = open(path, 'rb')
+        self._header = SparseExtentHeader.from_bytes(self._f.read(
+            SECTOR_SIZE))
+        if not self._header:
+            raise utils.VixException(_("Not a sparse VMDK extent: %s") % path)
+
+        if self._header.gd_offset == SPARSE_GD_AT_END:
+            # streamOptimized images store the grain directory offset in a
+            # footer, before the end of stream marker
+            self._f.seek(-SECTOR_SIZE * 2, os.SEEK_END)
+            self._header = SparseExtentHeader.from_bytes(self._f.read(
+                SECTOR_SIZE))
+            if not self._header:
+                raise utils.VixException(_("Invalid VMDK footer: %s") % path)
+
+        self.grain_size = self._header.grain_size
+        self._compressed = bool(self._header.flags & SPARSE_FLAG_COMPRESSED)
+        self._num_gtes_per_gt = self._header.num_gtes_per_gt
+        self._gd = self._load_grain_directory()
+        # Only the last grain table read is kept in memory
+        self._gt_index = None
+        self._gt = None
+
+    def _read_sectors(self, sector, count):
+        self._f.seek(sector * SECTOR_SIZE)
+        return self._f.read(count * SECTOR_SIZE)
+
+    def _load_grain_directory(self):
+        num_gts = self._header.get_num_gts()
+        gd = array.array('I')
+        gd.fromstring(self._read_sectors(self._header.gd_offset,
+                                         _get_sectors(num_gts * 4))[
+            :num_gts * 4])
+        return gd
+
+    def _get_grain_table(self, gt_index):
+        if gt_index != self._gt_index:
+            gt_size = self._num_gtes_per_gt * 4
+            gt_offset = self._gd[gt_index]
+            gt = array.array('I')
+            if gt_offset:
+                gt.fromstring(self._read_sectors(
+                    gt_offset, _get_sectors(gt_size))[:gt_size])
+            else:
+                gt.extend([GTE_UNALLOCATED] * self._num_gtes_per_gt)
+            self._gt_index = gt_index
+            self._gt = gt
+        return self._gt
+
+    def get_header(self):
+        return self._header
+
+    def read_descriptor(self):
+        if not self._header.descriptor_offset:
+            return None
+        data = self._read_sectors(self._header.descriptor_offset,
+                                  self._header.descriptor_size)
+        return data.split("\0")[0]
+
+    def iter_allocated_grains(self):
+        """Yields the allocated grains in grain directory order."""
+        for (gt_index, gt_offset) in enumerate(self._gd):
+            if not gt_offset:
+                continue
+            first_grain = gt_index * self._num_gtes_per_gt
+            for (i, gte) in enumerate(self._get_grain_table(gt_index)):
+                if gte != GTE_UNALLOCATED:
+                    yield first_grain + i
+
+    def _read_grain(self, grain):
+        gt = self._get_grain_table(grain // self._num_gtes_per_gt)
+        gte = gt[grain % self._num_gtes_per_gt]
+        if gte == GTE_UNALLOCATED:
+            return None
+
+        grain_bytes = self.grain_size * SECTOR_SIZE
+        if gte == GTE_ZEROED:
+            return "\0" * grain_bytes
+
+        if self._compressed:
+            self._f.seek(gte * SECTOR_SIZE)
+            (lba, size) = struct.unpack(_GRAIN_MARKER_FORMAT,
+                                        self._f.read(_GRAIN_MARKER_SIZE))
+            data = zlib.decompress(self._f.read(size))
+        else:
+            data = self._read_sectors(gte, self.grain_size)
+
+        if len(data) < grain_bytes:
+            data += "\0" * (grain_bytes - len(data))
+        return data
+
+    def read(self, sector, count):
+        pieces = []
+        while count > 0:
+            grain = sector // self.grain_size
+            offset = sector % self.grain_size
+            n = min(count, self.grain_size - offset)
+
+            data = self._read_grain(grain)
+            if data is not None:
+                data = data[offset * SECTOR_SIZE:(offset + n) * SECTOR_SIZE]
+            pieces.append((sector, n, data))
+
+            sector += n
+            count -= n
+        return pieces
+
+    def close(self):
+        self._f.close()
+
+
+class _FlatExtent(object):
+    def __init__(self, path, offset):
+        self._f = open(path, 'rb')
+        self._offset = offset
+
+    def iter_allocated_grains(self):
+        return None
+
+    def read(self, sector, count):
+        self._f.seek((self._offset + sector) * SECTOR_SIZE)
+        data = self._f.read(count * SECTOR_SIZE)
+        if len(data) < count * SECTOR_SIZE:
+            data += "\0" * (count * SECTOR_SIZE - len(data))
+        return [(sector, count, data)]
+
+    def close(self):
+        self._f.close()
+
+
+class _ZeroExtent(object):
+    def iter_allocated_grains(self):
+        return None
+
+    def read(self, sector, count):
+        return [(sector, count, "\0" * (count * SECTOR_SIZE))]
+
+    def close(self):
+        pass
+
+
+def get_disk_capacity(path):
+    """Returns the virtual capacity in bytes of a disk, reading only its
+    header or descriptor.
+    """
+    with open(path, 'rb') as f:
+        data = f.read(SECTOR_SIZE)
+        header = SparseExtentHeader.from_bytes(data)
+        if not header:
+            data += f.read()
+
+    if header:
+        # Monolithic sparse disk, including delta disks
+        sectors = header.capacity
+    else:
+        sectors = 0
+        for line in data.splitlines():
+            m = _EXTENT_RE.match(line.strip())
+            if m:
+                sectors += long(m.group(2))
+    return sectors * SECTOR_SIZE
+
+
+class VMDKDisk(object):
+    """A VMDK disk, including its chain of parent disks."""
+
+    def __init__(self, path, parent=None):
+        self.path = path
+        self.parent = None
+        self.descriptor = {}
+        self._extents = []
+
+        try:
+            self._open(path)
+
+            parent_path = self._get_parent_path()
+            if parent:
+                self.parent = parent
+            elif parent_path:
+                self.parent = VMDKDisk(parent_path)
+        except Exception:
+            self.close()
+            raise
+
+        self.capacity = sum([n for (s, n, e) in self._extents])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def _open(self, path):
+        with open(path, 'rb') as f:
+            header = SparseExtentHeader.from_bytes(f.read(SECTOR_SIZE))
+
+        if header:
+            # Monolithic sparse disk with an embedded descriptor
+            extent = _SparseExtent(path)
+            descriptor = extent.read_descriptor()
+            if descriptor:
+                self._parse_descriptor(descriptor, extent)
+            else:
+                self._extents.append((0, extent.get_header().capacity,
+                                      extent))
+        else:
+            with open(path, 'rb') as f:
+                self._parse_descriptor(f.read())
+
+    def _parse_descriptor(self, descriptor, embedded_extent=None):
+        base_dir = os.path.dirname(self.path)
+        start = 0
+        for line in descriptor.splitlines():
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+
+            m = _EXTENT_RE.match(line)
+            if m:
+                (access, sectors, extent_type, file_name,
+                 offset) = m.groups()
+                sectors = long(sectors)
+
+                if extent_type == "ZERO":
+                    extent = _ZeroExtent()
+                elif extent_type == "SPARSE" and embedded_extent:
+                    # The extent name refers to the original file name,
+                    # which may have been renamed since
+                    extent = embedded_extent
+                    embedded_extent = None
+                else:
+                    extent_path = os.path.join(base_dir, file_name)
+                    if extent_type == "SPARSE":
+                        extent = _SparseExtent(extent_path)
+                    else:
+                        extent = _FlatExtent(extent_path, long(offset or 0))
+
+                self._extents.append((start, sectors, extent))
+                start += sectors
+                continue
+
+            m = _DESCRIPTOR_VALUE_RE.match(line)
+            if m:
+                self.descriptor[m.group(1)] = m.group(2)
+
+        if not self._extents:
+            raise utils.VixException(_("No extents found in VMDK: %s") %
+                                     self.path)
+
+    def _get_parent_path(self):
+        parent_cid = self.descriptor.get("parentCID", "ffffffff")
+        parent_hint = self.descriptor.get("parentFileNameHint")
+        if parent_cid.lower() == "ffffffff" or not parent_hint:
+            return None
+        return os.path.join(os.path.dirname(self.path), parent_hint)
+
+    def get_chain(self):
+        disk = self
+        while disk:
+            yield disk
+            disk = disk.parent
+
+    def _read_layer(self, sector, count):
+        pieces = []
+        end = sector + count
+        for (ext_start, ext_sectors, extent) in self._extents:
+            ext_end = ext_start + ext_sectors
+            if ext_end <= sector or ext_start >= end:
+                continue
+            start = max(sector, ext_start)
+            n = min(end, ext_end) - start
+            for (s, c, data) in extent.read(start - ext_start, n):
+                pieces.append((ext_start + s, c, data))
+
+        covered = sum([c for (s, c, d) in pieces])
+        if covered < count:
+            # Beyond the disk capacity, e.g. on a parent disk smaller
+            # than its child
+            pieces.append((sector + covered, count - covered, None))
+        return pieces
+
+    def _read(self, sector, count):
+        pieces = []
+        for (s, c, data) in self._read_layer(sector, count):
+            if data is None and self.parent:
+                pieces += self.parent._read(s, c)
+            else:
+                pieces.append((s, c, data))
+        return pieces
+
+    def read_block(self, block, block_size=DEFAULT_GRAIN_SIZE):
+        """Returns the block data or None if not allocated in the chain."""
+        sector = block * block_size
+        count = min(block_size, self.capacity - sector)
+        pieces = self._read(sector, count)
+
+        if not [d for (s, c, d) in pieces if d is not None]:
+            return None
+        return "".join([d if d is not None else "\0" * (c * SECTOR_SIZE)
+                        for (s, c, d) in pieces])
+
+    def _iter_layer_allocated_blocks(self, block_size):
+        last_block = -1
+        for (ext_start, ext_sectors, extent) in self._extents:
+            grains = extent.iter_allocated_grains()
+            if grains is None:
+                ranges = [(ext_start, ext_sectors)]
+            else:
+                grain_size = extent.grain_size
+                ranges = ((ext_start + g * grain_size, grain_size)
+                          for g in grains)
+
+            for (sector, count) in ranges:
+                end = min(sector + count, ext_start + ext_sectors)
+                for block in xrange(sector // block_size,
+                                    (end + block_size - 1) // block_size):
+                    # Blocks can span grains or extents
+                    if block > last_block:
+                        last_block = block
+                        yield block
+
+    def iter_allocated_blocks(self, block_size=DEFAULT_GRAIN_SIZE):
+        """Yields in order the blocks allocated in at least one disk of
+        the chain.
+        """
+        return _merge_blocks(
+            [disk._iter_layer_allocated_blocks(block_size)
+             for disk in self.get_chain()],
+            (self.capacity + block_size - 1) // block_size)
+
+    def get_allocated_blocks(self, block_size=DEFAULT_GRAIN_SIZE):
+        return list(self.iter_allocated_blocks(block_size))
+
+    def close(self):
+        for (s, n, extent) in self._extents:
+            extent.close()
+        self._extents = []
+        if self.parent:
+            self.parent.close()
+            self.parent = None
+
+
+def _get_metadata_marker(num_sectors, marker_type):
+    return _pad_to_sector(struct.pack(_METADATA_MARKER_FORMAT, num_sectors,
+                                      0, marker_type))
+
+
+def _get_stream_optimized_descriptor(capacity, adapter_type, extent_name):
+    cylinders = min(capacity // (255 * 63), 65535)
+    return ('# Disk DescriptorFile\n'
+            'version=1\n'
+            'encoding="UTF-8"\n'
+            'CID=%(cid)08x\n'
+            'parentCID=ffffffff\n'
+            'createType="streamOptimized"\n'
+            '\n'
+            '# Extent description\n'
+            'RW %(capacity)d SPARSE "%(extent_name)s"\n'
+            '\n'
+            '# The Disk Data Base\n'
+            '#DDB\n'
+            '\n'
+            'ddb.adapterType = "%(adapter_type)s"\n'
+            'ddb.geometry.cylinders = "%(cylinders)d"\n'
+            'ddb.geometry.heads = "255"\n'
+            'ddb.geometry.sectors = "63"\n'
+            'ddb.virtualHWVersion = "4"\n' %
+            {'cid': random.randint(0, 0xfffffffe),
+             'capacity': capacity,
+             'extent_name': extent_name,
+             'adapter_type': adapter_type,
+             'cylinders': cylinders})
+
+
+def _is_same_disk(disk, other_disk):
+    return (os.path.normcase(os.path.realpath(disk.path)) ==
+            os.path.normcase(os.path.realpath(other_disk.path)))
+
+
+def _merge_blocks(sorted_blocks, max_blocks):
+    last_block = -1
+    for block in heapq.merge(*sorted_blocks):
+        if block >= max_blocks:
+            break
+        if block > last_block:
+            last_block = block
+            yield block
+
+
+def iter_delta_blocks(disk, base_disk, block_size=DEFAULT_GRAIN_SIZE):
+    """Yields in order the blocks that may differ between a disk chain and
+    a base disk.
+
+    When the base disk is part of the chain, e.g. for linked clones, only
+    the blocks allocated in the disks above it are returned.
+    """
+    sorted_blocks = []
+    for layer in disk.get_chain():
+        if _is_same_disk(layer, base_disk):
+            break
+        sorted_blocks.append(layer._iter_layer_allocated_blocks(block_size))
+    else:
+        sorted_blocks.append(base_disk.iter_allocated_blocks(block_size))
+
+    return _merge_blocks(sorted_blocks,
+                         (disk.capacity + block_size - 1) // block_size)
+
+
+def get_stream_optimized_chunks(disk, blocks=None, skip_zero_blocks=True,
+                                compression_level=6,
+                                extent_name="disk.vmdk", base_disk=None):
+    """Generates a streamOptimized VMDK image from a disk chain.
+
+    Only the blocks allocated in the chain, or the provided sorted blocks,
+    are included. Blocks are read in grain directory order, keeping in
+    memory the grain directories and a single grain table of each disk.
+
+    If a base disk is provided, only the blocks whose content differs from
+    it are included, resulting in a delta image to be applied on top of the
+    base disk.
+    """
+    grain_size = DEFAULT_GRAIN_SIZE
+    num_gtes_per_gt = DEFAULT_NUM_GTES_PER_GT
+    grain_bytes = grain_size * SECTOR_SIZE
+    zero_grain = "\0" * grain_bytes
+
+    if blocks is None:
+        if base_disk:
+            blocks = iter_delta_blocks(disk, base_disk, grain_size)
+        else:
+            blocks = disk.iter_allocated_blocks(grain_size)
+
+    adapter_type = disk.descriptor.get("ddb.adapterType", "lsilogic")
+    descriptor = _pad_to_sector(_get_stream_optimized_descriptor(
+        disk.capacity, adapter_type, extent_name))
+    descriptor_sectors = len(descriptor) // SECTOR_SIZE
+
+    header = SparseExtentHeader(
+        version=3,
+        flags=(SPARSE_FLAG_VALID_NEW_LINE_DETECTION |
+               SPARSE_FLAG_COMPRESSED | SPARSE_FLAG_MARKERS),
+        capacity=disk.capacity,
+        grain_size=grain_size,
+        descriptor_offset=1,
+        descriptor_size=descriptor_sectors,
+        num_gtes_per_gt=num_gtes_per_gt,
+        gd_offset=SPARSE_GD_AT_END,
+        overhead=1 + descriptor_sectors,
+        compress_algorithm=SPARSE_COMPRESSION_DEFLATE)
+
+    yield header.to_bytes()
+    yield descriptor
+    sector = 1 + descriptor_sectors
+
+    num_gts = header.get_num_gts()
+    gd = array.array('I', [0] * num_gts)
+    gt = None
+    gt_index = None
+
+    def flush_gt():
+        gt_data = _pad_to_sector(gt.tostring())
+        gd[gt_index] = sector + 1
+        return (_get_metadata_marker(len(gt_data) // SECTOR_SIZE,
+                                     MARKER_GRAIN_TABLE) + gt_data)
+
+    for block in blocks:
+        data = disk.read_block(block, grain_size)
+        if base_disk:
+            # Zero blocks are included if the base disk content differs
+            if data is None:
+                data = zero_grain[:(min(grain_size, disk.capacity -
+                                        block * grain_size) * SECTOR_SIZE)]
+            base_data = None
+            if block * grain_size < base_disk.capacity:
+                base_data = base_disk.read_block(block, grain_size)
+            if base_data is None:
+                base_data = zero_grain
+            if data == base_data[:len(data)]:
+                continue
+        elif data is None or (skip_zero_blocks and
+                              data == zero_grain[:len(data)]):
+            continue
+
+        if gt_index != block // num_gtes_per_gt:
+            if gt is not None:
+                gt_data = flush_gt()
+                sector += len(gt_data) // SECTOR_SIZE
+                yield gt_data
+            gt_index = block // num_gtes_per_gt
+            gt = array.array('I', [0] * num_gtes_per_gt)
+
+        compressed_data = zlib.compress(data, compression_level)
+        grain_data = _pad_to_sector(struct.pack(_GRAIN_MARKER_FORMAT,
+                                                block * grain_size,
+                                                len(compressed_data)) +
+                                    compressed_data)
+        gt[block % num_gtes_per_gt] = sector
+        sector += len(grain_data) // SECTOR_SIZE
+        yield grain_data
+
+    if gt is not None:
+        gt_data = flush_gt()
+        sector += len(gt_data) // SECTOR_SIZE
+        yield gt_data
+
+    gd_data = _pad_to_sector(gd.tostring())
+    yield _get_metadata_marker(len(gd_data) // SECTOR_SIZE,
+                               MARKER_GRAIN_DIRECTORY)
+    yield gd_data
+    header.gd_offset = sector + 1
+    sector += 1 + len(gd_data) // SECTOR_SIZE
+
+    yield _get_metadata_marker(1, MARKER_FOOTER)
+    yield header.to_bytes()
+    yield _get_metadata_marker(0, MARKER_EOS)
+
+
+class ChunkedReader(object):
+    """Exposes the chunks returned by an iterator as a file-like object."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buf = ""
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buf) < size:
+            try:
+                self._buf += next(self._chunks)
+            except StopIteration:
+                break
+
+        if size < 0:
+            size = len(self._buf)
+        data = self._buf[:size]
+        self._buf = self._buf[size:]
+        return data